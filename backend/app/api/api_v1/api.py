@@ -1,29 +1,34 @@
+import importlib
+
 from fastapi import APIRouter
 
-from app.api.api_v1.endpoints import tasks, models, agents, orchestration
-
-api_router = APIRouter()
-
-api_router.include_router(
-    tasks.router,
-    prefix="/tasks",
-    tags=["tasks"]
-)
-
-api_router.include_router(
-    models.router,
-    prefix="/models",
-    tags=["models"]
-)
-
-api_router.include_router(
-    agents.router,
-    prefix="/agents",
-    tags=["agents"]
-)
-
-api_router.include_router(
-    orchestration.router,
-    prefix="/orchestration",
-    tags=["orchestration"]
-)
+from app.core.startup import startup_report
+
+# Endpoint modules with their URL prefix, in the order their routers are included
+ENDPOINT_MODULES = {
+    "tasks": "/tasks",
+    "models": "/models",
+    "agents": "/agents",
+    "orchestration": "/orchestration",
+}
+
+# Modules are imported dependencies first, so each phase times only its own module
+IMPORT_ORDER = ("models", "agents", "tasks", "orchestration")
+
+
+def build_api_router() -> APIRouter:
+    """
+    Import the endpoint modules and collect their routers.
+
+    Importing them creates the stores and services they hold, so this runs
+    when the app starts rather than when ``app.main`` is imported.
+    """
+    modules = {}
+    for name in IMPORT_ORDER:
+        with startup_report.phase(f"import {name} endpoints"):
+            modules[name] = importlib.import_module(f"app.api.api_v1.endpoints.{name}")
+
+    api_router = APIRouter()
+    for name, prefix in ENDPOINT_MODULES.items():
+        api_router.include_router(modules[name].router, prefix=prefix, tags=[name])
+    return api_router
@@ -1,9 +1,22 @@
-from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional, Dict, Any, AsyncIterator
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from enum import Enum
+import json
+import os
 import uuid
 
+from app.api.pagination import paginate
+from app.api.serialization import RecordSerializer
+from app.core.config import settings
+from app.core.store import IndexedStore
+from app.api.api_v1.endpoints.models import MODELS, MODEL_SELECTOR
+from app.services.agent_executor import AgentExecutionError, AgentExecutor
+from app.services.cost_ledger import create_cost_ledger
+from app.services.providers import providers
+from app.services.response_cache import ResponseCache
+
 router = APIRouter()
 
 class AgentType(str, Enum):
@@ -55,64 +68,143 @@ class AgentResponse(BaseModel):
     metadata: Dict[str, Any]
     is_active: bool
 
-# Mock data for development
-AGENTS = {
-    "code-agent": {
-        "id": "code-agent",
-        "name": "Code Generation Agent",
-        "type": AgentType.CODE,
-        "description": "Generates code based on requirements",
-        "capabilities": [
-            AgentCapability.CODE_GENERATION,
-            AgentCapability.CODE_REVIEW,
-            AgentCapability.DOCUMENTATION
-        ],
-        "default_model_id": "gpt-4o",
-        "prompt_template": "You are an expert software developer. Your task is to: {{task}}",
-        "parameters": {
-            "temperature": 0.2,
-            "max_tokens": 2000
+# Mock data for development, indexed for filtered listing by name
+AGENTS = IndexedStore(
+    order_by=("name",),
+    indexes=(("type",), ("capabilities",), ("is_active",)),
+    records={
+        "code-agent": {
+            "id": "code-agent",
+            "name": "Code Generation Agent",
+            "type": AgentType.CODE,
+            "description": "Generates code based on requirements",
+            "capabilities": [
+                AgentCapability.CODE_GENERATION,
+                AgentCapability.CODE_REVIEW,
+                AgentCapability.DOCUMENTATION
+            ],
+            "default_model_id": "gpt-4o",
+            "prompt_template": "You are an expert software developer. Your task is to: {{task}}",
+            "parameters": {
+                "temperature": 0.2,
+                "max_tokens": 2000
+            },
+            "metadata": {},
+            "is_active": True
         },
-        "metadata": {},
-        "is_active": True
-    },
-    "design-agent": {
-        "id": "design-agent",
-        "name": "Design Agent",
-        "type": AgentType.DESIGN,
-        "description": "Creates design artifacts and mockups",
-        "capabilities": [
-            AgentCapability.DESIGN_CREATION,
-            AgentCapability.DOCUMENTATION
-        ],
-        "default_model_id": "gpt-4o",
-        "prompt_template": "You are an expert designer. Your task is to: {{task}}",
-        "parameters": {
-            "temperature": 0.7,
-            "max_tokens": 1500
+        "design-agent": {
+            "id": "design-agent",
+            "name": "Design Agent",
+            "type": AgentType.DESIGN,
+            "description": "Creates design artifacts and mockups",
+            "capabilities": [
+                AgentCapability.DESIGN_CREATION,
+                AgentCapability.DOCUMENTATION
+            ],
+            "default_model_id": "gpt-4o",
+            "prompt_template": "You are an expert designer. Your task is to: {{task}}",
+            "parameters": {
+                "temperature": 0.7,
+                "max_tokens": 1500
+            },
+            "metadata": {},
+            "is_active": True
         },
-        "metadata": {},
-        "is_active": True
-    },
-    "test-agent": {
-        "id": "test-agent",
-        "name": "Testing Agent",
-        "type": AgentType.TEST,
-        "description": "Generates and executes tests",
-        "capabilities": [
-            AgentCapability.TEST_GENERATION,
-            AgentCapability.CODE_REVIEW
-        ],
-        "default_model_id": "gpt-4o-mini",
-        "prompt_template": "You are an expert software tester. Your task is to: {{task}}",
-        "parameters": {
-            "temperature": 0.2,
-            "max_tokens": 2000
+        "test-agent": {
+            "id": "test-agent",
+            "name": "Testing Agent",
+            "type": AgentType.TEST,
+            "description": "Generates and executes tests",
+            "capabilities": [
+                AgentCapability.TEST_GENERATION,
+                AgentCapability.CODE_REVIEW
+            ],
+            "default_model_id": "gpt-4o-mini",
+            "prompt_template": "You are an expert software tester. Your task is to: {{task}}",
+            "parameters": {
+                "temperature": 0.2,
+                "max_tokens": 2000
+            },
+            "metadata": {},
+            "is_active": True
         },
-        "metadata": {},
-        "is_active": True
+        "security-agent": {
+            "id": "security-agent",
+            "name": "Security Agent",
+            "type": AgentType.SECURITY,
+            "description": "Reviews code for security vulnerabilities",
+            "capabilities": [
+                AgentCapability.SECURITY_ANALYSIS,
+                AgentCapability.CODE_REVIEW
+            ],
+            "default_model_id": "gpt-4o",
+            "prompt_template": "You are an expert application security reviewer. Your task is to: {{task}}",
+            "parameters": {
+                "temperature": 0.1,
+                "max_tokens": 2000
+            },
+            "metadata": {},
+            "is_active": True
+        }
     }
-}
+)
+
+# Agent JSON, validated and encoded once per version of an agent
+AGENT_JSON = RecordSerializer(AGENTS, AgentResponse)
+
+RESPONSE_CACHE = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+    ttl=settings.RESPONSE_CACHE_TTL,
+    directory=(
+        os.path.join(os.path.dirname(settings.VECTOR_DB_PATH), "response_cache")
+        if settings.RESPONSE_CACHE_DISK else None
+    ),
+    disk_max_entries=settings.RESPONSE_CACHE_DISK_MAX_ENTRIES,
+    disk_max_bytes=settings.RESPONSE_CACHE_DISK_MAX_BYTES,
+    sweep_interval=settings.RESPONSE_CACHE_DISK_SWEEP_INTERVAL,
+) if settings.RESPONSE_CACHE_ENABLED else None
+
+# Spend rollups per model, agent, workflow and day, written by the cost ledger
+COSTS = IndexedStore(order_by=("id",), indexes=(("scope",),))
+
+# Workers sharing an event bus share the daily budget too
+COST_LEDGER = create_cost_ledger(
+    settings.EVENT_BUS_BACKEND,
+    COSTS,
+    daily_limit=settings.COST_LIMIT_DAILY,
+    flush_interval=settings.COST_LEDGER_FLUSH_INTERVAL,
+    redis_host=settings.REDIS_HOST,
+    redis_port=settings.REDIS_PORT,
+    prefix=settings.COST_LEDGER_REDIS_PREFIX,
+)
+
+EXECUTOR = AgentExecutor(
+    models=MODELS,
+    providers=providers,
+    on_latency=MODEL_SELECTOR.record_latency,
+    cache=RESPONSE_CACHE,
+    ledger=COST_LEDGER,
+)
+
+def _active_agent(agent_id: str) -> Dict[str, Any]:
+    if agent_id not in AGENTS:
+        raise HTTPException(status_code=404, detail="Agent not found")
+
+    agent = AGENTS[agent_id]
+
+    # Check if agent is active
+    if not agent["is_active"]:
+        raise HTTPException(status_code=400, detail="Agent is not active")
+    return agent
+
+async def _sse_frames(frames: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    async for frame in frames:
+        yield f"event: {frame['type']}\ndata: {json.dumps(frame, default=str)}\n\n"
+
+async def _ndjson_frames(frames: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    async for frame in frames:
+        yield json.dumps(frame, default=str) + "\n"
 
 @router.post("/", response_model=AgentResponse)
 async def create_agent(agent: AgentCreate):
@@ -136,47 +228,65 @@ async def create_agent(agent: AgentCreate):
     
     AGENTS[agent_id] = agent_data
     
-    return AgentResponse(**agent_data)
+    return AGENT_JSON.response(agent_data)
 
 @router.get("/", response_model=List[AgentResponse])
 async def list_agents(
+    request: Request,
+    response: Response,
     type: Optional[AgentType] = None,
     capability: Optional[AgentCapability] = None,
     is_active: Optional[bool] = None,
     limit: int = Query(100, ge=1, le=1000),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's X-Next-Cursor header")
 ):
     """
     List available agents with optional filtering.
     """
-    filtered_agents = list(AGENTS.values())
-    
-    if type:
-        filtered_agents = [agent for agent in filtered_agents if agent["type"] == type]
-    
-    if capability:
-        filtered_agents = [agent for agent in filtered_agents if capability in agent["capabilities"]]
-    
-    if is_active is not None:
-        filtered_agents = [agent for agent in filtered_agents if agent["is_active"] == is_active]
-    
-    # Sort by name
-    filtered_agents.sort(key=lambda x: x["name"])
-    
-    # Apply pagination
-    paginated_agents = filtered_agents[offset:offset + limit]
+    # Sorted by name, then id
+    paginated_agents = paginate(
+        AGENTS,
+        response,
+        filters={"type": type, "capabilities": capability, "is_active": is_active},
+        limit=limit,
+        offset=offset,
+        cursor=cursor,
+    )
     
-    return [AgentResponse(**agent) for agent in paginated_agents]
+    return AGENT_JSON.list_response(paginated_agents, response, request=request)
+
+@router.get("/cache/stats", response_model=dict)
+async def get_response_cache_stats():
+    """
+    Get hit/miss counters and usage of the agent response cache, and how
+    many concurrent identical executions shared a provider call.
+    """
+    if RESPONSE_CACHE is None:
+        stats = {"enabled": False}
+    else:
+        stats = {"enabled": True, **RESPONSE_CACHE.stats()}
+    stats["coalescing"] = EXECUTOR.flights.stats()
+    return stats
+
+@router.get("/costs", response_model=dict)
+async def get_costs():
+    """
+    Get today's spend against COST_LIMIT_DAILY and the spend per model,
+    agent, workflow and day.
+    """
+    await COST_LEDGER.refresh()
+    return COST_LEDGER.summary()
 
 @router.get("/{agent_id}", response_model=AgentResponse)
-async def get_agent(agent_id: str):
+async def get_agent(agent_id: str, request: Request):
     """
     Get details of a specific agent.
     """
     if agent_id not in AGENTS:
         raise HTTPException(status_code=404, detail="Agent not found")
     
-    return AgentResponse(**AGENTS[agent_id])
+    return AGENT_JSON.response(AGENTS[agent_id], request=request)
 
 @router.patch("/{agent_id}", response_model=AgentResponse)
 async def update_agent(agent_id: str, agent_update: AgentUpdate):
@@ -196,7 +306,7 @@ async def update_agent(agent_id: str, agent_update: AgentUpdate):
     
     AGENTS[agent_id] = agent_data
     
-    return AgentResponse(**agent_data)
+    return AGENT_JSON.response(agent_data)
 
 @router.delete("/{agent_id}", response_model=dict)
 async def delete_agent(agent_id: str):
@@ -220,40 +330,42 @@ async def execute_agent(
     """
     Execute an agent on a specific task.
     """
-    if agent_id not in AGENTS:
-        raise HTTPException(status_code=404, detail="Agent not found")
-    
-    agent = AGENTS[agent_id]
-    
-    # Check if agent is active
-    if not agent["is_active"]:
-        raise HTTPException(status_code=400, detail="Agent is not active")
-    
-    # Use provided model_id or default
-    selected_model_id = model_id or agent["default_model_id"]
+    agent = _active_agent(agent_id)
     
-    # Merge provided parameters with agent defaults
-    merged_parameters = {**agent["parameters"]}
-    if parameters:
-        merged_parameters.update(parameters)
+    try:
+        return await EXECUTOR.run(agent, task, model_id=model_id, parameters=parameters)
+    except AgentExecutionError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@router.post("/{agent_id}/execute/stream")
+async def execute_agent_stream(
+    request: Request,
+    agent_id: str,
+    task: str,
+    model_id: Optional[str] = None,
+    parameters: Optional[Dict[str, Any]] = None
+):
+    """
+    Execute an agent on a specific task, streaming tokens as they are generated.
+
+    Responds with Server-Sent Events when the client accepts
+    ``text/event-stream`` and with newline-delimited JSON otherwise. Each
+    token arrives as a ``token`` frame; the last frame is a ``summary`` with
+    the full result and its cost, or an ``error`` if the provider failed.
+    """
+    agent = _active_agent(agent_id)
     
-    # In a real implementation, we would:
-    # 1. Prepare the prompt using the agent's template
-    # 2. Call the selected model with the prompt
-    # 3. Process the response
-    # 4. Return the result
+    try:
+        frames = EXECUTOR.stream(agent, task, model_id=model_id, parameters=parameters)
+    except AgentExecutionError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     
-    # For now, return a mock response
-    return {
-        "agent_id": agent_id,
-        "task": task,
-        "model_id": selected_model_id,
-        "parameters": merged_parameters,
-        "status": "completed",
-        "result": f"Mock result for task: {task}",
-        "cost": {
-            "prompt_tokens": 100,
-            "completion_tokens": 200,
-            "total_cost": 0.005
-        }
-    }
+    # Disable caching and proxy buffering so each frame is flushed immediately
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            _sse_frames(frames), media_type="text/event-stream", headers=headers
+        )
+    return StreamingResponse(
+        _ndjson_frames(frames), media_type="application/x-ndjson", headers=headers
+    )
@@ -1,124 +1,117 @@
 from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel, Field
-from enum import Enum
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 import uuid
 
-router = APIRouter()
-
-class ModelProvider(str, Enum):
-    OPENAI = "openai"
-    ANTHROPIC = "anthropic"
-    LOCAL = "local"
-    CUSTOM = "custom"
+from app.api.pagination import paginate
+from app.api.serialization import RecordSerializer
+from app.core.config import settings
+from app.core.store import IndexedStore
+from app.models.model import (
+    ModelProvider,
+    ModelCapability,
+    ModelCreate,
+    ModelUpdate,
+    ModelResponse,
+    TokenEstimateRequest,
+)
+from app.services.model_selector import (
+    DEFAULT_COMPLETION_TOKENS,
+    DEFAULT_PROMPT_TOKENS,
+    ModelSelector,
+    TASK_CAPABILITIES,
+    capability_mask,
+    quality_score,
+)
+from app.services.fake_provider import fake_profile
+from app.services.providers import providers
+from app.services.tokens import token_counter
 
-class ModelCapability(str, Enum):
-    TEXT = "text"
-    CODE = "code"
-    REASONING = "reasoning"
-    PLANNING = "planning"
-    VISION = "vision"
-    AUDIO = "audio"
+router = APIRouter()
 
-class ModelCreate(BaseModel):
-    name: str = Field(..., min_length=1, max_length=100)
-    provider: ModelProvider
-    model_id: str = Field(..., description="Provider's model identifier")
-    capabilities: List[ModelCapability]
-    context_window: int = Field(..., gt=0)
-    cost_per_prompt_token: float = Field(..., ge=0)
-    cost_per_completion_token: float = Field(..., ge=0)
-    max_tokens: Optional[int] = Field(None, gt=0)
-    description: Optional[str] = None
-    metadata: Optional[Dict[str, Any]] = None
+# Mock data for development, indexed for filtered listing by name
+MODELS = IndexedStore(
+    order_by=("name",),
+    indexes=(("provider",), ("capabilities",), ("is_active",)),
+    records={
+        "gpt-4o": {
+            "id": "gpt-4o",
+            "name": "GPT-4o",
+            "provider": ModelProvider.OPENAI,
+            "model_id": "gpt-4o",
+            "capabilities": [
+                ModelCapability.TEXT,
+                ModelCapability.CODE,
+                ModelCapability.REASONING,
+                ModelCapability.PLANNING,
+                ModelCapability.VISION
+            ],
+            "context_window": 128000,
+            "cost_per_prompt_token": 0.00001,
+            "cost_per_completion_token": 0.00003,
+            "max_tokens": 4096,
+            "description": "OpenAI's GPT-4o model",
+            "metadata": {},
+            "is_active": True
+        },
+        "gpt-4o-mini": {
+            "id": "gpt-4o-mini",
+            "name": "GPT-4o Mini",
+            "provider": ModelProvider.OPENAI,
+            "model_id": "gpt-4o-mini",
+            "capabilities": [
+                ModelCapability.TEXT,
+                ModelCapability.CODE,
+                ModelCapability.REASONING,
+                ModelCapability.PLANNING
+            ],
+            "context_window": 128000,
+            "cost_per_prompt_token": 0.000005,
+            "cost_per_completion_token": 0.000015,
+            "max_tokens": 4096,
+            "description": "OpenAI's GPT-4o Mini model",
+            "metadata": {},
+            "is_active": True
+        },
+        "claude-3-opus": {
+            "id": "claude-3-opus",
+            "name": "Claude 3 Opus",
+            "provider": ModelProvider.ANTHROPIC,
+            "model_id": "claude-3-opus-20240229",
+            "capabilities": [
+                ModelCapability.TEXT,
+                ModelCapability.CODE,
+                ModelCapability.REASONING,
+                ModelCapability.PLANNING,
+                ModelCapability.VISION
+            ],
+            "context_window": 200000,
+            "cost_per_prompt_token": 0.000015,
+            "cost_per_completion_token": 0.000075,
+            "max_tokens": 4096,
+            "description": "Anthropic's Claude 3 Opus model",
+            "metadata": {},
+            "is_active": True
+        }
+    }
+)
 
-class ModelUpdate(BaseModel):
-    name: Optional[str] = Field(None, min_length=1, max_length=100)
-    capabilities: Optional[List[ModelCapability]] = None
-    context_window: Optional[int] = Field(None, gt=0)
-    cost_per_prompt_token: Optional[float] = Field(None, ge=0)
-    cost_per_completion_token: Optional[float] = Field(None, ge=0)
-    max_tokens: Optional[int] = Field(None, gt=0)
-    description: Optional[str] = None
-    metadata: Optional[Dict[str, Any]] = None
-    is_active: Optional[bool] = None
+# Model JSON, validated and encoded once per version of a model
+MODEL_JSON = RecordSerializer(MODELS, ModelResponse)
 
-class ModelResponse(BaseModel):
-    id: str
-    name: str
-    provider: ModelProvider
-    model_id: str
-    capabilities: List[ModelCapability]
-    context_window: int
-    cost_per_prompt_token: float
-    cost_per_completion_token: float
-    max_tokens: Optional[int] = None
-    description: Optional[str] = None
-    metadata: Optional[Dict[str, Any]] = None
-    is_active: bool = True
+# Vectorized view of MODELS used to rank models for a request
+MODEL_SELECTOR = ModelSelector(MODELS)
 
-# Mock data for development
-MODELS = {
-    "gpt-4o": {
-        "id": "gpt-4o",
-        "name": "GPT-4o",
-        "provider": ModelProvider.OPENAI,
-        "model_id": "gpt-4o",
-        "capabilities": [
-            ModelCapability.TEXT,
-            ModelCapability.CODE,
-            ModelCapability.REASONING,
-            ModelCapability.PLANNING,
-            ModelCapability.VISION
-        ],
-        "context_window": 128000,
-        "cost_per_prompt_token": 0.00001,
-        "cost_per_completion_token": 0.00003,
-        "max_tokens": 4096,
-        "description": "OpenAI's GPT-4o model",
-        "metadata": {},
-        "is_active": True
-    },
-    "gpt-4o-mini": {
-        "id": "gpt-4o-mini",
-        "name": "GPT-4o Mini",
-        "provider": ModelProvider.OPENAI,
-        "model_id": "gpt-4o-mini",
-        "capabilities": [
-            ModelCapability.TEXT,
-            ModelCapability.CODE,
-            ModelCapability.REASONING,
-            ModelCapability.PLANNING
-        ],
-        "context_window": 128000,
-        "cost_per_prompt_token": 0.000005,
-        "cost_per_completion_token": 0.000015,
-        "max_tokens": 4096,
-        "description": "OpenAI's GPT-4o Mini model",
-        "metadata": {},
-        "is_active": True
-    },
-    "claude-3-opus": {
-        "id": "claude-3-opus",
-        "name": "Claude 3 Opus",
-        "provider": ModelProvider.ANTHROPIC,
-        "model_id": "claude-3-opus-20240229",
-        "capabilities": [
-            ModelCapability.TEXT,
-            ModelCapability.CODE,
-            ModelCapability.REASONING,
-            ModelCapability.PLANNING,
-            ModelCapability.VISION
-        ],
-        "context_window": 200000,
-        "cost_per_prompt_token": 0.000015,
-        "cost_per_completion_token": 0.000075,
-        "max_tokens": 4096,
-        "description": "Anthropic's Claude 3 Opus model",
-        "metadata": {},
-        "is_active": True
-    }
-}
+def _validate_metadata(model_data: dict) -> None:
+    """
+    Reject a quality score, or a fake provider profile, in the model's
+    metadata that model selection or the fake provider could not use.
+    """
+    try:
+        quality_score(model_data.get("metadata"))
+        if "fake_provider" in (model_data.get("metadata") or {}):
+            fake_profile(model_data, settings.FAKE_PROVIDER_PROFILE)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/", response_model=ModelResponse)
 async def create_model(model: ModelCreate):
@@ -141,50 +134,62 @@ async def create_model(model: ModelCreate):
         "metadata": model.metadata or {},
         "is_active": True
     }
+    _validate_metadata(model_data)
     
     MODELS[model_id] = model_data
     
-    return ModelResponse(**model_data)
+    return MODEL_JSON.response(model_data)
 
 @router.get("/", response_model=List[ModelResponse])
 async def list_models(
+    request: Request,
+    response: Response,
     provider: Optional[ModelProvider] = None,
     capability: Optional[ModelCapability] = None,
     is_active: Optional[bool] = None,
     limit: int = Query(100, ge=1, le=1000),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's X-Next-Cursor header")
 ):
     """
     List available AI models with optional filtering.
     """
-    filtered_models = list(MODELS.values())
-    
-    if provider:
-        filtered_models = [model for model in filtered_models if model["provider"] == provider]
-    
-    if capability:
-        filtered_models = [model for model in filtered_models if capability in model["capabilities"]]
-    
-    if is_active is not None:
-        filtered_models = [model for model in filtered_models if model["is_active"] == is_active]
-    
-    # Sort by name
-    filtered_models.sort(key=lambda x: x["name"])
+    # Sorted by name, then id
+    paginated_models = paginate(
+        MODELS,
+        response,
+        filters={"provider": provider, "capabilities": capability, "is_active": is_active},
+        limit=limit,
+        offset=offset,
+        cursor=cursor,
+    )
     
-    # Apply pagination
-    paginated_models = filtered_models[offset:offset + limit]
-    
-    return [ModelResponse(**model) for model in paginated_models]
+    return MODEL_JSON.list_response(paginated_models, response, request=request)
+
+@router.get("/tokens/stats", response_model=dict)
+async def get_token_counter_stats():
+    """
+    Get the loaded tokenizers and hit/miss counters of the token count cache.
+    """
+    return token_counter.stats()
+
+@router.get("/providers/stats", response_model=dict)
+async def get_provider_stats():
+    """
+    Get the requests in flight to each provider, and the calls, failures and
+    tokens of each model served by the fake provider.
+    """
+    return providers.stats()
 
 @router.get("/{model_id}", response_model=ModelResponse)
-async def get_model(model_id: str):
+async def get_model(model_id: str, request: Request):
     """
     Get details of a specific AI model.
     """
     if model_id not in MODELS:
         raise HTTPException(status_code=404, detail="Model not found")
     
-    return ModelResponse(**MODELS[model_id])
+    return MODEL_JSON.response(MODELS[model_id], request=request)
 
 @router.patch("/{model_id}", response_model=ModelResponse)
 async def update_model(model_id: str, model_update: ModelUpdate):
@@ -198,13 +203,14 @@ async def update_model(model_id: str, model_update: ModelUpdate):
     
     # Update fields if provided
     update_data = model_update.dict(exclude_unset=True)
+    _validate_metadata({**model_data, **update_data})
     for key, value in update_data.items():
         if value is not None:
             model_data[key] = value
     
     MODELS[model_id] = model_data
     
-    return ModelResponse(**model_data)
+    return MODEL_JSON.response(model_data)
 
 @router.delete("/{model_id}", response_model=dict)
 async def delete_model(model_id: str):
@@ -222,10 +228,15 @@ async def delete_model(model_id: str):
 async def select_model_for_task(
     model_id: str,
     task_type: str,
-    context_size: Optional[int] = None
+    context_size: Optional[int] = None,
+    prompt: Optional[str] = None,
+    completion_tokens: Optional[int] = Query(None, gt=0)
 ):
     """
     Select a model for a specific task based on requirements.
+
+    The cost is estimated from the prompt's token count when ``prompt`` is
+    given, and from ``context_size`` otherwise.
     """
     if model_id not in MODELS:
         raise HTTPException(status_code=404, detail="Model not found")
@@ -243,14 +254,58 @@ async def select_model_for_task(
             detail=f"Context size {context_size} exceeds model's context window {model['context_window']}"
         )
     
-    # In a real implementation, we would check if the model has the required capabilities for the task
+    if prompt is not None:
+        prompt_tokens = token_counter.count(prompt, model)
+        if prompt_tokens > model["context_window"]:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Prompt of {prompt_tokens} tokens exceeds model's context window {model['context_window']}"
+            )
+    else:
+        prompt_tokens = context_size or DEFAULT_PROMPT_TOKENS
+    completion_tokens = completion_tokens or model.get("max_tokens") or DEFAULT_COMPLETION_TOKENS
+    estimate = token_counter.estimate(model, prompt_tokens, completion_tokens)
+    
+    # Check if the model has the capabilities the task type needs
+    required = capability_mask(TASK_CAPABILITIES.get(task_type, []))
+    if capability_mask(model["capabilities"]) & required != required:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Model {model_id} lacks capabilities required for {task_type} tasks"
+        )
     
     return {
         "message": f"Model {model_id} selected for task",
         "model": ModelResponse(**model),
         "estimated_cost": {
-            "prompt_tokens": 0,  # Would be calculated based on task
-            "completion_tokens": 0,  # Would be calculated based on task
-            "total": 0  # Would be calculated based on task
+            "prompt_tokens": estimate["prompt_tokens"],
+            "completion_tokens": estimate["completion_tokens"],
+            "total": estimate["total_cost"]
         }
     }
+
+@router.post("/{model_id}/estimate", response_model=dict)
+async def estimate_prompts(model_id: str, request: TokenEstimateRequest):
+    """
+    Count the tokens of a batch of prompts for a model and estimate their cost.
+    """
+    if model_id not in MODELS:
+        raise HTTPException(status_code=404, detail="Model not found")
+    
+    model = MODELS[model_id]
+    completion_tokens = (
+        request.completion_tokens or model.get("max_tokens") or DEFAULT_COMPLETION_TOKENS
+    )
+    
+    estimates = []
+    for prompt_tokens in token_counter.count_batch(request.prompts, model):
+        estimate = token_counter.estimate(model, prompt_tokens, completion_tokens)
+        estimate["fits_context"] = prompt_tokens + completion_tokens <= model["context_window"]
+        estimates.append(estimate)
+    
+    return {
+        "model_id": model_id,
+        "tokenizer": token_counter.encoder(model).name,
+        "estimates": estimates,
+        "total_cost": sum(estimate["total_cost"] for estimate in estimates),
+    }
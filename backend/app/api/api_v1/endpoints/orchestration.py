@@ -1,137 +1,128 @@
 from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Query
-from pydantic import BaseModel, Field
-from enum import Enum
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, Request, Response
+import logging
 import uuid
 from datetime import datetime
 
-router = APIRouter()
-
-class WorkflowType(str, Enum):
-    SEQUENTIAL = "sequential"
-    PARALLEL = "parallel"
-    CONDITIONAL = "conditional"
-    CUSTOM = "custom"
-
-class WorkflowStatus(str, Enum):
-    PENDING = "pending"
-    IN_PROGRESS = "in_progress"
-    COMPLETED = "completed"
-    FAILED = "failed"
-
-class WorkflowStepType(str, Enum):
-    AGENT = "agent"
-    HUMAN = "human"
-    CONDITION = "condition"
-    LOOP = "loop"
-
-class WorkflowStep(BaseModel):
-    id: str
-    type: WorkflowStepType
-    name: str
-    description: Optional[str] = None
-    agent_id: Optional[str] = None
-    parameters: Optional[Dict[str, Any]] = None
-    next_steps: Optional[List[str]] = None
-    condition: Optional[str] = None
-
-class WorkflowCreate(BaseModel):
-    name: str = Field(..., min_length=1, max_length=100)
-    description: str = Field(..., min_length=1)
-    type: WorkflowType
-    steps: List[WorkflowStep]
-    parameters: Optional[Dict[str, Any]] = None
-    metadata: Optional[Dict[str, Any]] = None
-
-class WorkflowUpdate(BaseModel):
-    name: Optional[str] = Field(None, min_length=1, max_length=100)
-    description: Optional[str] = None
-    steps: Optional[List[WorkflowStep]] = None
-    parameters: Optional[Dict[str, Any]] = None
-    metadata: Optional[Dict[str, Any]] = None
-    is_active: Optional[bool] = None
+from app.api.api_v1.endpoints.agents import AGENTS, EXECUTOR
+from app.api.api_v1.endpoints.models import MODEL_SELECTOR
+from app.api.pagination import paginate
+from app.api.serialization import RecordSerializer
+from app.core.config import settings
+from app.core.store import IndexedStore
+from app.db.event_log import ExecutionEventLog
+from app.models.workflow import (
+    WorkflowType,
+    WorkflowStatus,
+    WorkflowStepType,
+    WorkflowStepReview,
+    WorkflowCreate,
+    WorkflowUpdate,
+    WorkflowResponse,
+    WorkflowExecutionCreate,
+    WorkflowExecutionResponse,
+)
+from app.services.event_bus import WORKER_ID
+from app.services.model_selector import TASK_CAPABILITIES, reason_not_selected
+from app.services.tokens import token_counter
+from app.services.workflow_engine import WorkflowEngine, WorkflowExecutionError
+from app.services.workflow_plan import PlanCache, WorkflowPlanError, compile_plan
 
-class WorkflowResponse(BaseModel):
-    id: str
-    name: str
-    description: str
-    type: WorkflowType
-    steps: List[WorkflowStep]
-    parameters: Dict[str, Any]
-    metadata: Dict[str, Any]
-    is_active: bool
-    created_at: datetime
-    updated_at: datetime
-
-class WorkflowExecutionCreate(BaseModel):
-    workflow_id: str
-    input_data: Dict[str, Any]
-    parameters: Optional[Dict[str, Any]] = None
+router = APIRouter()
 
-class WorkflowExecutionResponse(BaseModel):
-    id: str
-    workflow_id: str
-    status: WorkflowStatus
-    current_step_id: Optional[str] = None
-    input_data: Dict[str, Any]
-    output_data: Optional[Dict[str, Any]] = None
-    parameters: Dict[str, Any]
-    error: Optional[str] = None
-    cost: float = 0.0
-    created_at: datetime
-    updated_at: datetime
-    completed_at: Optional[datetime] = None
+logger = logging.getLogger(__name__)
 
-# Mock data for development
-WORKFLOWS = {
-    "code-review-workflow": {
-        "id": "code-review-workflow",
-        "name": "Code Review Workflow",
-        "description": "Automated code review workflow",
-        "type": WorkflowType.SEQUENTIAL,
-        "steps": [
-            {
-                "id": "step1",
-                "type": WorkflowStepType.AGENT,
-                "name": "Code Analysis",
-                "description": "Analyze code for issues",
-                "agent_id": "code-agent",
-                "parameters": {
-                    "focus": "quality"
+# Mock data for development, indexed for filtered listing
+WORKFLOWS = IndexedStore(
+    order_by=("name",),
+    indexes=(("type",), ("is_active",)),
+    records={
+        "code-review-workflow": {
+            "id": "code-review-workflow",
+            "name": "Code Review Workflow",
+            "description": "Automated code review workflow",
+            "type": WorkflowType.SEQUENTIAL,
+            "steps": [
+                {
+                    "id": "step1",
+                    "type": WorkflowStepType.AGENT,
+                    "name": "Code Analysis",
+                    "description": "Analyze code for issues",
+                    "agent_id": "code-agent",
+                    "parameters": {
+                        "focus": "quality"
+                    },
+                    "next_steps": ["step2"]
                 },
-                "next_steps": ["step2"]
-            },
-            {
-                "id": "step2",
-                "type": WorkflowStepType.AGENT,
-                "name": "Security Check",
-                "description": "Check for security vulnerabilities",
-                "agent_id": "security-agent",
-                "parameters": {
-                    "focus": "security"
+                {
+                    "id": "step2",
+                    "type": WorkflowStepType.AGENT,
+                    "name": "Security Check",
+                    "description": "Check for security vulnerabilities",
+                    "agent_id": "security-agent",
+                    "parameters": {
+                        "focus": "security"
+                    },
+                    "next_steps": ["step3"]
                 },
-                "next_steps": ["step3"]
+                {
+                    "id": "step3",
+                    "type": WorkflowStepType.HUMAN,
+                    "name": "Human Review",
+                    "description": "Human review of AI findings",
+                    "parameters": {},
+                    "next_steps": None
+                }
+            ],
+            "parameters": {
+                "timeout": 3600
             },
-            {
-                "id": "step3",
-                "type": WorkflowStepType.HUMAN,
-                "name": "Human Review",
-                "description": "Human review of AI findings",
-                "parameters": {},
-                "next_steps": None
-            }
-        ],
-        "parameters": {
-            "timeout": 3600
-        },
-        "metadata": {},
-        "is_active": True,
-        "created_at": datetime.now(),
-        "updated_at": datetime.now()
+            "metadata": {},
+            "is_active": True,
+            "created_at": datetime.now(),
+            "updated_at": datetime.now()
+        }
     }
-}
+)
+
+WORKFLOW_EXECUTIONS = IndexedStore(
+    order_by=("created_at",),
+    indexes=(("workflow_id",), ("status",), ("workflow_id", "status")),
+)
+
+# Workflow and execution JSON, validated and encoded once per record version
+WORKFLOW_JSON = RecordSerializer(WORKFLOWS, WorkflowResponse)
+EXECUTION_JSON = RecordSerializer(WORKFLOW_EXECUTIONS, WorkflowExecutionResponse)
+
+# Append-only log of execution changes; loaded and attached at startup.
+# Its files belong to one process, so workers sharing an event bus persist
+# executions through the repository instead.
+EXECUTION_LOG = None
+if settings.EXECUTION_LOG_ENABLED and settings.EVENT_BUS_BACKEND != "memory":
+    logger.warning(
+        "EXECUTION_LOG_ENABLED is ignored with EVENT_BUS_BACKEND=%s; "
+        "executions are persisted by PERSISTENCE_BACKEND",
+        settings.EVENT_BUS_BACKEND,
+    )
+elif settings.EXECUTION_LOG_ENABLED:
+    EXECUTION_LOG = ExecutionEventLog(
+        directory=settings.EXECUTION_LOG_DIR,
+        segment_bytes=settings.EXECUTION_LOG_SEGMENT_BYTES,
+        snapshot_events=settings.EXECUTION_LOG_SNAPSHOT_EVENTS,
+    )
+
+# Compiled step plans, reused until a workflow's updated_at changes
+PLANS = PlanCache()
 
-WORKFLOW_EXECUTIONS = {}
+engine = WorkflowEngine(
+    workflows=WORKFLOWS,
+    executions=WORKFLOW_EXECUTIONS,
+    agents=AGENTS,
+    executor=EXECUTOR,
+    plans=PLANS,
+    max_concurrency=settings.WORKFLOW_MAX_CONCURRENCY,
+    owner=WORKER_ID,
+)
 
 @router.post("/workflows", response_model=WorkflowResponse)
 async def create_workflow(workflow: WorkflowCreate):
@@ -146,7 +137,7 @@ async def create_workflow(workflow: WorkflowCreate):
         "name": workflow.name,
         "description": workflow.description,
         "type": workflow.type,
-        "steps": workflow.steps,
+        "steps": [step.dict() for step in workflow.steps],
         "parameters": workflow.parameters or {},
         "metadata": workflow.metadata or {},
         "is_active": True,
@@ -154,45 +145,50 @@ async def create_workflow(workflow: WorkflowCreate):
         "updated_at": now
     }
     
+    # Validate and compile the steps once, up front
+    try:
+        PLANS.put(workflow_data)
+    except WorkflowPlanError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     WORKFLOWS[workflow_id] = workflow_data
     
-    return WorkflowResponse(**workflow_data)
+    return WORKFLOW_JSON.response(workflow_data)
 
 @router.get("/workflows", response_model=List[WorkflowResponse])
 async def list_workflows(
+    request: Request,
+    response: Response,
     type: Optional[WorkflowType] = None,
     is_active: Optional[bool] = None,
     limit: int = Query(100, ge=1, le=1000),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's X-Next-Cursor header")
 ):
     """
     List available workflows with optional filtering.
     """
-    filtered_workflows = list(WORKFLOWS.values())
-    
-    if type:
-        filtered_workflows = [wf for wf in filtered_workflows if wf["type"] == type]
-    
-    if is_active is not None:
-        filtered_workflows = [wf for wf in filtered_workflows if wf["is_active"] == is_active]
-    
-    # Sort by name
-    filtered_workflows.sort(key=lambda x: x["name"])
-    
-    # Apply pagination
-    paginated_workflows = filtered_workflows[offset:offset + limit]
-    
-    return [WorkflowResponse(**wf) for wf in paginated_workflows]
+    # Sorted by name, then id
+    paginated_workflows = paginate(
+        WORKFLOWS,
+        response,
+        filters={"type": type, "is_active": is_active},
+        limit=limit,
+        offset=offset,
+        cursor=cursor,
+    )
+    
+    return WORKFLOW_JSON.list_response(paginated_workflows, response, request=request)
 
 @router.get("/workflows/{workflow_id}", response_model=WorkflowResponse)
-async def get_workflow(workflow_id: str):
+async def get_workflow(workflow_id: str, request: Request):
     """
     Get details of a specific workflow.
     """
     if workflow_id not in WORKFLOWS:
         raise HTTPException(status_code=404, detail="Workflow not found")
     
-    return WorkflowResponse(**WORKFLOWS[workflow_id])
+    return WORKFLOW_JSON.response(WORKFLOWS[workflow_id], request=request)
 
 @router.patch("/workflows/{workflow_id}", response_model=WorkflowResponse)
 async def update_workflow(workflow_id: str, workflow_update: WorkflowUpdate):
@@ -206,6 +202,14 @@ async def update_workflow(workflow_id: str, workflow_update: WorkflowUpdate):
     
     # Update fields if provided
     update_data = workflow_update.dict(exclude_unset=True)
+    
+    # Reject invalid steps before touching the stored workflow
+    if update_data.get("steps") is not None:
+        try:
+            compile_plan(update_data["steps"])
+        except WorkflowPlanError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
     for key, value in update_data.items():
         if value is not None:
             workflow_data[key] = value
@@ -213,8 +217,9 @@ async def update_workflow(workflow_id: str, workflow_update: WorkflowUpdate):
     workflow_data["updated_at"] = datetime.now()
     
     WORKFLOWS[workflow_id] = workflow_data
+    PLANS.invalidate(workflow_id)
     
-    return WorkflowResponse(**workflow_data)
+    return WORKFLOW_JSON.response(workflow_data)
 
 @router.delete("/workflows/{workflow_id}", response_model=dict)
 async def delete_workflow(workflow_id: str):
@@ -225,6 +230,7 @@ async def delete_workflow(workflow_id: str):
         raise HTTPException(status_code=404, detail="Workflow not found")
     
     del WORKFLOWS[workflow_id]
+    PLANS.invalidate(workflow_id)
     
     return {"message": f"Workflow {workflow_id} deleted successfully"}
 
@@ -249,7 +255,12 @@ async def execute_workflow(
     if not workflow["steps"]:
         raise HTTPException(status_code=400, detail="Workflow has no steps")
     
-    first_step = workflow["steps"][0]
+    try:
+        plan = PLANS.get(workflow)
+    except WorkflowPlanError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    first_step = plan.steps[plan.entry_steps[0]]
     
     execution_id = str(uuid.uuid4())
     now = datetime.now()
@@ -269,6 +280,8 @@ async def execute_workflow(
         "parameters": merged_parameters,
         "error": None,
         "cost": 0.0,
+        "checkpoints": {},
+        "owner": WORKER_ID,
         "created_at": now,
         "updated_at": now,
         "completed_at": None
@@ -276,49 +289,62 @@ async def execute_workflow(
     
     WORKFLOW_EXECUTIONS[execution_id] = execution_data
     
-    # In a real implementation, we would add the execution to a queue for processing
-    # background_tasks.add_task(process_workflow_execution, execution_id)
-    
-    # For now, simulate starting the execution
+    # The engine walks the steps in the background; report the run as started
     execution_data["status"] = WorkflowStatus.IN_PROGRESS
+    WORKFLOW_EXECUTIONS[execution_id] = execution_data
+    engine.start(execution_id)
     
-    return WorkflowExecutionResponse(**execution_data)
+    return EXECUTION_JSON.response(execution_data)
 
 @router.get("/executions", response_model=List[WorkflowExecutionResponse])
 async def list_executions(
+    request: Request,
+    response: Response,
     workflow_id: Optional[str] = None,
     status: Optional[WorkflowStatus] = None,
     limit: int = Query(100, ge=1, le=1000),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's X-Next-Cursor header")
 ):
     """
     List workflow executions with optional filtering.
     """
-    filtered_executions = list(WORKFLOW_EXECUTIONS.values())
-    
-    if workflow_id:
-        filtered_executions = [ex for ex in filtered_executions if ex["workflow_id"] == workflow_id]
-    
-    if status:
-        filtered_executions = [ex for ex in filtered_executions if ex["status"] == status]
-    
-    # Sort by created_at (newest first)
-    filtered_executions.sort(key=lambda x: x["created_at"], reverse=True)
-    
-    # Apply pagination
-    paginated_executions = filtered_executions[offset:offset + limit]
-    
-    return [WorkflowExecutionResponse(**ex) for ex in paginated_executions]
+    # Newest first, read straight from the created_at ordered index
+    paginated_executions = paginate(
+        WORKFLOW_EXECUTIONS,
+        response,
+        filters={"workflow_id": workflow_id, "status": status},
+        limit=limit,
+        offset=offset,
+        cursor=cursor,
+        descending=True,
+    )
+    
+    return EXECUTION_JSON.list_response(paginated_executions, response, request=request)
 
 @router.get("/executions/{execution_id}", response_model=WorkflowExecutionResponse)
-async def get_execution(execution_id: str):
+async def get_execution(execution_id: str, request: Request):
     """
     Get details of a specific workflow execution.
     """
     if execution_id not in WORKFLOW_EXECUTIONS:
         raise HTTPException(status_code=404, detail="Workflow execution not found")
     
-    return WorkflowExecutionResponse(**WORKFLOW_EXECUTIONS[execution_id])
+    return EXECUTION_JSON.response(WORKFLOW_EXECUTIONS[execution_id], request=request)
+
+@router.get("/executions/{execution_id}/events", response_model=List[dict])
+async def get_execution_events(execution_id: str):
+    """
+    Get the audit trail of a workflow execution from the execution event log.
+    """
+    if EXECUTION_LOG is None:
+        raise HTTPException(status_code=400, detail="Execution event log is not enabled")
+    
+    events = EXECUTION_LOG.history(execution_id)
+    if not events and execution_id not in WORKFLOW_EXECUTIONS:
+        raise HTTPException(status_code=404, detail="Workflow execution not found")
+    
+    return events
 
 @router.post("/executions/{execution_id}/cancel", response_model=WorkflowExecutionResponse)
 async def cancel_execution(execution_id: str):
@@ -331,7 +357,11 @@ async def cancel_execution(execution_id: str):
     execution = WORKFLOW_EXECUTIONS[execution_id]
     
     # Check if execution can be cancelled
-    if execution["status"] not in [WorkflowStatus.PENDING, WorkflowStatus.IN_PROGRESS]:
+    if execution["status"] not in [
+        WorkflowStatus.PENDING,
+        WorkflowStatus.IN_PROGRESS,
+        WorkflowStatus.AWAITING_REVIEW,
+    ]:
         raise HTTPException(
             status_code=400, 
             detail=f"Cannot cancel execution with status {execution['status']}"
@@ -340,11 +370,33 @@ async def cancel_execution(execution_id: str):
     # Update execution status
     execution["status"] = WorkflowStatus.FAILED
     execution["error"] = "Cancelled by user"
+    execution["awaiting_review"] = None
     execution["updated_at"] = datetime.now()
     
     WORKFLOW_EXECUTIONS[execution_id] = execution
     
-    return WorkflowExecutionResponse(**execution)
+    # Stop any steps still running for this execution
+    engine.cancel(execution_id)
+    
+    return EXECUTION_JSON.response(execution)
+
+@router.post(
+    "/executions/{execution_id}/steps/{step_id}/review",
+    response_model=WorkflowExecutionResponse,
+)
+async def review_execution_step(execution_id: str, step_id: str, review: WorkflowStepReview):
+    """
+    Approve or reject a human step of a workflow execution awaiting review.
+    """
+    if execution_id not in WORKFLOW_EXECUTIONS:
+        raise HTTPException(status_code=404, detail="Workflow execution not found")
+    
+    try:
+        execution = engine.review(execution_id, step_id, review.approved, review.comment)
+    except WorkflowExecutionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return EXECUTION_JSON.response(execution)
 
 @router.post("/model-selection", response_model=dict)
 async def select_optimal_model(
@@ -352,41 +404,62 @@ async def select_optimal_model(
     required_capabilities: List[str],
     context_size: Optional[int] = None,
     cost_sensitivity: float = Query(0.5, ge=0.0, le=1.0),
-    preferred_provider: Optional[str] = None
+    preferred_provider: Optional[str] = None,
+    prompt: Optional[str] = None,
+    completion_tokens: Optional[int] = Query(None, gt=0)
 ):
     """
     Select the optimal model for a given task based on requirements and preferences.
+
+    The capabilities the task type needs are required on top of
+    ``required_capabilities``. With ``prompt``, costs are estimated from its
+    token count and models whose context window cannot hold it are left out.
     """
-    # In a real implementation, this would:
-    # 1. Query available models
-    # 2. Filter by required capabilities
-    # 3. Filter by context size
-    # 4. Apply cost sensitivity and other preferences
-    # 5. Return the best model
-    
-    # For now, return a mock response
+    # Deduplicated, keeping the caller's order first
+    capabilities = list(dict.fromkeys(
+        [*required_capabilities, *(c.value for c in TASK_CAPABILITIES.get(task_type, []))]
+    ))
+    prompt_tokens = token_counter.count(prompt) if prompt is not None else None
+    try:
+        ranked = MODEL_SELECTOR.select(
+            required_capabilities=capabilities,
+            context_size=context_size or prompt_tokens,
+            cost_sensitivity=cost_sensitivity,
+            preferred_provider=preferred_provider,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not ranked:
+        raise HTTPException(status_code=404, detail="No active model meets the requirements")
+    
+    def describe(entry: Dict[str, Any]) -> Dict[str, Any]:
+        model = entry["model"]
+        return {
+            "id": model["id"],
+            "name": model["name"],
+            "provider": model["provider"],
+            "capabilities": model["capabilities"],
+            "context_window": model["context_window"],
+            "cost_per_token": entry["estimated_cost"] / entry["tokens"],
+            "score": entry["score"],
+        }
+    
+    selected = ranked[0]
+    
     return {
-        "selected_model": {
-            "id": "gpt-4o-mini",
-            "name": "GPT-4o Mini",
-            "provider": "openai",
-            "capabilities": ["text", "code", "reasoning", "planning"],
-            "context_window": 128000,
-            "cost_per_token": 0.00001,
-        },
+        "selected_model": describe(selected),
         "alternatives": [
             {
-                "id": "gpt-4o",
-                "name": "GPT-4o",
-                "provider": "openai",
-                "capabilities": ["text", "code", "reasoning", "planning", "vision"],
-                "context_window": 128000,
-                "cost_per_token": 0.00003,
-                "reason_not_selected": "Higher cost"
+                **describe(entry),
+                "reason_not_selected": reason_not_selected(entry, selected, preferred_provider),
             }
+            for entry in ranked[1:]
         ],
         "estimated_cost": {
-            "tokens": context_size or 1000,
-            "cost": 0.01
+            "tokens": selected["tokens"],
+            "cost": selected["estimated_cost"]
         }
     }
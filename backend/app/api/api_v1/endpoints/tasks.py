@@ -1,10 +1,22 @@
-from typing import List, Optional
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, Query
+from typing import List, Optional, Set
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, Query, Request, Response
 from pydantic import BaseModel, Field
 from enum import Enum
 from datetime import datetime
+import json
 import uuid
 
+from app.api.pagination import paginate
+from app.api.serialization import RecordSerializer
+from app.api.api_v1.endpoints.agents import AGENTS, EXECUTOR
+from app.core.config import settings
+from app.core.store import IndexedStore
+from app.services.agent_executor import AgentExecutionError
+from app.services.event_bus import WORKER_ID
+from app.services.postprocessing import ResultProcessor
+from app.services.progress import ProgressCoalescer
+from app.services.scheduler import TaskScheduler
+
 router = APIRouter()
 
 class TaskType(str, Enum):
@@ -40,6 +52,12 @@ class TaskUpdate(BaseModel):
     status: Optional[TaskStatus] = None
     context: Optional[dict] = None
 
+class ProgressReport(BaseModel):
+    progress: float = Field(..., ge=0.0, le=1.0)
+
+class BatchProgressReport(ProgressReport):
+    task_id: str
+
 class TaskResponse(BaseModel):
     id: str
     type: TaskType
@@ -55,8 +73,151 @@ class TaskResponse(BaseModel):
     updated_at: datetime
     completed_at: Optional[datetime] = None
 
-# Mock data for development
-TASKS = {}
+# Mock data for development, indexed for filtered listing newest-first
+TASKS = IndexedStore(
+    order_by=("created_at",),
+    indexes=(("status",), ("type",), ("status", "type")),
+)
+
+# Task JSON, validated and encoded once per version of a task
+TASK_JSON = RecordSerializer(TASKS, TaskResponse)
+
+POSTPROCESSOR = ResultProcessor(
+    max_workers=settings.POSTPROCESS_WORKERS,
+    shared_memory_threshold=settings.POSTPROCESS_SHARED_MEMORY_THRESHOLD,
+)
+
+FINISHED_STATUSES = (TaskStatus.COMPLETED, TaskStatus.FAILED)
+
+def _update_task(task_data: dict, **changes) -> None:
+    task_data.update(changes, updated_at=datetime.now())
+    TASKS[task_data["id"]] = task_data
+
+def _is_current(task_data: dict, status: TaskStatus) -> bool:
+    """
+    Whether a task being processed is still stored, as the same record, in
+    the status processing last gave it. A task deleted, replaced or moved
+    on by hand in the meantime must not be written back.
+    """
+    return TASKS.get(task_data["id"]) is task_data and task_data["status"] == status
+
+def _apply_progress(updates: dict) -> None:
+    for task_id, progress in updates.items():
+        task_data = TASKS.get(task_id)
+        # Finished while the report waited; its final progress stands
+        if task_data is None or task_data["status"] in FINISHED_STATUSES:
+            continue
+        if task_data["progress"] != progress:
+            _update_task(task_data, progress=progress)
+
+# Progress reports are applied once per window with the latest value per task
+PROGRESS = ProgressCoalescer(_apply_progress, window=settings.TASK_PROGRESS_WINDOW)
+
+async def process_task(task_id: str) -> None:
+    """
+    Run a queued task on the active agent for its type.
+
+    The task is checked before every write, and processing stops if it was
+    deleted or changed by hand while the agent or post-processing ran.
+    """
+    task_data = TASKS.get(task_id)
+    if task_data is None or task_data["status"] != TaskStatus.PENDING:
+        # Deleted, or moved on by hand, while it was queued
+        return
+    
+    _update_task(task_data, status=TaskStatus.IN_PROGRESS, progress=0.1)
+    
+    agents = AGENTS.query({"type": task_data["type"], "is_active": True}, limit=1)
+    if not agents:
+        _update_task(
+            task_data,
+            status=TaskStatus.FAILED,
+            error=f"No active agent for {TaskType(task_data['type']).value} tasks",
+            completed_at=datetime.now(),
+        )
+        return
+    
+    context = task_data["context"]
+    prompt = f"{task_data['title']}\n\n{task_data['description']}"
+    if context:
+        prompt += f"\n\nContext:\n{json.dumps(context, default=str)}"
+    
+    try:
+        result = await EXECUTOR.run(
+            agents[0],
+            prompt,
+            model_id=context.get("model_id"),
+            parameters=context.get("parameters"),
+        )
+    except AgentExecutionError as e:
+        if _is_current(task_data, TaskStatus.IN_PROGRESS):
+            _update_task(
+                task_data,
+                status=TaskStatus.FAILED,
+                error=str(e),
+                completed_at=datetime.now(),
+            )
+        return
+    
+    status = TaskStatus.IN_PROGRESS
+    # Summarize the result in a worker process so the event loop stays free
+    if POSTPROCESSOR.has_processor(task_data["type"]):
+        if not _is_current(task_data, status):
+            return
+        status = TaskStatus.VERIFYING
+        _update_task(task_data, status=status, progress=0.8)
+        try:
+            result["analysis"] = await POSTPROCESSOR.process(task_data["type"], result)
+        except Exception as e:
+            if _is_current(task_data, status):
+                _update_task(
+                    task_data,
+                    status=TaskStatus.FAILED,
+                    result=result,
+                    error=f"Post-processing failed: {e}",
+                    cost=task_data["cost"] + result["cost"]["total_cost"],
+                    completed_at=datetime.now(),
+                )
+            return
+    
+    if not _is_current(task_data, status):
+        return
+    _update_task(
+        task_data,
+        status=TaskStatus.COMPLETED,
+        progress=1.0,
+        result=result,
+        cost=task_data["cost"] + result["cost"]["total_cost"],
+        completed_at=datetime.now(),
+    )
+
+SCHEDULER = TaskScheduler(
+    process=process_task,
+    workers=settings.TASK_WORKERS,
+    aging_interval=settings.TASK_AGING_INTERVAL,
+)
+
+def requeue_unfinished_tasks(live_workers: Optional[Set[str]] = None) -> int:
+    """
+    Queue tasks left unfinished by a previous run, e.g. after loading them
+    from the database. Returns the number of tasks queued.
+
+    Tasks owned by one of ``live_workers`` are still being run there and
+    are left alone; the others are claimed for this worker.
+    """
+    live_workers = live_workers or set()
+    unfinished = [
+        task_data
+        for status in (TaskStatus.PENDING, TaskStatus.IN_PROGRESS, TaskStatus.VERIFYING)
+        for task_data in TASKS.query({"status": status}, limit=len(TASKS))
+        if task_data.get("owner") not in live_workers
+    ]
+    # Oldest first, so requeued tasks keep their relative order
+    unfinished.sort(key=lambda task_data: task_data["created_at"])
+    for task_data in unfinished:
+        _update_task(task_data, status=TaskStatus.PENDING, progress=0.0, owner=WORKER_ID)
+        SCHEDULER.submit(task_data["id"], task_data["priority"])
+    return len(unfinished)
 
 @router.post("/", response_model=TaskResponse)
 async def create_task(
@@ -84,53 +245,100 @@ async def create_task(
             "created_at": now,
             "updated_at": now,
             "completed_at": None,
-            "context": task.context or {}
+            "context": task.context or {},
+            "owner": WORKER_ID,
         }
         
         TASKS[task_id] = task_data
         
-        # In a real implementation, we would add the task to a queue for processing
-        # background_tasks.add_task(process_task, task_id)
+        # Queue the task for the worker pool, ahead of lower priority work
+        SCHEDULER.submit(task_id, task.priority)
         
-        return TaskResponse(**task_data)
+        return TASK_JSON.response(task_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/scheduler/stats", response_model=dict)
+async def get_scheduler_stats():
+    """
+    Get queue depth, wait times and worker usage of the task scheduler.
+    """
+    return SCHEDULER.stats()
+
+@router.get("/progress/stats", response_model=dict)
+async def get_progress_stats():
+    """
+    Get how many progress reports were received, coalesced and applied.
+    """
+    return PROGRESS.stats()
+
+@router.post("/progress", status_code=202, response_model=dict)
+async def report_progress_batch(reports: List[BatchProgressReport]):
+    """
+    Report the progress of several tasks at once.
+    """
+    accepted = 0
+    rejected = []
+    for report in reports:
+        task_data = TASKS.get(report.task_id)
+        if task_data is None or task_data["status"] in FINISHED_STATUSES:
+            rejected.append(report.task_id)
+            continue
+        PROGRESS.report(report.task_id, report.progress)
+        accepted += 1
+    
+    return {"accepted": accepted, "rejected": rejected}
+
 @router.get("/{task_id}", response_model=TaskResponse)
-async def get_task(task_id: str):
+async def get_task(task_id: str, request: Request):
     """
     Get task status and results.
     """
     if task_id not in TASKS:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    return TaskResponse(**TASKS[task_id])
+    return TASK_JSON.response(TASKS[task_id], request=request)
+
+@router.post("/{task_id}/progress", status_code=202, response_model=dict)
+async def report_progress(task_id: str, report: ProgressReport):
+    """
+    Report task progress; applied with the next batch instead of right away.
+    """
+    task_data = TASKS.get(task_id)
+    if task_data is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if task_data["status"] in FINISHED_STATUSES:
+        raise HTTPException(status_code=409, detail="Task already finished")
+    
+    PROGRESS.report(task_id, report.progress)
+    
+    return {"task_id": task_id, "progress": report.progress}
 
 @router.get("/", response_model=List[TaskResponse])
 async def list_tasks(
+    request: Request,
+    response: Response,
     status: Optional[TaskStatus] = None,
     type: Optional[TaskType] = None,
     limit: int = Query(10, ge=1, le=100),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's X-Next-Cursor header")
 ):
     """
     List all tasks with optional filtering.
     """
-    filtered_tasks = list(TASKS.values())
-    
-    if status:
-        filtered_tasks = [task for task in filtered_tasks if task["status"] == status]
-    
-    if type:
-        filtered_tasks = [task for task in filtered_tasks if task["type"] == type]
+    # Newest first, read straight from the created_at ordered index
+    paginated_tasks = paginate(
+        TASKS,
+        response,
+        filters={"status": status, "type": type},
+        limit=limit,
+        offset=offset,
+        cursor=cursor,
+        descending=True,
+    )
     
-    # Sort by created_at (newest first)
-    filtered_tasks.sort(key=lambda x: x["created_at"], reverse=True)
-    
-    # Apply pagination
-    paginated_tasks = filtered_tasks[offset:offset + limit]
-    
-    return [TaskResponse(**task) for task in paginated_tasks]
+    return TASK_JSON.list_response(paginated_tasks, response, request=request)
 
 @router.patch("/{task_id}", response_model=TaskResponse)
 async def update_task(task_id: str, task_update: TaskUpdate):
@@ -157,7 +365,11 @@ async def update_task(task_id: str, task_update: TaskUpdate):
     
     TASKS[task_id] = task_data
     
-    return TaskResponse(**task_data)
+    # Move a still queued task to its new priority
+    if task_update.priority is not None:
+        SCHEDULER.reprioritize(task_id, task_update.priority)
+    
+    return TASK_JSON.response(task_data)
 
 @router.delete("/{task_id}", response_model=dict)
 async def delete_task(task_id: str):
@@ -168,5 +380,7 @@ async def delete_task(task_id: str):
         raise HTTPException(status_code=404, detail="Task not found")
     
     del TASKS[task_id]
+    SCHEDULER.discard(task_id)
+    PROGRESS.discard(task_id)
     
     return {"message": f"Task {task_id} deleted successfully"}
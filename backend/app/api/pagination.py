@@ -0,0 +1,43 @@
+from typing import Any, Dict, List, Optional
+from fastapi import HTTPException, Response
+
+from app.core.store import IndexedStore
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def paginate(
+    store: IndexedStore,
+    response: Response,
+    filters: Optional[Dict[str, Any]] = None,
+    limit: int = 100,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    descending: bool = False,
+) -> List[dict]:
+    """
+    Read one page from an indexed store, supporting both offset and cursor mode.
+
+    When more records follow the page, an opaque cursor for the next page is
+    returned in the ``X-Next-Cursor`` response header. Passing it back as
+    ``cursor`` resumes right after the last record seen, at the same cost as
+    the first page and unaffected by records inserted in the meantime.
+    """
+    try:
+        after = store.decode_cursor(cursor) if cursor else None
+        # Fetch one extra record to learn whether another page exists
+        records = store.query(
+            filters=filters,
+            limit=limit + 1,
+            offset=offset,
+            descending=descending,
+            after=after,
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if len(records) > limit:
+        records = records[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = store.encode_cursor(records[-1])
+
+    return records
@@ -0,0 +1,158 @@
+import uuid
+from typing import Any, Dict, Iterable, Optional, Tuple, Type
+
+from fastapi import Request, Response
+from pydantic import BaseModel, TypeAdapter
+
+from app.core.store import IndexedStore
+
+
+class RecordSerializer:
+    """
+    Serves store records as JSON without re-validating unchanged records.
+
+    Each record is validated against ``model`` and dumped to JSON bytes once
+    per version (see ``IndexedStore.version``); later responses reuse the
+    cached bytes until the record is written again. List responses join the
+    cached fragments into an array, so a page of unchanged records costs one
+    join instead of building and validating a model per record twice.
+
+    Handlers return the ``Response`` built here directly, which skips
+    FastAPI's own ``response_model`` pass; the decorators keep
+    ``response_model`` for the OpenAPI schema only.
+
+    Responses carry a weak ETag made of the record's version, or of the
+    store's revision for lists, plus an id drawn when the serializer is
+    created, so tags never match across restarts or workers. Given the
+    request, a matching ``If-None-Match`` is answered with ``304 Not
+    Modified`` before anything is encoded.
+    """
+
+    def __init__(self, store: IndexedStore, model: Type[BaseModel]):
+        self.store = store
+        self.model = model
+        self._adapter = TypeAdapter(model)
+        self._epoch = uuid.uuid4().hex[:12]
+        # record id -> (version, JSON bytes)
+        self._cache: Dict[str, Tuple[int, bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        store.subscribe(self._forget, replicas=True)
+
+    def _forget(self, record_id: str, record: Optional[dict]) -> None:
+        if record is None:
+            self._cache.pop(record_id, None)
+
+    def _encode(self, record: dict) -> bytes:
+        return self._adapter.dump_json(self._adapter.validate_python(record))
+
+    def dumps(self, record: dict) -> bytes:
+        """
+        Return the JSON bytes of a record, from the cache when it is unchanged.
+        """
+        record_id = record["id"]
+        if self.store.get(record_id) is not record:
+            # Not (or no longer) the stored record, so it has no version
+            return self._encode(record)
+        version = self.store.version(record_id)
+        cached = self._cache.get(record_id)
+        if cached is not None and cached[0] == version:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        data = self._encode(record)
+        self._cache[record_id] = (version, data)
+        return data
+
+    def dumps_many(self, records: Iterable[dict]) -> bytes:
+        """
+        Return a JSON array of records.
+        """
+        return b"[" + b",".join([self.dumps(record) for record in records]) + b"]"
+
+    def etag(self, record: dict) -> Optional[str]:
+        """
+        Return the ETag of a stored record's current version.
+        """
+        record_id = record["id"]
+        if self.store.get(record_id) is not record:
+            return None
+        return f'W/"{self._epoch}-{self.store.version(record_id)}"'
+
+    def list_etag(self) -> str:
+        """
+        Return the ETag of any page read from the store as it is now.
+        """
+        return f'W/"{self._epoch}-r{self.store.revision}"'
+
+    def _not_modified(self, request: Optional[Request], etag: Optional[str]) -> bool:
+        if request is None or etag is None:
+            return False
+        header = request.headers.get("if-none-match")
+        if header is None:
+            return False
+        if header != etag and header.strip() != "*" and etag not in (
+            tag.strip() for tag in header.split(",")
+        ):
+            return False
+        self.not_modified += 1
+        return True
+
+    @staticmethod
+    def _response(
+        content: bytes,
+        response: Optional[Response],
+        status_code: int,
+        etag: Optional[str],
+    ) -> Response:
+        result = Response(content=content, status_code=status_code, media_type="application/json")
+        if response is not None:
+            # Keep headers set on the injected response, e.g. X-Next-Cursor
+            for name, value in response.headers.items():
+                result.headers[name] = value
+        if etag is not None:
+            result.headers["ETag"] = etag
+        return result
+
+    def response(
+        self,
+        record: dict,
+        response: Optional[Response] = None,
+        status_code: int = 200,
+        request: Optional[Request] = None,
+    ) -> Response:
+        """
+        Build a JSON response for one record, or a 304 if ``request`` already has it.
+        """
+        etag = self.etag(record)
+        if self._not_modified(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        return self._response(self.dumps(record), response, status_code, etag)
+
+    def list_response(
+        self,
+        records: Iterable[dict],
+        response: Optional[Response] = None,
+        status_code: int = 200,
+        request: Optional[Request] = None,
+    ) -> Response:
+        """
+        Build a JSON array response for a page of records, or a 304 if
+        ``request`` already has it.
+        """
+        etag = self.list_etag()
+        if self._not_modified(request, etag):
+            headers = {"ETag": etag}
+            if response is not None:
+                headers.update(response.headers)
+            return Response(status_code=304, headers=headers)
+        return self._response(self.dumps_many(records), response, status_code, etag)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
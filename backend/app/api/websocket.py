@@ -0,0 +1,236 @@
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+import json
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from app.api.api_v1.endpoints.models import MODELS
+from app.api.api_v1.endpoints.orchestration import WORKFLOW_EXECUTIONS
+from app.api.api_v1.endpoints.tasks import TASKS, TaskStatus
+from app.core.config import settings
+from app.services.event_bus import create_event_bus, replicate_stores
+from app.services.websocket_hub import Connection, WebSocketHub, encode_message
+
+router = APIRouter()
+
+HUB = WebSocketHub(
+    max_connections=settings.WEBSOCKET_MAX_CONNECTIONS,
+    max_queue=settings.WEBSOCKET_QUEUE_SIZE,
+    max_subscriptions=settings.WEBSOCKET_MAX_SUBSCRIPTIONS,
+)
+
+# Shares task and execution changes with the other worker processes
+EVENT_BUS = create_event_bus(
+    settings.EVENT_BUS_BACKEND,
+    settings.REDIS_HOST,
+    settings.REDIS_PORT,
+    settings.EVENT_BUS_CHANNEL,
+    worker_ttl=settings.EVENT_BUS_WORKER_TTL,
+)
+
+# Channels that take a record id: the field naming it and the store it is in
+RECORD_CHANNELS = {
+    "task": ("task_id", TASKS),
+    "workflow_execution": ("execution_id", WORKFLOW_EXECUTIONS),
+}
+CHANNELS = set(RECORD_CHANNELS) | {"tasks", "system_status"}
+
+# Stops replicating the stores over the bus; set while the hub runs
+_stop_replication: Optional[Callable[[], None]] = None
+
+
+def _task_message(task_id: str, task: dict) -> Tuple[str, Dict[str, Any]]:
+    status = task["status"]
+    data: Dict[str, Any] = {
+        "task_id": task_id,
+        "status": status,
+        "progress": task.get("progress", 0.0),
+        "updated_at": task.get("updated_at"),
+    }
+    if status == TaskStatus.COMPLETED:
+        data.update(
+            result=task.get("result"),
+            cost=task.get("cost", 0.0),
+            completed_at=task.get("completed_at"),
+        )
+        return "task_completion", data
+    if status == TaskStatus.FAILED:
+        data["error"] = task.get("error")
+        return "task_error", data
+    return "task_update", data
+
+
+def publish_task(task_id: str, task: Optional[dict]) -> None:
+    """
+    Store listener sending task changes to the ``task`` and ``tasks`` channels.
+    """
+    if task is None:
+        return
+    keys = (("task", task_id), ("tasks", None))
+    if not HUB.has_subscribers(keys):
+        return
+    message_type, data = _task_message(task_id, task)
+    HUB.publish(keys, message_type, lambda: data, ("task", task_id))
+
+
+def publish_execution(execution_id: str, execution: Optional[dict]) -> None:
+    """
+    Store listener sending execution changes to the ``workflow_execution`` channel.
+    """
+    if execution is None:
+        return
+    key = ("workflow_execution", execution_id)
+
+    def data() -> Dict[str, Any]:
+        update = {
+            "execution_id": execution_id,
+            "status": execution["status"],
+            "current_step_id": execution.get("current_step_id"),
+            "updated_at": execution.get("updated_at"),
+        }
+        if execution.get("error"):
+            update["error"] = execution["error"]
+        return update
+
+    HUB.publish([key], "workflow_execution_update", data, key)
+
+
+def system_status() -> Dict[str, Any]:
+    return {
+        "api_status": "operational",
+        "database_status": "operational",
+        "vector_db_status": "operational",
+        "model_service_status": "operational" if MODELS.count({"is_active": True}) else "degraded",
+        "active_tasks": TASKS.count({"status": TaskStatus.IN_PROGRESS})
+        + TASKS.count({"status": TaskStatus.VERIFYING}),
+        "pending_tasks": TASKS.count({"status": TaskStatus.PENDING}),
+        "updated_at": datetime.now(),
+    }
+
+
+async def start_hub() -> None:
+    """
+    Publish store changes and the system status to WebSocket subscribers.
+
+    Changes made by other workers arrive over the event bus, so clients see
+    every update whichever worker they are connected to.
+    """
+    global _stop_replication
+    await EVENT_BUS.start()
+    _stop_replication = replicate_stores(
+        EVENT_BUS, {"tasks": TASKS, "workflow_executions": WORKFLOW_EXECUTIONS}
+    )
+    TASKS.subscribe(publish_task, replicas=True)
+    WORKFLOW_EXECUTIONS.subscribe(publish_execution, replicas=True)
+    HUB.start(
+        system_status,
+        status_interval=settings.WEBSOCKET_STATUS_INTERVAL,
+        ping_interval=settings.WEBSOCKET_PING_INTERVAL,
+    )
+
+
+async def stop_hub() -> None:
+    """
+    Close every WebSocket connection and the event bus and stop following
+    the stores, so a later ``start_hub`` in the same process publishes each
+    change once.
+    """
+    global _stop_replication
+    TASKS.unsubscribe(publish_task)
+    WORKFLOW_EXECUTIONS.unsubscribe(publish_execution)
+    await HUB.close()
+    if _stop_replication is not None:
+        _stop_replication()
+        _stop_replication = None
+    await EVENT_BUS.close()
+
+
+def _error(connection: Connection, code: str, message: str, request: Optional[dict] = None) -> None:
+    data: Dict[str, Any] = {"code": code, "message": message}
+    if request is not None:
+        data["request_type"] = request.get("type")
+        data["request_data"] = request.get("data")
+    connection.send(encode_message("error", data))
+
+
+def _handle(connection: Connection, request: dict) -> None:
+    request_type = request.get("type")
+    data = request.get("data") or {}
+    if request_type == "pong":
+        return
+    if not isinstance(request_type, str) or request_type not in ("subscribe", "unsubscribe"):
+        _error(connection, "unsupported_request", f"Unsupported message type: {request_type}", request)
+        return
+    if not isinstance(data, dict):
+        _error(connection, "invalid_request", "Request data must be an object", request)
+        return
+
+    channel = data.get("channel")
+    if not isinstance(channel, str) or channel not in CHANNELS:
+        _error(connection, "invalid_subscription", f"Unknown channel: {channel}", request)
+        return
+    record_id = None
+    if channel in RECORD_CHANNELS:
+        field, store = RECORD_CHANNELS[channel]
+        record_id = data.get(field)
+        if record_id is not None and not isinstance(record_id, str):
+            _error(connection, "invalid_subscription", f"{field} must be a string", request)
+            return
+        if request_type == "subscribe" and record_id not in store:
+            _error(
+                connection,
+                "invalid_subscription",
+                f"Cannot subscribe to non-existent {channel.replace('_', ' ')}",
+                request,
+            )
+            return
+
+    if request_type == "unsubscribe":
+        HUB.unsubscribe(connection, channel, record_id)
+    elif not HUB.subscribe(connection, channel, record_id):
+        _error(
+            connection,
+            "subscription_limit",
+            f"At most {HUB.max_subscriptions} subscriptions per connection",
+            request,
+        )
+
+
+@router.get("/ws/stats", response_model=dict)
+async def get_websocket_stats():
+    """
+    Get connection, fan-out and slow-consumer statistics of the WebSocket hub.
+    """
+    return {**HUB.stats(), "event_bus": EVENT_BUS.stats()}
+
+
+@router.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket):
+    """
+    Real-time task, workflow execution and system status updates.
+    """
+    if HUB.full:
+        # 1013: try again later
+        await websocket.close(code=1013)
+        return
+    await websocket.accept()
+    connection = HUB.connect(websocket)
+    connection.send(encode_message(
+        "connection_established",
+        {"client_id": connection.client_id, "server_time": datetime.now()},
+    ))
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                request = json.loads(message)
+            except ValueError:
+                request = None
+            if not isinstance(request, dict):
+                _error(connection, "invalid_request", "Invalid request format")
+                continue
+            _handle(connection, request)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        HUB.disconnect(connection)
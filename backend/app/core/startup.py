@@ -0,0 +1,74 @@
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    """
+    Records how long each startup phase took and how many modules it imported.
+
+    Phases are timed with ``phase`` and should not nest. The report is
+    logged once startup finishes and served by ``GET /health/startup``.
+    """
+
+    def __init__(self):
+        self.phases: List[Dict[str, Any]] = []
+        self.completed = False
+        # Phases recorded before the first startup began, e.g. imports
+        self._preamble: Optional[int] = None
+
+    def begin(self) -> None:
+        """
+        Start recording a startup, e.g. each time the app's lifespan runs.
+
+        The phases of an earlier startup in the same process are dropped;
+        those recorded before the first one, such as imports, are kept.
+        """
+        if self._preamble is None:
+            self._preamble = len(self.phases)
+        del self.phases[self._preamble:]
+        self.completed = False
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Time the block as startup phase ``name``.
+        """
+        modules = len(sys.modules)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append({
+                "name": name,
+                "seconds": time.perf_counter() - started,
+                "modules_imported": len(sys.modules) - modules,
+            })
+
+    def complete(self) -> None:
+        """
+        Mark startup as finished and log the slowest phases first.
+        """
+        self.completed = True
+        for phase in sorted(self.phases, key=lambda phase: phase["seconds"], reverse=True):
+            logger.info(
+                "Startup phase %s took %.1f ms (%d modules imported)",
+                phase["name"],
+                phase["seconds"] * 1000,
+                phase["modules_imported"],
+            )
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "completed": self.completed,
+            "phases": [
+                {**phase, "seconds": round(phase["seconds"], 6)} for phase in self.phases
+            ],
+        }
+
+
+startup_report = StartupReport()
@@ -0,0 +1,380 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from enum import Enum
+from itertools import product
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import json
+
+# Called with a record id and the new record, or None when it was deleted
+Listener = Callable[[str, Optional[dict]], None]
+
+
+def _index_value(value: Any) -> Any:
+    """
+    Normalize a field value so enum members and their raw values share a bucket.
+    """
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _index_values(value: Any) -> List[Any]:
+    """
+    Return the bucket values for a field; list fields are indexed per element.
+    """
+    if isinstance(value, (list, tuple, set)):
+        return [_index_value(item) for item in value]
+    return [_index_value(value)]
+
+
+def _matches(record: dict, field: str, expected: Any) -> bool:
+    return _index_value(expected) in _index_values(record.get(field))
+
+
+def _encode_cursor_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return _index_value(value)
+
+
+def _decode_cursor_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+class IndexedStore:
+    """
+    In-memory record store with secondary indexes kept in sort order.
+
+    Records are plain dicts keyed by id, exactly like the mock dicts the
+    endpoints used before, so the usual mapping operations keep working.
+    Every index bucket holds ``(*order_by values, id)`` entries in a sorted
+    list, which lets a filtered, paginated read slice the bucket directly
+    instead of scanning and sorting the whole collection.
+
+    Handlers mutate record dicts in place and then write them back with
+    ``store[id] = record``; the store remembers the entry it indexed each
+    record under, so changed fields are re-indexed on write-back.
+
+    Because entries end with the record id they are unique and totally
+    ordered, which makes them usable as keyset pagination cursors.
+
+    ``revision`` increases on every write or delete, so derived structures
+    can tell cheaply whether they need rebuilding; ``version(id)`` is the
+    revision at which a single record was last written. Listeners registered with
+    ``subscribe`` are called after every write and delete, which is how
+    persistence, change notifications and other worker processes follow
+    the store.
+    """
+
+    def __init__(
+        self,
+        order_by: Sequence[str],
+        indexes: Iterable[Sequence[str]] = (),
+        records: Optional[Dict[str, dict]] = None,
+    ):
+        self.order_by = tuple(order_by)
+        self.indexes = [tuple(fields) for fields in indexes]
+        self._records: Dict[str, dict] = {}
+        self.revision = 0
+        # Sort entries for the whole collection
+        self._order: List[tuple] = []
+        # index fields -> index key -> sorted entries
+        self._buckets: Dict[Tuple[str, ...], Dict[tuple, List[tuple]]] = {
+            fields: {} for fields in self.indexes
+        }
+        # record id -> (sort entry, {index fields: index keys})
+        self._indexed: Dict[str, Tuple[tuple, Dict[Tuple[str, ...], List[tuple]]]] = {}
+        # record id -> revision of its last write
+        self._versions: Dict[str, int] = {}
+        self._listeners: List[Listener] = []
+        self._replica_listeners: List[Listener] = []
+
+        for record_id, record in (records or {}).items():
+            self[record_id] = record
+
+    def subscribe(self, listener: Listener, replicas: bool = False) -> None:
+        """
+        Call ``listener(record_id, record)`` after every change to the store.
+
+        With ``replicas`` the listener is also called for changes another
+        process made and ``replicate`` applied here. Listeners that persist
+        or forward changes leave it off, since that process already did.
+        """
+        self._listeners.append(listener)
+        if replicas:
+            self._replica_listeners.append(listener)
+
+    def unsubscribe(self, listener: Listener) -> None:
+        """
+        Stop calling a listener registered with ``subscribe``.
+        """
+        for listeners in (self._listeners, self._replica_listeners):
+            if listener in listeners:
+                listeners.remove(listener)
+
+    def replicate(self, record_id: str, record: Optional[dict]) -> None:
+        """
+        Apply a change made by another process; None deletes the record.
+
+        A record that is already here is updated in place, so handlers of
+        this process still holding it see the change rather than writing
+        their stale copy back over it.
+        """
+        listeners, self._listeners = self._listeners, self._replica_listeners
+        try:
+            if record is not None:
+                existing = self._records.get(record_id)
+                if existing is not None:
+                    existing.clear()
+                    existing.update(record)
+                    record = existing
+                self[record_id] = record
+            elif record_id in self._records:
+                del self[record_id]
+        finally:
+            self._listeners = listeners
+
+    def reset(self, records: Dict[str, dict]) -> None:
+        """
+        Replace every record, e.g. with those loaded from a database.
+
+        Listeners are not called, since the records did not change anywhere
+        but in memory.
+        """
+        listeners, self._listeners = self._listeners, []
+        try:
+            # Dropping the structures is linear, where deleting record by
+            # record would shift the sorted entry lists once per record
+            self._records = {}
+            self._versions = {}
+            self._indexed = {}
+            self._order = []
+            self._buckets = {fields: {} for fields in self.indexes}
+            self.revision += 1
+            # Inserting in sort order makes every index insert an append
+            for record_id, record in sorted(
+                records.items(), key=lambda item: self._entry(*item)
+            ):
+                self[record_id] = record
+        finally:
+            self._listeners = listeners
+
+    def _entry(self, record_id: str, record: dict) -> tuple:
+        return tuple(record[field] for field in self.order_by) + (record_id,)
+
+    def _keys(self, record: dict) -> Dict[Tuple[str, ...], List[tuple]]:
+        return {
+            fields: list(product(*(_index_values(record.get(field)) for field in fields)))
+            for fields in self.indexes
+        }
+
+    @staticmethod
+    def _insert(entries: List[tuple], entry: tuple) -> None:
+        # Records are usually created in sort order, so appending is the common case
+        if not entries or entries[-1] < entry:
+            entries.append(entry)
+        else:
+            insort(entries, entry)
+
+    @staticmethod
+    def _remove(entries: List[tuple], entry: tuple) -> None:
+        position = bisect_left(entries, entry)
+        if position < len(entries) and entries[position] == entry:
+            del entries[position]
+
+    def _unindex(self, record_id: str) -> None:
+        entry, keys = self._indexed.pop(record_id)
+        self._remove(self._order, entry)
+        for fields, index_keys in keys.items():
+            bucket = self._buckets[fields]
+            for key in index_keys:
+                entries = bucket.get(key)
+                if entries is None:
+                    continue
+                self._remove(entries, entry)
+                if not entries:
+                    del bucket[key]
+
+    def _index(self, record_id: str, record: dict) -> None:
+        entry = self._entry(record_id, record)
+        keys = self._keys(record)
+        self._insert(self._order, entry)
+        for fields, index_keys in keys.items():
+            for key in index_keys:
+                self._insert(self._buckets[fields].setdefault(key, []), entry)
+        self._indexed[record_id] = (entry, keys)
+
+    def __setitem__(self, record_id: str, record: dict) -> None:
+        self.revision += 1
+        self._versions[record_id] = self.revision
+        indexed = self._indexed.get(record_id)
+        if indexed is not None:
+            if indexed == (self._entry(record_id, record), self._keys(record)):
+                self._records[record_id] = record
+                self._notify(record_id, record)
+                return
+            self._unindex(record_id)
+        self._records[record_id] = record
+        self._index(record_id, record)
+        self._notify(record_id, record)
+
+    def _notify(self, record_id: str, record: Optional[dict]) -> None:
+        for listener in self._listeners:
+            listener(record_id, record)
+
+    def __getitem__(self, record_id: str) -> dict:
+        return self._records[record_id]
+
+    def __delitem__(self, record_id: str) -> None:
+        del self._records[record_id]
+        del self._versions[record_id]
+        self.revision += 1
+        self._unindex(record_id)
+        self._notify(record_id, None)
+
+    def __contains__(self, record_id: object) -> bool:
+        return record_id in self._records
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def version(self, record_id: str) -> int:
+        """
+        Return the revision at which a record was last written.
+        """
+        return self._versions[record_id]
+
+    def get(self, record_id: str, default: Any = None) -> Any:
+        return self._records.get(record_id, default)
+
+    def keys(self):
+        return self._records.keys()
+
+    def values(self):
+        return self._records.values()
+
+    def items(self):
+        return self._records.items()
+
+    def _plan(self, filters: Dict[str, Any]) -> Tuple[List[tuple], Dict[str, Any]]:
+        """
+        Pick the entries to walk for ``filters`` plus the filters left to check.
+
+        An index covering every filtered field is used directly. Otherwise the
+        smallest bucket among the indexes covering part of the filter is
+        walked and the remaining fields are checked per record.
+        """
+        if not filters:
+            return self._order, {}
+
+        best_entries = self._order
+        best_fields: Tuple[str, ...] = ()
+        for index_fields in self.indexes:
+            if not set(index_fields) <= set(filters):
+                continue
+            key = tuple(_index_value(filters[field]) for field in index_fields)
+            entries = self._buckets[index_fields].get(key, [])
+            if set(index_fields) == set(filters):
+                return entries, {}
+            if not best_fields or len(entries) < len(best_entries):
+                best_entries, best_fields = entries, index_fields
+
+        residual = {
+            field: value for field, value in filters.items() if field not in best_fields
+        }
+        return best_entries, residual
+
+    def count(self, filters: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Return how many records match ``filters``, from the index when one covers them.
+        """
+        active = {field: value for field, value in (filters or {}).items() if value is not None}
+        entries, residual = self._plan(active)
+        if not residual:
+            return len(entries)
+        return sum(
+            all(_matches(self._records[entry[-1]], field, value) for field, value in residual.items())
+            for entry in entries
+        )
+
+    def encode_cursor(self, record: dict) -> str:
+        """
+        Build an opaque cursor pointing just past ``record``.
+        """
+        entry = self._entry(record["id"], record)
+        payload = json.dumps([_encode_cursor_value(value) for value in entry])
+        return urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str) -> tuple:
+        """
+        Turn a cursor from ``encode_cursor`` back into a sort entry.
+
+        Raises ValueError if the cursor is malformed.
+        """
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            values = json.loads(urlsafe_b64decode(padded.encode()))
+            entry = tuple(_decode_cursor_value(value) for value in values)
+        except Exception as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+        if len(entry) != len(self.order_by) + 1:
+            raise ValueError(f"Invalid cursor: {cursor}")
+        return entry
+
+    def query(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 10,
+        offset: int = 0,
+        descending: bool = False,
+        after: Optional[tuple] = None,
+    ) -> List[dict]:
+        """
+        Return a page of records matching ``filters`` in ``order_by`` order.
+
+        Filters whose value is ``None`` are ignored. ``after`` is a decoded
+        cursor; the page starts with the first record past it in the chosen
+        direction, so inserts elsewhere do not shift later pages. When an
+        index covers all filtered fields the cost is proportional to
+        ``limit`` no matter how deep the page is.
+        """
+        active = {field: value for field, value in (filters or {}).items() if value is not None}
+        entries, residual = self._plan(active)
+
+        if descending:
+            stop = len(entries) if after is None else bisect_left(entries, after)
+        else:
+            start = 0 if after is None else bisect_right(entries, after)
+
+        if not residual:
+            if descending:
+                stop = max(stop - offset, 0)
+                page = reversed(entries[max(stop - limit, 0):stop])
+            else:
+                page = entries[start + offset:start + offset + limit]
+            return [self._records[entry[-1]] for entry in page]
+
+        if descending:
+            walk = (entries[position] for position in range(stop - 1, -1, -1))
+        else:
+            walk = (entries[position] for position in range(start, len(entries)))
+
+        results = []
+        skipped = 0
+        for entry in walk:
+            record = self._records[entry[-1]]
+            if not all(_matches(record, field, value) for field, value in residual.items()):
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            results.append(record)
+            if len(results) >= limit:
+                break
+        return results
@@ -0,0 +1,313 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, IO, List, Optional, Tuple
+
+from app.core.store import IndexedStore
+from app.db.repository import decode_record, encode_record
+
+SEGMENT_SUFFIX = ".log"
+SNAPSHOT_PREFIX = "snapshot-"
+
+# Snapshots kept; older ones are a fallback if the newest is unreadable
+SNAPSHOTS_KEPT = 2
+
+
+def _apply(records: Dict[str, dict], event: Dict[str, Any]) -> None:
+    record_id = event["id"]
+    if event["event"] == "deleted":
+        records.pop(record_id, None)
+        return
+    record = records.setdefault(record_id, {})
+    record.update(event.get("set") or {})
+    for field, entries in (event.get("patch") or {}).items():
+        record[field] = {**(record.get(field) or {}), **entries}
+
+
+class ExecutionEventLog:
+    """
+    Append-only log of workflow execution changes, with periodic snapshots.
+
+    Every write to the executions store is diffed against the previous state
+    of the record and appended as one JSON line holding only what changed:
+    ``set`` for replaced fields and ``patch`` for keys added or replaced
+    inside dict fields, so a step result is written once rather than with
+    the whole ``output_data`` each time. Lines go to numbered segment files
+    that roll over at ``segment_bytes``.
+
+    Every ``snapshot_events`` events the whole map is written to a snapshot
+    file. Startup loads the newest snapshot and replays only the events
+    after it. Segments are never deleted, so they remain the audit trail of
+    every run. Appends are flushed to the OS immediately and fsynced at
+    segment rollover, snapshots and close.
+
+    Fsyncs and snapshots run on one background thread while an event loop
+    is running, so requests never wait on the disk, and its jobs run in
+    order: a snapshot never overlaps another, and old snapshots are pruned
+    only once the new one has been renamed into place. A snapshot started
+    while the previous one is still being written is put off to a later
+    append.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 16 << 20, snapshot_events: int = 1000):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.snapshot_events = snapshot_events
+        self.seq = 0
+        self._segment: Optional[IO[str]] = None
+        self._since_snapshot = 0
+        self._previous: Dict[str, Dict[str, Any]] = {}
+        self._store: Optional[IndexedStore] = None
+        self._snapshotting: Optional[asyncio.Future] = None
+        self._thread: Optional[ThreadPoolExecutor] = None
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        return sorted(
+            (int(name[:-len(SEGMENT_SUFFIX)]), os.path.join(self.directory, name))
+            for name in os.listdir(self.directory)
+            if name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def _snapshots(self) -> List[Tuple[int, str]]:
+        names = [
+            name for name in os.listdir(self.directory)
+            if name.startswith(SNAPSHOT_PREFIX) and name.endswith(".json")
+        ]
+        return sorted(
+            (
+                (int(name[len(SNAPSHOT_PREFIX):-len(".json")]), os.path.join(self.directory, name))
+                for name in names
+            ),
+            reverse=True,
+        )
+
+    @staticmethod
+    def _read(path: str) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Read a segment's events and the offset just past the last whole line.
+        """
+        events = []
+        valid = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    events.append(decode_record(line.decode()))
+                except ValueError:
+                    break
+                valid += len(line)
+        return events, valid
+
+    def replay(self) -> Dict[str, dict]:
+        """
+        Rebuild the executions map from the newest snapshot and the events
+        logged after it, and open the log for appending.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        records: Dict[str, dict] = {}
+        for seq, path in self._snapshots():
+            try:
+                with open(path) as f:
+                    snapshot = decode_record(f.read())
+            except (OSError, ValueError):
+                continue
+            self.seq = seq
+            records = snapshot["executions"]
+            break
+
+        segments = self._segments()
+        replayed = 0
+        for position, (first_seq, path) in enumerate(segments):
+            following = segments[position + 1][0] if position + 1 < len(segments) else None
+            if following is not None and following <= self.seq + 1:
+                # Every event in this segment is already in the snapshot
+                continue
+            events, valid = self._read(path)
+            for event in events:
+                if event["seq"] <= self.seq:
+                    continue
+                _apply(records, event)
+                self.seq = event["seq"]
+                replayed += 1
+            if valid < os.path.getsize(path):
+                # Drop a line torn by a crash so appends start on a clean line
+                with open(path, "r+b") as f:
+                    f.truncate(valid)
+
+        if segments:
+            self._segment = open(segments[-1][1], "a")
+        self._since_snapshot = replayed
+        return records
+
+    def attach(self, store: IndexedStore) -> None:
+        """
+        Log every change to the executions store from now on.
+        """
+        self._store = store
+        self._previous = {record_id: self._shadow(record) for record_id, record in store.items()}
+        store.subscribe(self._on_change)
+
+    @staticmethod
+    def _shadow(record: dict) -> Dict[str, Any]:
+        # Dict fields are copied one level deep so in-place key changes show up
+        return {
+            field: dict(value) if isinstance(value, dict) else value
+            for field, value in record.items()
+        }
+
+    @staticmethod
+    def _diff(
+        previous: Dict[str, Any],
+        record: dict,
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        changed: Dict[str, Any] = {}
+        patch: Dict[str, Any] = {}
+        for field, value in record.items():
+            old = previous.get(field)
+            if old is value or (field in previous and old == value):
+                continue
+            if isinstance(old, dict) and isinstance(value, dict) and old.keys() <= value.keys():
+                patch[field] = {
+                    key: entry for key, entry in value.items()
+                    if key not in old or old[key] is not entry and old[key] != entry
+                }
+            else:
+                changed[field] = value
+        return changed, patch
+
+    def _on_change(self, record_id: str, record: Optional[dict]) -> None:
+        previous = self._previous.get(record_id)
+        if record is None:
+            self._previous.pop(record_id, None)
+            self.append({"id": record_id, "event": "deleted"})
+            return
+        if previous is None:
+            event: Dict[str, Any] = {"id": record_id, "event": "created", "set": record}
+        else:
+            changed, patch = self._diff(previous, record)
+            if not changed and not patch:
+                return
+            event = {"id": record_id, "event": "updated"}
+            if changed:
+                event["set"] = changed
+            if patch:
+                event["patch"] = patch
+        # Updated first, since a snapshot taken by the append copies the shadows
+        self._previous[record_id] = self._shadow(record)
+        self.append(event)
+
+    def append(self, event: Dict[str, Any]) -> None:
+        """
+        Append an event, assigning its sequence number and timestamp.
+        """
+        self.seq += 1
+        event = {"seq": self.seq, "at": datetime.now(), **event}
+        if self._segment is None or self._segment.tell() >= self.segment_bytes:
+            self._roll()
+        self._segment.write(encode_record(event) + "\n")
+        self._segment.flush()
+
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_events and self._store is not None:
+            self.snapshot()
+
+    def _background(self, function: Callable[..., None], *args: Any) -> Optional[asyncio.Future]:
+        """
+        Run disk work on the log's thread, or right away outside an event loop.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            function(*args)
+            return None
+        if self._thread is None:
+            self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="execution-log")
+        return loop.run_in_executor(self._thread, function, *args)
+
+    @staticmethod
+    def _close_segment(segment: IO[str]) -> None:
+        os.fsync(segment.fileno())
+        segment.close()
+
+    def _roll(self) -> None:
+        if self._segment is not None:
+            self._segment.flush()
+            # Closed on the thread after any snapshot still syncing it
+            self._background(self._close_segment, self._segment)
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.seq:016d}{SEGMENT_SUFFIX}")
+        self._segment = open(path, "a")
+
+    def _write_snapshot(self, seq: int, records: Dict[str, dict], segment: Optional[int]) -> None:
+        if segment is not None:
+            # The events up to seq must be durable before a snapshot covers them
+            os.fsync(segment)
+        data = encode_record({"seq": seq, "executions": records})
+        path = os.path.join(self.directory, f"{SNAPSHOT_PREFIX}{seq:016d}.json")
+        partial = f"{path}.tmp"
+        with open(partial, "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(partial, path)
+        for _, old in self._snapshots()[SNAPSHOTS_KEPT:]:
+            os.remove(old)
+
+    def snapshot(self) -> None:
+        """
+        Write the current executions map as of the latest event.
+
+        Only the map is copied here, from the shadows kept for diffing,
+        which are replaced rather than changed on every write; encoding and
+        writing the file happen on the log's thread.
+        """
+        if self._snapshotting is not None and not self._snapshotting.done():
+            return
+        segment = None
+        if self._segment is not None:
+            self._segment.flush()
+            segment = self._segment.fileno()
+        records = dict(self._previous)
+        self._since_snapshot = 0
+        self._snapshotting = self._background(self._write_snapshot, self.seq, records, segment)
+
+    def history(self, execution_id: str) -> List[Dict[str, Any]]:
+        """
+        Return every logged event of one execution, oldest first.
+
+        Scans all segments, so it is meant for audits rather than hot paths.
+        """
+        if self._segment is not None:
+            self._segment.flush()
+        needle = json.dumps(execution_id)
+        events = []
+        for _, path in self._segments():
+            with open(path) as f:
+                for line in f:
+                    # Cheap substring test before decoding the line
+                    if needle in line:
+                        event = decode_record(line)
+                        if event["id"] == execution_id:
+                            events.append(event)
+        return events
+
+    async def close(self) -> None:
+        if self._store is not None:
+            self._store.unsubscribe(self._on_change)
+            self._store = None
+        if self._snapshotting is not None:
+            await asyncio.gather(self._snapshotting, return_exceptions=True)
+            self._snapshotting = None
+        if self._segment is not None:
+            self._segment.flush()
+            segment, self._segment = self._segment, None
+            closing = self._background(self._close_segment, segment)
+            if closing is not None:
+                await closing
+        if self._thread is not None:
+            # Its queue ended with the close above, so nothing is left to wait for
+            self._thread.shutdown(wait=False)
+            self._thread = None
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from app.core.store import IndexedStore, Listener
+from app.db.repository import Repository, Write, encode_record
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBatcher:
+    """
+    Group-commits store changes to a repository.
+
+    Changes are collected for ``interval`` seconds (or until ``max_batch``
+    records are pending) and then written in one transaction. Pending
+    changes are keyed by record, so a record written many times within a
+    window, such as a task reporting progress, is serialized and written
+    once with its latest state. A failed batch is retried with the next one.
+
+    Closing the batcher also detaches it from the stores ``attach_stores``
+    attached it to, so a later batcher does not share their changes with it.
+    """
+
+    def __init__(self, repository: Repository, interval: float = 0.05, max_batch: int = 500):
+        self.repository = repository
+        self.interval = interval
+        self.max_batch = max_batch
+        self._pending: Dict[Tuple[str, str], Optional[dict]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushing: Optional[asyncio.Task] = None
+        self._attached: List[Tuple[IndexedStore, Listener]] = []
+        self.batches = 0
+        self.writes = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    def enqueue(self, collection: str, record_id: str, record: Optional[dict]) -> None:
+        """
+        Queue the latest state of a record; None deletes it.
+        """
+        key = (collection, record_id)
+        if key in self._pending:
+            self.coalesced += 1
+        self._pending[key] = record
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop yet; the changes go out with the first flush
+            return
+        if len(self._pending) >= self.max_batch:
+            self._schedule(loop, 0)
+        elif self._timer is None:
+            self._schedule(loop, self.interval)
+
+    def _schedule(self, loop: asyncio.AbstractEventLoop, delay: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_later(delay, self._start_flush)
+
+    def _start_flush(self) -> None:
+        self._timer = None
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.ensure_future(self.flush())
+        else:
+            # A flush is running; pick these changes up right after it
+            self._flushing.add_done_callback(lambda _: self._start_flush())
+
+    async def flush(self) -> None:
+        """
+        Write all pending changes in one transaction.
+        """
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        writes: List[Write] = [
+            (collection, record_id, None if record is None else encode_record(record))
+            for (collection, record_id), record in pending.items()
+        ]
+        try:
+            await self.repository.write(writes)
+        except Exception:
+            self.failures += 1
+            logger.exception(
+                "Persisting %d records failed; retrying with the next batch", len(writes)
+            )
+            # Keep newer changes that arrived during the failed write
+            for key, record in pending.items():
+                self._pending.setdefault(key, record)
+            try:
+                self._schedule(asyncio.get_running_loop(), self.interval)
+            except RuntimeError:
+                pass
+            return
+        self.batches += 1
+        self.writes += len(writes)
+
+    async def close(self) -> None:
+        """
+        Flush what is pending and stop batching.
+        """
+        for store, listener in self._attached:
+            store.unsubscribe(listener)
+        self._attached = []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushing is not None:
+            await asyncio.gather(self._flushing, return_exceptions=True)
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+        }
+
+
+async def attach_stores(
+    stores: Dict[str, IndexedStore],
+    repository: Repository,
+    batcher: WriteBatcher,
+) -> None:
+    """
+    Load each store from the repository and persist its changes from now on.
+
+    A collection with no rows yet is seeded from the store's current records,
+    so the built-in models and agents are written on first start. The stores
+    then act as a fully loaded read-through cache: reads never reach the
+    repository.
+    """
+    for collection, store in stores.items():
+        records = await repository.load(collection)
+        if records:
+            store.reset(records)
+        else:
+            for record_id, record in store.items():
+                batcher.enqueue(collection, record_id, record)
+        def listener(record_id: str, record: Optional[dict], collection: str = collection) -> None:
+            batcher.enqueue(collection, record_id, record)
+
+        store.subscribe(listener)
+        batcher._attached.append((store, listener))
+    await batcher.flush()
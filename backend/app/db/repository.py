@@ -0,0 +1,233 @@
+import asyncio
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# A pending write: collection, record id and encoded record, or None to delete
+Write = Tuple[str, str, Optional[str]]
+
+_DATETIME_TAG = "__datetime__"
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {_DATETIME_TAG: value.isoformat()}
+    return str(value)
+
+
+def _object_hook(value: Dict[str, Any]) -> Any:
+    if len(value) == 1 and _DATETIME_TAG in value:
+        return datetime.fromisoformat(value[_DATETIME_TAG])
+    return value
+
+
+def encode_record(record: dict) -> str:
+    """
+    Serialize a store record, keeping datetimes distinguishable from strings.
+
+    Enum members are stored as their values; the enums are ``str`` enums, so
+    the values compare equal to them when the records are read back.
+    """
+    return json.dumps(record, default=_default, separators=(",", ":"))
+
+
+def decode_record(data: str) -> dict:
+    return json.loads(data, object_hook=_object_hook)
+
+
+class Repository:
+    """
+    Durable storage for store records, grouped by collection.
+
+    Records are stored whole, as JSON documents keyed by collection and id.
+    The stores stay the read path; a repository is only read at startup and
+    written in batches.
+    """
+
+    async def load(self, collection: str) -> Dict[str, dict]:
+        """
+        Return every record of a collection by id.
+        """
+        raise NotImplementedError
+
+    async def write(self, writes: List[Write]) -> None:
+        """
+        Apply a batch of upserts and deletes in a single transaction.
+        """
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS records ("
+    "collection TEXT NOT NULL, "
+    "id TEXT NOT NULL, "
+    "data TEXT NOT NULL, "
+    "PRIMARY KEY (collection, id))"
+)
+
+_UPSERT = (
+    "INSERT INTO records (collection, id, data) VALUES ({0}, {1}, {2}) "
+    "ON CONFLICT (collection, id) DO UPDATE SET data = excluded.data"
+)
+
+_DELETE = "DELETE FROM records WHERE collection = {0} AND id = {1}"
+
+_SELECT = "SELECT id, data FROM records WHERE collection = {0}"
+
+
+class SQLiteRepository(Repository):
+    """
+    Repository backed by a local SQLite file in WAL mode.
+
+    The connection lives on a single dedicated thread, so the event loop
+    never blocks on disk. WAL with ``synchronous=NORMAL`` syncs at
+    checkpoints rather than on every commit, and each batch is one
+    transaction.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(_SCHEMA)
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    async def _call(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._thread, function, *args)
+
+    def _load(self, collection: str) -> Dict[str, dict]:
+        rows = self._connect().execute(_SELECT.format("?"), (collection,))
+        return {record_id: decode_record(data) for record_id, data in rows}
+
+    def _write(self, writes: List[Write]) -> None:
+        connection = self._connect()
+        with connection:
+            connection.executemany(
+                _UPSERT.format("?", "?", "?"),
+                [write for write in writes if write[2] is not None],
+            )
+            connection.executemany(
+                _DELETE.format("?", "?"),
+                [write[:2] for write in writes if write[2] is None],
+            )
+
+    def _close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    async def load(self, collection: str) -> Dict[str, dict]:
+        return await self._call(self._load, collection)
+
+    async def write(self, writes: List[Write]) -> None:
+        await self._call(self._write, writes)
+
+    async def close(self) -> None:
+        await self._call(self._close)
+        self._thread.shutdown(wait=True)
+
+
+def async_database_url(url: str) -> str:
+    """
+    Point a database URL at an asyncio driver.
+    """
+    for prefix, driver in (
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgres://", "postgresql+asyncpg://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(prefix):
+            return driver + url[len(prefix):]
+    return url
+
+
+class SQLRepository(Repository):
+    """
+    Repository backed by a SQL database through SQLAlchemy's asyncio engine.
+
+    Works with PostgreSQL (asyncpg) and SQLite (aiosqlite). SQLAlchemy is
+    imported when the repository connects, so the in-memory and SQLite
+    backends do not need it.
+    """
+
+    def __init__(self, url: str):
+        self.url = async_database_url(url)
+        self._engine = None
+
+    async def _connect(self):
+        if self._engine is None:
+            from sqlalchemy.ext.asyncio import create_async_engine
+
+            self._engine = create_async_engine(self.url, pool_pre_ping=True)
+            async with self._engine.begin() as connection:
+                await connection.exec_driver_sql(_SCHEMA)
+        return self._engine
+
+    async def load(self, collection: str) -> Dict[str, dict]:
+        from sqlalchemy import text
+
+        engine = await self._connect()
+        async with engine.connect() as connection:
+            result = await connection.execute(
+                text(_SELECT.format(":collection")), {"collection": collection}
+            )
+            return {record_id: decode_record(data) for record_id, data in result}
+
+    async def write(self, writes: List[Write]) -> None:
+        from sqlalchemy import text
+
+        engine = await self._connect()
+        upserts = [
+            {"collection": collection, "id": record_id, "data": data}
+            for collection, record_id, data in writes
+            if data is not None
+        ]
+        deletes = [
+            {"collection": collection, "id": record_id}
+            for collection, record_id, data in writes
+            if data is None
+        ]
+        async with engine.begin() as connection:
+            if upserts:
+                await connection.execute(
+                    text(_UPSERT.format(":collection", ":id", ":data")), upserts
+                )
+            if deletes:
+                await connection.execute(text(_DELETE.format(":collection", ":id")), deletes)
+
+    async def close(self) -> None:
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+
+
+def create_repository(backend: str, database_url: str, sqlite_path: str) -> Optional[Repository]:
+    """
+    Create the repository for a PERSISTENCE_BACKEND setting.
+
+    Returns None for ``memory``, which keeps state in the stores only.
+    """
+    if backend == "memory":
+        return None
+    if backend == "sqlite":
+        return SQLiteRepository(sqlite_path)
+    if backend == "sql":
+        return SQLRepository(database_url)
+    raise ValueError(f"Unknown persistence backend: {backend}")
@@ -1,16 +1,147 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+from typing import Any
 
-from app.core.config import settings
+from app.core.startup import startup_report
 
-app = FastAPI(
+with startup_report.phase("import fastapi"):
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import JSONResponse
+
+from app.core.config import ensure_directories, settings
+
+def include_routers(app: FastAPI) -> None:
+    """
+    Import the endpoint modules and add their routes to the app, once.
+    """
+    if getattr(app.state, "routers_included", False):
+        return
+    app.state.routers_included = True
+    from app.api.api_v1.api import build_api_router
+    app.include_router(build_api_router(), prefix=settings.API_V1_PREFIX)
+    with startup_report.phase("import websocket endpoints"):
+        from app.api.websocket import router as websocket_router
+    app.include_router(websocket_router)
+
+class TheMachineApp(FastAPI):
+    """
+    FastAPI app that adds its routers when they are first needed instead of on import.
+
+    That is when the middleware stack is built on the first ASGI event,
+    whether the lifespan startup or, when a test client skips the lifespan,
+    the first request, or when something reads ``routes``, ``openapi()``
+    or ``url_path_for`` before that. Importing ``app.main`` stays cheap and
+    side-effect free.
+    """
+
+    def build_middleware_stack(self):
+        include_routers(self)
+        return super().build_middleware_stack()
+
+    @property
+    def routes(self):
+        include_routers(self)
+        return super().routes
+
+    def url_path_for(self, name: str, /, **path_params: Any):
+        include_routers(self)
+        return super().url_path_for(name, **path_params)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup_report.begin()
+    with startup_report.phase("create directories"):
+        ensure_directories()
+    from app.api.api_v1.endpoints.agents import AGENTS, COSTS, COST_LEDGER
+    from app.api.api_v1.endpoints.models import MODELS
+    from app.api.api_v1.endpoints.orchestration import (
+        EXECUTION_LOG,
+        WORKFLOWS,
+        WORKFLOW_EXECUTIONS,
+    )
+    from app.api.api_v1.endpoints.tasks import TASKS, requeue_unfinished_tasks
+    stores = {
+        "tasks": TASKS,
+        "models": MODELS,
+        "agents": AGENTS,
+        "workflows": WORKFLOWS,
+        "workflow_executions": WORKFLOW_EXECUTIONS,
+        "costs": COSTS,
+    }
+    # Executions are persisted by their event log instead, when it is enabled
+    if EXECUTION_LOG is not None:
+        with startup_report.phase("replay execution log"):
+            executions = EXECUTION_LOG.replay()
+            if executions:
+                WORKFLOW_EXECUTIONS.reset(executions)
+            EXECUTION_LOG.attach(WORKFLOW_EXECUTIONS)
+        del stores["workflow_executions"]
+    # Load state from the configured persistence backend and keep it in sync
+    from app.db.persistence import WriteBatcher, attach_stores
+    from app.db.repository import create_repository
+    repository = create_repository(
+        settings.PERSISTENCE_BACKEND, settings.DATABASE_URL, settings.SQLITE_PATH
+    )
+    batcher = None
+    if repository is not None:
+        batcher = WriteBatcher(
+            repository,
+            interval=settings.PERSISTENCE_FLUSH_INTERVAL,
+            max_batch=settings.PERSISTENCE_MAX_BATCH,
+        )
+        with startup_report.phase("load persisted state"):
+            await attach_stores(stores, repository, batcher)
+            COST_LEDGER.load()
+    with startup_report.phase("start cost ledger"):
+        await COST_LEDGER.start()
+    # Push store changes to WebSocket subscribers, from this and other workers
+    from app.api.websocket import EVENT_BUS, start_hub, stop_hub
+    with startup_report.phase("start websocket hub and event bus"):
+        await start_hub()
+    # Requeue tasks and resume workflow executions, from their checkpoints,
+    # that were interrupted by a restart and are not running on another worker
+    from app.api.api_v1.endpoints.orchestration import engine
+    from app.services.recovery import WorkRecovery
+    recovery = WorkRecovery(
+        EVENT_BUS,
+        [requeue_unfinished_tasks, engine.recover],
+        interval=settings.RECOVERY_INTERVAL,
+    )
+    with startup_report.phase("recover unfinished work"):
+        await recovery.run()
+    recovery.start()
+    startup_report.complete()
+    yield
+    await recovery.close()
+    await stop_hub()
+    # Stop the task workers and the post-processing pool
+    from app.api.api_v1.endpoints.tasks import POSTPROCESSOR, PROGRESS, SCHEDULER
+    await SCHEDULER.shutdown()
+    PROGRESS.close()
+    POSTPROCESSOR.shutdown()
+    # Stop workflow executions still running in the background
+    from app.api.api_v1.endpoints.orchestration import engine
+    await engine.shutdown()
+    if EXECUTION_LOG is not None:
+        await EXECUTION_LOG.close()
+    # Close pooled provider connections
+    from app.services.providers import providers
+    await providers.aclose()
+    # Store the spend of the last calls
+    await COST_LEDGER.close()
+    # Write out the last batch of changes
+    if batcher is not None:
+        await batcher.close()
+        await repository.close()
+
+app = TheMachineApp(
     title=settings.PROJECT_NAME,
     description="A unified AI development and orchestration platform",
     version="0.1.0",
     openapi_url=f"{settings.API_V1_PREFIX}/openapi.json",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # Set up CORS middleware
@@ -20,12 +151,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
-# Import and include API routers
-from app.api.api_v1.api import api_router
-app.include_router(api_router, prefix=settings.API_V1_PREFIX)
-
 @app.get("/")
 async def root():
     return JSONResponse(
@@ -45,6 +173,13 @@ async def health_check():
         }
     )
 
+@app.get("/health/startup")
+async def startup_health():
+    """
+    Report how long each import and initialization phase of startup took.
+    """
+    return JSONResponse(content=startup_report.summary())
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
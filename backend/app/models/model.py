@@ -0,0 +1,58 @@
+from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field
+from enum import Enum
+
+class ModelProvider(str, Enum):
+    OPENAI = "openai"
+    ANTHROPIC = "anthropic"
+    LOCAL = "local"
+    CUSTOM = "custom"
+
+class ModelCapability(str, Enum):
+    TEXT = "text"
+    CODE = "code"
+    REASONING = "reasoning"
+    PLANNING = "planning"
+    VISION = "vision"
+    AUDIO = "audio"
+
+class ModelCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    provider: ModelProvider
+    model_id: str = Field(..., description="Provider's model identifier")
+    capabilities: List[ModelCapability]
+    context_window: int = Field(..., gt=0)
+    cost_per_prompt_token: float = Field(..., ge=0)
+    cost_per_completion_token: float = Field(..., ge=0)
+    max_tokens: Optional[int] = Field(None, gt=0)
+    description: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
+
+class ModelUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    capabilities: Optional[List[ModelCapability]] = None
+    context_window: Optional[int] = Field(None, gt=0)
+    cost_per_prompt_token: Optional[float] = Field(None, ge=0)
+    cost_per_completion_token: Optional[float] = Field(None, ge=0)
+    max_tokens: Optional[int] = Field(None, gt=0)
+    description: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
+    is_active: Optional[bool] = None
+
+class ModelResponse(BaseModel):
+    id: str
+    name: str
+    provider: ModelProvider
+    model_id: str
+    capabilities: List[ModelCapability]
+    context_window: int
+    cost_per_prompt_token: float
+    cost_per_completion_token: float
+    max_tokens: Optional[int] = None
+    description: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
+    is_active: bool = True
+
+class TokenEstimateRequest(BaseModel):
+    prompts: List[str] = Field(..., min_length=1, description="Rendered prompts to count")
+    completion_tokens: Optional[int] = Field(None, gt=0, description="Expected completion size; defaults to the model's max_tokens")
@@ -0,0 +1,85 @@
+from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field
+from enum import Enum
+from datetime import datetime
+
+class WorkflowType(str, Enum):
+    SEQUENTIAL = "sequential"
+    PARALLEL = "parallel"
+    CONDITIONAL = "conditional"
+    CUSTOM = "custom"
+
+class WorkflowStatus(str, Enum):
+    PENDING = "pending"
+    IN_PROGRESS = "in_progress"
+    AWAITING_REVIEW = "awaiting_review"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class WorkflowStepType(str, Enum):
+    AGENT = "agent"
+    HUMAN = "human"
+    CONDITION = "condition"
+    LOOP = "loop"
+
+class WorkflowStep(BaseModel):
+    id: str
+    type: WorkflowStepType
+    name: str
+    description: Optional[str] = None
+    agent_id: Optional[str] = None
+    parameters: Optional[Dict[str, Any]] = None
+    next_steps: Optional[List[str]] = None
+    condition: Optional[str] = None
+
+class WorkflowCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    description: str = Field(..., min_length=1)
+    type: WorkflowType
+    steps: List[WorkflowStep]
+    parameters: Optional[Dict[str, Any]] = None
+    metadata: Optional[Dict[str, Any]] = None
+
+class WorkflowUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    description: Optional[str] = None
+    steps: Optional[List[WorkflowStep]] = None
+    parameters: Optional[Dict[str, Any]] = None
+    metadata: Optional[Dict[str, Any]] = None
+    is_active: Optional[bool] = None
+
+class WorkflowResponse(BaseModel):
+    id: str
+    name: str
+    description: str
+    type: WorkflowType
+    steps: List[WorkflowStep]
+    parameters: Dict[str, Any]
+    metadata: Dict[str, Any]
+    is_active: bool
+    created_at: datetime
+    updated_at: datetime
+
+class WorkflowExecutionCreate(BaseModel):
+    workflow_id: str
+    input_data: Dict[str, Any]
+    parameters: Optional[Dict[str, Any]] = None
+
+class WorkflowExecutionResponse(BaseModel):
+    id: str
+    workflow_id: str
+    status: WorkflowStatus
+    current_step_id: Optional[str] = None
+    input_data: Dict[str, Any]
+    output_data: Optional[Dict[str, Any]] = None
+    parameters: Dict[str, Any]
+    error: Optional[str] = None
+    cost: float = 0.0
+    awaiting_review: Optional[List[str]] = None
+    created_at: datetime
+    updated_at: datetime
+    completed_at: Optional[datetime] = None
+
+class WorkflowStepReview(BaseModel):
+    approved: bool
+    comment: Optional[str] = None
@@ -0,0 +1,363 @@
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.core.store import IndexedStore
+from app.services.cost_ledger import CostLedger, CostLimitExceeded, Reservation
+from app.services.providers import (
+    DEFAULT_MAX_TOKENS,
+    Completion,
+    ProviderError,
+    ProviderRegistry,
+)
+from app.services.tokens import TokenCounter, token_counter
+from app.services.response_cache import (
+    COALESCE_PARAMETER,
+    ResponseCache,
+    cache_key,
+    is_cacheable,
+)
+from app.services.singleflight import SingleFlight
+
+# Words per frame when streaming a mock or cached result
+MOCK_STREAM_CHUNK_WORDS = 4
+
+
+class AgentExecutionError(Exception):
+    """
+    Raised when an agent cannot be executed.
+    """
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def render_prompt(agent: Dict[str, Any], task: str) -> str:
+    """
+    Fill the agent's prompt template with the task.
+    """
+    return agent["prompt_template"].replace("{{task}}", task)
+
+
+class AgentExecutor:
+    """
+    Executes agents against their models' providers.
+
+    Shared by the agent execute endpoints and the workflow engine, so callers
+    are expected to have checked that the agent exists and is active. Models
+    whose provider has no client configured (no API key, or a local/custom
+    provider without ``FAKE_PROVIDER_ENABLED``) get a mock result, as before
+    provider support existed. With it, local and custom models are served by
+    the fake provider, which takes time and fails like a real one.
+
+    With a response cache, deterministic executions are answered from the
+    cache when an identical one has run before. Cached results are marked
+    ``"cached": true`` and report a zero cost, since no provider was called.
+
+    Concurrent identical executions share one provider call. The caller that
+    started it gets the result and its cost; the others get a copy marked
+    ``"coalesced": true`` with a zero cost, so the spend is attributed once.
+    Passing ``"coalesce": false`` in the parameters opts out.
+
+    With a cost ledger, every call that reaches a provider (or the mock)
+    first reserves its estimated cost, from the prompt's token count and
+    ``max_tokens``, and is rejected with a 429 once the daily limit is
+    spent. The reservation is settled with the actual cost afterwards.
+    """
+
+    def __init__(
+        self,
+        models: IndexedStore,
+        providers: ProviderRegistry,
+        on_latency: Optional[Callable[[str, float], None]] = None,
+        cache: Optional[ResponseCache] = None,
+        ledger: Optional[CostLedger] = None,
+        tokens: Optional[TokenCounter] = None,
+    ):
+        self.models = models
+        self.providers = providers
+        self.on_latency = on_latency
+        self.cache = cache
+        self.ledger = ledger
+        self.tokens = tokens or token_counter
+        self.flights = SingleFlight()
+
+    def _prepare(
+        self,
+        agent: Dict[str, Any],
+        model_id: Optional[str],
+        parameters: Optional[Dict[str, Any]],
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        # Use provided model_id or default
+        selected_model_id = model_id or agent["default_model_id"]
+
+        # Merge provided parameters with agent defaults
+        merged_parameters = {**agent["parameters"]}
+        if parameters:
+            merged_parameters.update(parameters)
+
+        model = self.models.get(selected_model_id)
+        if model is None:
+            raise AgentExecutionError(f"Model {selected_model_id} not found", status_code=404)
+        return model, merged_parameters
+
+    def _result(
+        self,
+        agent: Dict[str, Any],
+        task: str,
+        model: Dict[str, Any],
+        parameters: Dict[str, Any],
+        completion: Completion,
+    ) -> Dict[str, Any]:
+        return {
+            "agent_id": agent["id"],
+            "task": task,
+            "model_id": model["id"],
+            "parameters": parameters,
+            "status": "completed",
+            "result": completion.text,
+            "cost": self.tokens.estimate(
+                model, completion.prompt_tokens, completion.completion_tokens
+            ),
+        }
+
+    def _mock_result(
+        self,
+        agent: Dict[str, Any],
+        task: str,
+        model: Dict[str, Any],
+        parameters: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        text = f"Mock result for task: {task}"
+        prompt_tokens, completion_tokens = self.tokens.count_batch(
+            [render_prompt(agent, task), text], model
+        )
+        completion = Completion(text, prompt_tokens, completion_tokens)
+        return self._result(agent, task, model, parameters, completion)
+
+    def _partial_result(
+        self,
+        agent: Dict[str, Any],
+        task: str,
+        model: Dict[str, Any],
+        parameters: Dict[str, Any],
+        parts: List[str],
+    ) -> Dict[str, Any]:
+        # Usage of a stream cut short, counted from the prompt and the text received
+        text = "".join(parts)
+        prompt_tokens, completion_tokens = self.tokens.count_batch(
+            [render_prompt(agent, task), text], model
+        )
+        completion = Completion(text, prompt_tokens, completion_tokens if text else 0)
+        return self._result(agent, task, model, parameters, completion)
+
+    async def _reserve(
+        self,
+        agent: Dict[str, Any],
+        task: str,
+        model: Dict[str, Any],
+        parameters: Dict[str, Any],
+        workflow_id: Optional[str],
+    ) -> Optional[Reservation]:
+        if self.ledger is None:
+            return None
+        prompt_tokens = self.tokens.count(render_prompt(agent, task), model)
+        completion_tokens = parameters.get("max_tokens") or DEFAULT_MAX_TOKENS
+        estimate = self.tokens.estimate(model, prompt_tokens, completion_tokens)["total_cost"]
+        try:
+            return await self.ledger.reserve(estimate, model["id"], agent["id"], workflow_id)
+        except CostLimitExceeded as e:
+            raise AgentExecutionError(str(e), status_code=429) from e
+
+    def _settle(self, reservation: Optional[Reservation], result: Optional[Dict[str, Any]]) -> None:
+        if reservation is None:
+            return
+        if result is None:
+            self.ledger.release(reservation)
+        else:
+            self.ledger.settle(reservation, result["cost"]["total_cost"])
+
+    def _cache_key(
+        self,
+        agent: Dict[str, Any],
+        task: str,
+        model: Dict[str, Any],
+        parameters: Dict[str, Any],
+    ) -> Optional[str]:
+        if self.cache is None or not is_cacheable(parameters):
+            return None
+        return cache_key(agent["id"], task, render_prompt(agent, task), model["id"], parameters)
+
+    @staticmethod
+    def _reused(result: Dict[str, Any], flag: str) -> Dict[str, Any]:
+        # No provider call was made for this caller, so it is not charged
+        return {
+            **result,
+            flag: True,
+            "cost": {"prompt_tokens": 0, "completion_tokens": 0, "total_cost": 0.0},
+        }
+
+    @staticmethod
+    def _chunks(text: str) -> Iterator[str]:
+        words = text.split(" ")
+        for start in range(0, len(words), MOCK_STREAM_CHUNK_WORDS):
+            chunk = " ".join(words[start:start + MOCK_STREAM_CHUNK_WORDS])
+            yield chunk if start == 0 else f" {chunk}"
+
+    async def run(
+        self,
+        agent: Dict[str, Any],
+        task: str,
+        model_id: Optional[str] = None,
+        parameters: Optional[Dict[str, Any]] = None,
+        workflow_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Execute an agent on a task and return the result with its cost.
+
+        ``workflow_id`` attributes the spend to the workflow running the agent.
+        """
+        model, merged_parameters = self._prepare(agent, model_id, parameters)
+
+        key = self._cache_key(agent, task, model, merged_parameters)
+        if key is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return self._reused(cached, "cached")
+
+        async def complete() -> Dict[str, Any]:
+            result = await self._complete(agent, task, model, merged_parameters, workflow_id)
+            if key is not None:
+                await self.cache.put(key, result)
+            return result
+
+        if merged_parameters.get(COALESCE_PARAMETER) is False:
+            return await complete()
+
+        flight_key = key or cache_key(
+            agent["id"], task, render_prompt(agent, task), model["id"], merged_parameters
+        )
+        result, shared = await self.flights.do(flight_key, complete)
+        return self._reused(result, "coalesced") if shared else result
+
+    async def _complete(
+        self,
+        agent: Dict[str, Any],
+        task: str,
+        model: Dict[str, Any],
+        merged_parameters: Dict[str, Any],
+        workflow_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        reservation = await self._reserve(agent, task, model, merged_parameters, workflow_id)
+        result = None
+        try:
+            client = self.providers.for_model(model)
+            if client is None:
+                result = self._mock_result(agent, task, model, merged_parameters)
+                return result
+
+            started = time.perf_counter()
+            try:
+                completion = await client.complete(
+                    model["model_id"], render_prompt(agent, task), merged_parameters
+                )
+            except ProviderError as e:
+                # Pass rate limits on, so callers know to back off and retry
+                status_code = 429 if e.status_code == 429 else 502
+                raise AgentExecutionError(str(e), status_code=status_code) from e
+            if self.on_latency is not None:
+                self.on_latency(model["id"], time.perf_counter() - started)
+
+            result = self._result(agent, task, model, merged_parameters, completion)
+            return result
+        finally:
+            self._settle(reservation, result)
+
+    def stream(
+        self,
+        agent: Dict[str, Any],
+        task: str,
+        model_id: Optional[str] = None,
+        parameters: Optional[Dict[str, Any]] = None,
+        workflow_id: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute an agent, yielding frames as the provider produces tokens.
+
+        Frames are ``{"type": "token", "text": ...}`` for each delta and a
+        final ``{"type": "summary", ...}`` carrying the same fields as
+        ``run``'s result, including the cost block. A provider failure after
+        streaming started ends the stream with an ``{"type": "error"}`` frame.
+        Request errors such as an unknown model are raised before the first
+        frame, so callers can still turn them into an HTTP error; a call past
+        the daily cost limit ends the stream with an ``error`` frame.
+
+        If the stream is closed early, e.g. because the client disconnected,
+        the prompt and the tokens received so far are settled in the ledger.
+        """
+        model, merged_parameters = self._prepare(agent, model_id, parameters)
+        return self._stream(agent, task, model, merged_parameters, workflow_id)
+
+    async def _stream(
+        self,
+        agent: Dict[str, Any],
+        task: str,
+        model: Dict[str, Any],
+        parameters: Dict[str, Any],
+        workflow_id: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        key = self._cache_key(agent, task, model, parameters)
+        if key is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                # Replay the cached text so clients handle hits like any stream
+                for chunk in self._chunks(cached["result"]):
+                    yield {"type": "token", "text": chunk}
+                yield {"type": "summary", **self._reused(cached, "cached")}
+                return
+
+        try:
+            reservation = await self._reserve(agent, task, model, parameters, workflow_id)
+        except AgentExecutionError as e:
+            yield {"type": "error", "detail": str(e)}
+            return
+
+        result = None
+        try:
+            client = self.providers.for_model(model)
+            if client is None:
+                result = self._mock_result(agent, task, model, parameters)
+                for chunk in self._chunks(result["result"]):
+                    yield {"type": "token", "text": chunk}
+                if key is not None:
+                    await self.cache.put(key, result)
+                yield {"type": "summary", **result}
+                return
+
+            started = time.perf_counter()
+            parts: List[str] = []
+            failed = False
+            try:
+                async for item in client.stream(
+                    model["model_id"], render_prompt(agent, task), parameters
+                ):
+                    if isinstance(item, Completion):
+                        if self.on_latency is not None:
+                            self.on_latency(model["id"], time.perf_counter() - started)
+                        result = self._result(agent, task, model, parameters, item)
+                        if key is not None:
+                            await self.cache.put(key, result)
+                        yield {"type": "summary", **result}
+                    else:
+                        parts.append(item)
+                        yield {"type": "token", "text": item}
+            except ProviderError as e:
+                failed = True
+                yield {"type": "error", "detail": str(e)}
+            finally:
+                # A stream cut short by the client, or failing after tokens
+                # arrived, was still billed for what the provider produced
+                if result is None and (parts or not failed):
+                    result = self._partial_result(agent, task, model, parameters, parts)
+        finally:
+            self._settle(reservation, result)
@@ -0,0 +1,246 @@
+import ast
+import operator
+from functools import lru_cache
+from typing import Any, Callable, Dict, List
+
+# Longest condition accepted, to keep parse time and nesting bounded
+MAX_EXPRESSION_LENGTH = 1000
+
+Evaluator = Callable[[Dict[str, Any]], Any]
+
+
+class ConditionError(ValueError):
+    """
+    Raised when a condition cannot be compiled or evaluated.
+    """
+
+
+_CONSTANTS = {"true": True, "false": False, "null": None, "none": None}
+
+_FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "len": len,
+    "abs": abs,
+    "min": min,
+    "max": max,
+    "int": int,
+    "float": float,
+    "str": str,
+    "bool": bool,
+}
+
+
+def _numeric(symbol: str, function: Callable[[Any, Any], Any]) -> Callable[[Any, Any], Any]:
+    """
+    Restrict an operator to numbers, so ``"x" * 10**9`` or ``"%9999999d" % 1``
+    cannot be used to exhaust memory.
+    """
+    def apply(left: Any, right: Any) -> Any:
+        if not all(isinstance(value, (int, float)) for value in (left, right)):
+            raise ConditionError(f"'{symbol}' only supports numbers")
+        return function(left, right)
+    return apply
+
+
+_BINARY_OPERATORS: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: _numeric("*", operator.mul),
+    ast.Div: operator.truediv,
+    ast.Mod: _numeric("%", operator.mod),
+}
+
+_UNARY_OPERATORS: Dict[type, Callable[[Any], Any]] = {
+    ast.Not: operator.not_,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+_COMPARISONS: Dict[type, Callable[[Any, Any], bool]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda left, right: left in right,
+    ast.NotIn: lambda left, right: left not in right,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+}
+
+
+def _lookup(container: Any, key: Any) -> Any:
+    """
+    Read a key from a dict or an index from a list, returning None if absent.
+    """
+    if isinstance(container, dict):
+        return container.get(key)
+    if isinstance(container, (list, tuple, str)) and isinstance(key, int):
+        try:
+            return container[key]
+        except IndexError:
+            return None
+    return None
+
+
+def _compile_node(node: ast.AST) -> Evaluator:
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return lambda context: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name in _CONSTANTS:
+            constant = _CONSTANTS[name]
+            return lambda context: constant
+        return lambda context: context.get(name)
+
+    if isinstance(node, ast.Attribute):
+        # Attribute access is sugar for a key lookup; Python attributes are never read
+        target = _compile_node(node.value)
+        attr = node.attr
+        return lambda context: _lookup(target(context), attr)
+
+    if isinstance(node, ast.Subscript):
+        target = _compile_node(node.value)
+        key = _compile_node(node.slice)
+        return lambda context: _lookup(target(context), key(context))
+
+    if isinstance(node, ast.BoolOp):
+        operands = [_compile_node(value) for value in node.values]
+        if isinstance(node.op, ast.And):
+            def evaluate_and(context: Dict[str, Any]) -> Any:
+                result = True
+                for operand in operands:
+                    result = operand(context)
+                    if not result:
+                        return result
+                return result
+            return evaluate_and
+
+        def evaluate_or(context: Dict[str, Any]) -> Any:
+            result = False
+            for operand in operands:
+                result = operand(context)
+                if result:
+                    return result
+            return result
+        return evaluate_or
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        unary = _UNARY_OPERATORS[type(node.op)]
+        operand = _compile_node(node.operand)
+        return lambda context: unary(operand(context))
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        binary = _BINARY_OPERATORS[type(node.op)]
+        left = _compile_node(node.left)
+        right = _compile_node(node.right)
+        return lambda context: binary(left(context), right(context))
+
+    if isinstance(node, ast.Compare):
+        first = _compile_node(node.left)
+        comparisons = [
+            (_COMPARISONS[type(op)], _compile_node(comparator))
+            for op, comparator in zip(node.ops, node.comparators)
+            if type(op) in _COMPARISONS
+        ]
+        if len(comparisons) != len(node.ops):
+            raise ConditionError("Unsupported comparison operator")
+
+        def evaluate_compare(context: Dict[str, Any]) -> bool:
+            left = first(context)
+            for compare, comparator in comparisons:
+                right = comparator(context)
+                if not compare(left, right):
+                    return False
+                left = right
+            return True
+        return evaluate_compare
+
+    if isinstance(node, ast.IfExp):
+        test = _compile_node(node.test)
+        body = _compile_node(node.body)
+        orelse = _compile_node(node.orelse)
+        return lambda context: body(context) if test(context) else orelse(context)
+
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        items = [_compile_node(item) for item in node.elts]
+        container = {ast.List: list, ast.Tuple: tuple, ast.Set: set}[type(node)]
+        return lambda context: container(item(context) for item in items)
+
+    if isinstance(node, ast.Dict):
+        if any(key is None for key in node.keys):
+            raise ConditionError("Dict unpacking is not supported")
+        pairs = [
+            (_compile_node(key), _compile_node(value))
+            for key, value in zip(node.keys, node.values)
+        ]
+        return lambda context: {key(context): value(context) for key, value in pairs}
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS:
+            raise ConditionError("Only built-in condition functions can be called")
+        if node.keywords:
+            raise ConditionError("Keyword arguments are not supported")
+        function = _FUNCTIONS[node.func.id]
+        arguments = [_compile_node(argument) for argument in node.args]
+        return lambda context: function(*(argument(context) for argument in arguments))
+
+    if isinstance(node, (ast.BinOp, ast.UnaryOp)):
+        raise ConditionError(f"Unsupported operator: {type(node.op).__name__}")
+    raise ConditionError(f"Unsupported expression element: {type(node).__name__}")
+
+
+@lru_cache(maxsize=1024)
+def compile_condition(expression: str) -> Callable[[Dict[str, Any]], bool]:
+    """
+    Compile a condition expression into a reusable evaluator.
+
+    The language is a small, side-effect-free subset of Python expressions:
+    literals, ``and``/``or``/``not``, comparisons including ``in``,
+    arithmetic, conditional expressions, key lookups written as
+    ``input.field`` or ``steps["step1"]["status"]`` and the functions
+    ``len``, ``abs``, ``min``, ``max``, ``int``, ``float``, ``str`` and
+    ``bool``. Missing keys read as ``None``. Parsing happens once; the
+    returned closure only walks pre-built Python functions.
+    """
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ConditionError(f"Condition is longer than {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ConditionError(f"Invalid condition syntax: {e.msg}") from e
+
+    evaluate = _compile_node(tree.body)
+
+    def condition(context: Dict[str, Any]) -> bool:
+        try:
+            return bool(evaluate(context))
+        except ConditionError:
+            raise
+        except Exception as e:
+            raise ConditionError(f"Condition {expression!r} failed: {e}") from e
+
+    return condition
+
+
+def condition_context(
+    input_data: Dict[str, Any],
+    outputs: Dict[str, Any],
+    parameters: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Build the names a condition can read during a workflow execution.
+    """
+    return {"input": input_data, "steps": outputs, "parameters": parameters}
+
+
+def branch_targets(next_steps: List[str], passed: bool) -> List[str]:
+    """
+    Pick the successors a condition step activates.
+
+    The first entry of ``next_steps`` is the branch taken when the condition
+    holds; the remaining entries are taken when it does not.
+    """
+    return next_steps[:1] if passed else next_steps[1:]
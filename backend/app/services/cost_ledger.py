@@ -0,0 +1,445 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.store import IndexedStore
+
+logger = logging.getLogger(__name__)
+
+# Rollups kept per call, besides the daily total
+SCOPES = ("model", "agent", "workflow")
+
+
+class CostLimitExceeded(Exception):
+    """
+    Raised when a call would take the day's spend past the daily limit.
+    """
+
+
+class Reservation:
+    """
+    Spend held for one provider call until its actual cost is known.
+    """
+
+    __slots__ = ("amount", "day", "model_id", "agent_id", "workflow_id")
+
+    def __init__(
+        self,
+        amount: float,
+        day: str,
+        model_id: str,
+        agent_id: str,
+        workflow_id: Optional[str],
+    ):
+        self.amount = amount
+        self.day = day
+        self.model_id = model_id
+        self.agent_id = agent_id
+        self.workflow_id = workflow_id
+
+
+def _record_id(scope: str, key: str) -> str:
+    return f"{scope}:{key}"
+
+
+class CostLedger:
+    """
+    Tracks spend per model, agent, workflow and day against a daily limit.
+
+    Before a provider call its estimated cost is reserved, and the call is
+    rejected if today's spend plus outstanding reservations would pass
+    ``daily_limit``. That check compares two running totals, so it costs the
+    same however many calls are in flight. Once the call returns, ``settle``
+    swaps the reservation for the actual cost; ``release`` drops it if the
+    call failed.
+
+    Rollups are updated in memory and written to ``store`` every
+    ``flush_interval`` seconds, one record per changed rollup, so the spend
+    survives a restart when the store is persisted. This ledger enforces
+    the limit within one process; workers sharing the budget use
+    ``RedisCostLedger``.
+    """
+
+    def __init__(
+        self,
+        store: IndexedStore,
+        daily_limit: float,
+        flush_interval: float = 5.0,
+    ):
+        self.store = store
+        self.daily_limit = daily_limit
+        self.flush_interval = flush_interval
+        # (scope, key) -> [cost, calls]
+        self._rollups: Dict[Tuple[str, str], list] = {}
+        self._dirty: set = set()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._day = ""
+        self._day_ends = 0.0
+        self.spent = 0.0
+        self.reserved = 0.0
+        self.rejected = 0
+        self._roll_day()
+
+    def _roll_day(self) -> None:
+        if time.time() < self._day_ends:
+            return
+        today = date.today()
+        self._day = today.isoformat()
+        self._day_ends = datetime.combine(today + timedelta(days=1), datetime.min.time()).timestamp()
+        self.spent = self._rollups.get(("day", self._day), [0.0, 0])[0]
+        # Reservations from yesterday are settled against yesterday
+        self.reserved = 0.0
+
+    def load(self) -> None:
+        """
+        Pick up rollups from the store, e.g. after it was loaded from the database.
+        """
+        for record in self.store.values():
+            self._rollups[(record["scope"], record["key"])] = [record["cost"], record["calls"]]
+        self._day_ends = 0.0
+        self._roll_day()
+
+    async def start(self) -> None:
+        pass
+
+    def _reject(self, estimate: float, spent: float, reserved: float) -> None:
+        self.rejected += 1
+        raise CostLimitExceeded(
+            f"Daily cost limit of ${self.daily_limit:.2f} reached "
+            f"(spent ${spent:.4f}, reserved ${reserved:.4f}, "
+            f"estimated ${estimate:.4f})"
+        )
+
+    async def reserve(
+        self,
+        estimate: float,
+        model_id: str,
+        agent_id: str,
+        workflow_id: Optional[str] = None,
+    ) -> Reservation:
+        """
+        Hold ``estimate`` of today's budget for a call.
+
+        Raises CostLimitExceeded if the budget left cannot cover it.
+        """
+        self._roll_day()
+        if self.spent + self.reserved + estimate > self.daily_limit:
+            self._reject(estimate, self.spent, self.reserved)
+        self.reserved += estimate
+        return Reservation(estimate, self._day, model_id, agent_id, workflow_id)
+
+    def release(self, reservation: Reservation) -> None:
+        """
+        Give back a reservation whose call made no charge.
+        """
+        self._roll_day()
+        if reservation.day == self._day:
+            self.reserved = max(self.reserved - reservation.amount, 0.0)
+
+    def settle(self, reservation: Reservation, cost: float) -> None:
+        """
+        Replace a reservation with the call's actual cost.
+        """
+        self.release(reservation)
+        if reservation.day == self._day:
+            self.spent += cost
+        self._add("day", reservation.day, cost)
+        self._add("model", reservation.model_id, cost)
+        self._add("agent", reservation.agent_id, cost)
+        if reservation.workflow_id is not None:
+            self._add("workflow", reservation.workflow_id, cost)
+        self._schedule()
+
+    def _add(self, scope: str, key: str, cost: float) -> None:
+        rollup = self._rollups.get((scope, key))
+        if rollup is None:
+            rollup = self._rollups[(scope, key)] = [0.0, 0]
+        rollup[0] += cost
+        rollup[1] += 1
+        self._dirty.add((scope, key))
+
+    def _schedule(self) -> None:
+        if self._timer is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        self._timer = loop.call_later(self.flush_interval, self.flush)
+
+    def flush(self) -> None:
+        """
+        Write the rollups changed since the last flush to the store.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        dirty, self._dirty = self._dirty, set()
+        now = datetime.now()
+        for scope, key in dirty:
+            cost, calls = self._rollups[(scope, key)]
+            record_id = _record_id(scope, key)
+            self.store[record_id] = {
+                "id": record_id,
+                "scope": scope,
+                "key": key,
+                "cost": cost,
+                "calls": calls,
+                "updated_at": now,
+            }
+
+    async def refresh(self) -> None:
+        """
+        Bring the rollups up to date before they are reported.
+        """
+
+    async def close(self) -> None:
+        """
+        Write out the last changes, e.g. on shutdown.
+        """
+        self.flush()
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Return today's budget and the rollups per model, agent, workflow and day.
+        """
+        self._roll_day()
+        rollups: Dict[str, Dict[str, Dict[str, Any]]] = {scope: {} for scope in ("day",) + SCOPES}
+        for (scope, key), (cost, calls) in self._rollups.items():
+            rollups[scope][key] = {"cost": cost, "calls": calls}
+        return {
+            "day": self._day,
+            "daily_limit": self.daily_limit,
+            "spent": self.spent,
+            "reserved": self.reserved,
+            "remaining": max(self.daily_limit - self.spent - self.reserved, 0.0),
+            "rejected": self.rejected,
+            "rollups": rollups,
+        }
+
+
+# Adds the estimate to today's reservations unless that would pass the limit.
+# KEYS: cost totals, reservations; ARGV: day rollup field, day, estimate, limit
+_RESERVE = """
+local spent = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+local reserved = tonumber(redis.call('HGET', KEYS[2], ARGV[2]) or '0')
+if spent + reserved + tonumber(ARGV[3]) > tonumber(ARGV[4]) then
+    return {0, tostring(spent), tostring(reserved)}
+end
+reserved = redis.call('HINCRBYFLOAT', KEYS[2], ARGV[2], ARGV[3])
+return {1, tostring(spent), reserved}
+"""
+
+
+class RedisCostLedger(CostLedger):
+    """
+    Cost ledger whose totals live in Redis, shared by every worker.
+
+    Rollup costs and call counts are fields of the ``<prefix>:cost`` and
+    ``<prefix>:calls`` hashes, and today's reservations a field of
+    ``<prefix>:reserved``. ``reserve`` checks the shared spend and
+    reservations against ``daily_limit`` and adds the estimate in one
+    script, so the workers together stay within the limit. Settled costs
+    and released reservations are sent as increments, never as totals, so
+    no worker overwrites another's spend; they go out in one pipeline as
+    soon as the previous one has finished. The totals Redis answers with
+    are what ``summary`` reports and what is written to ``store``.
+
+    At startup Redis is seeded from the store, only where a field has no
+    value yet, so several workers starting together count the persisted
+    spend once. If Redis cannot be reached, calls are checked against the
+    last totals seen and the increments are sent once it is back. A
+    reservation held by a worker that stops mid-call is not given back
+    until the day ends.
+    """
+
+    def __init__(
+        self,
+        store: IndexedStore,
+        daily_limit: float,
+        flush_interval: float = 5.0,
+        host: str = "localhost",
+        port: int = 6379,
+        prefix: str = "themachine:costs",
+    ):
+        super().__init__(store, daily_limit, flush_interval)
+        self.host = host
+        self.port = port
+        self.prefix = prefix
+        self._client = None
+        self._reserve_script = None
+        # Increments not yet sent, by hash field
+        self._cost_deltas: Dict[str, float] = defaultdict(float)
+        self._call_deltas: Dict[str, int] = defaultdict(int)
+        self._reserved_deltas: Dict[str, float] = defaultdict(float)
+        self._pushing: Optional[asyncio.Task] = None
+        self.failures = 0
+
+    @staticmethod
+    def _field(scope: str, key: str) -> str:
+        return f"{scope}:{key}"
+
+    async def start(self) -> None:
+        # Imported here so the in-process ledger works without the Redis client
+        from redis import asyncio as aioredis
+
+        self._client = aioredis.Redis(host=self.host, port=self.port)
+        self._reserve_script = self._client.register_script(_RESERVE)
+        pipe = self._client.pipeline(transaction=False)
+        for (scope, key), (cost, calls) in self._rollups.items():
+            pipe.hsetnx(f"{self.prefix}:cost", self._field(scope, key), cost)
+            pipe.hsetnx(f"{self.prefix}:calls", self._field(scope, key), calls)
+        await pipe.execute()
+        await self.refresh()
+
+    async def refresh(self) -> None:
+        if self._client is None:
+            return
+        try:
+            costs = await self._client.hgetall(f"{self.prefix}:cost")
+            calls = await self._client.hgetall(f"{self.prefix}:calls")
+            reserved = await self._client.hget(f"{self.prefix}:reserved", self._day)
+        except Exception:
+            self.failures += 1
+            logger.warning("Reading the shared spend from Redis failed", exc_info=True)
+            return
+        for field, cost in costs.items():
+            scope, key = field.decode().split(":", 1)
+            # Increments still queued here are not in Redis yet
+            pending = self._cost_deltas.get(field.decode(), 0.0)
+            count = int(calls.get(field, 0)) + self._call_deltas.get(field.decode(), 0)
+            self._rollups[(scope, key)] = [float(cost) + pending, count]
+        self._day_ends = 0.0
+        self._roll_day()
+        self.reserved = float(reserved or 0.0) + self._reserved_deltas.get(self._day, 0.0)
+
+    async def reserve(
+        self,
+        estimate: float,
+        model_id: str,
+        agent_id: str,
+        workflow_id: Optional[str] = None,
+    ) -> Reservation:
+        if self._client is None:
+            # Not started, e.g. without the lifespan: this process only
+            return await super().reserve(estimate, model_id, agent_id, workflow_id)
+        self._roll_day()
+        try:
+            admitted, spent, reserved = await self._reserve_script(
+                keys=[f"{self.prefix}:cost", f"{self.prefix}:reserved"],
+                args=[self._field("day", self._day), self._day, estimate, self.daily_limit],
+            )
+        except Exception:
+            self.failures += 1
+            logger.warning("Reserving spend in Redis failed; checking the last totals", exc_info=True)
+            reservation = await super().reserve(estimate, model_id, agent_id, workflow_id)
+            self._reserved_deltas[reservation.day] += estimate
+            return reservation
+        self.spent = float(spent) + self._cost_deltas.get(self._field("day", self._day), 0.0)
+        self.reserved = float(reserved)
+        if not admitted:
+            self._reject(estimate, self.spent, self.reserved)
+        return Reservation(estimate, self._day, model_id, agent_id, workflow_id)
+
+    def release(self, reservation: Reservation) -> None:
+        super().release(reservation)
+        self._reserved_deltas[reservation.day] -= reservation.amount
+        self._push_soon()
+
+    def _add(self, scope: str, key: str, cost: float) -> None:
+        super()._add(scope, key, cost)
+        field = self._field(scope, key)
+        self._cost_deltas[field] += cost
+        self._call_deltas[field] += 1
+
+    def _schedule(self) -> None:
+        self._push_soon()
+        super()._schedule()
+
+    def _push_soon(self) -> None:
+        if self._client is None or (self._pushing is not None and not self._pushing.done()):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._pushing = loop.create_task(self._push())
+
+    async def _push(self) -> None:
+        while self._cost_deltas or self._call_deltas or self._reserved_deltas:
+            costs, self._cost_deltas = self._cost_deltas, defaultdict(float)
+            calls, self._call_deltas = self._call_deltas, defaultdict(int)
+            reserved, self._reserved_deltas = self._reserved_deltas, defaultdict(float)
+            pipe = self._client.pipeline(transaction=False)
+            for field, cost in costs.items():
+                pipe.hincrbyfloat(f"{self.prefix}:cost", field, cost)
+            for field, count in calls.items():
+                pipe.hincrby(f"{self.prefix}:calls", field, count)
+            for day, amount in reserved.items():
+                pipe.hincrbyfloat(f"{self.prefix}:reserved", day, amount)
+            try:
+                results = iter(await pipe.execute())
+            except Exception:
+                self.failures += 1
+                logger.warning("Sending spend to Redis failed; retrying later", exc_info=True)
+                for field, cost in costs.items():
+                    self._cost_deltas[field] += cost
+                for field, count in calls.items():
+                    self._call_deltas[field] += count
+                for day, amount in reserved.items():
+                    self._reserved_deltas[day] += amount
+                return
+            # Take the shared totals, which include every other worker's spend
+            cost_totals = {field: float(next(results)) for field in costs}
+            call_totals = {field: int(next(results)) for field in calls}
+            for field, cost in cost_totals.items():
+                scope, key = field.split(":", 1)
+                pending = self._cost_deltas.get(field, 0.0)
+                count = call_totals.get(field, 0) + self._call_deltas.get(field, 0)
+                self._rollups[(scope, key)] = [cost + pending, count]
+                self._dirty.add((scope, key))
+            for day, total in zip(reserved, results):
+                if day == self._day:
+                    self.reserved = float(total) + self._reserved_deltas.get(day, 0.0)
+            self.spent = self._rollups.get(("day", self._day), [0.0, 0])[0]
+
+    async def close(self) -> None:
+        if self._client is not None:
+            if self._pushing is not None:
+                await asyncio.gather(self._pushing, return_exceptions=True)
+            await self._push()
+            # Store the latest shared totals, including other workers' spend
+            await self.refresh()
+            self._dirty.update(self._rollups)
+            await self._client.aclose()
+            self._client = None
+        self.flush()
+
+    def summary(self) -> Dict[str, Any]:
+        return {**super().summary(), "shared": True, "failures": self.failures}
+
+
+def create_cost_ledger(
+    backend: str,
+    store: IndexedStore,
+    daily_limit: float,
+    flush_interval: float,
+    redis_host: str,
+    redis_port: int,
+    prefix: str,
+) -> CostLedger:
+    """
+    Create the cost ledger for an EVENT_BUS_BACKEND setting: workers that
+    share an event bus share their budget as well.
+    """
+    if backend == "memory":
+        return CostLedger(store, daily_limit, flush_interval)
+    if backend == "redis":
+        return RedisCostLedger(
+            store, daily_limit, flush_interval, redis_host, redis_port, prefix
+        )
+    raise ValueError(f"Unknown cost ledger backend: {backend}")
@@ -0,0 +1,321 @@
+import asyncio
+import logging
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.store import IndexedStore, Listener
+from app.db.repository import decode_record, encode_record
+
+logger = logging.getLogger(__name__)
+
+# Called with a collection, record id and the new record, or None when it was deleted
+Handler = Callable[[str, str, Optional[dict]], None]
+
+# Identifies this worker process on the bus and as the owner of the work it runs
+WORKER_ID = uuid.uuid4().hex
+
+
+class EventBus:
+    """
+    Carries store changes between the server's worker processes.
+
+    Each worker publishes the changes made to its own stores and receives
+    the changes made by every other worker, never its own. Events are whole
+    records, so applying one needs no earlier state; a worker that missed
+    events is consistent again once the record changes next.
+
+    The bus also tells which workers are alive, by ``worker_id``, and holds
+    short locks, so work left by a worker that is gone is resumed by
+    exactly one other. ``distributed`` is set when the workers can be
+    separate processes or hosts.
+    """
+
+    distributed = False
+
+    def __init__(self, worker_id: Optional[str] = None):
+        self.worker_id = worker_id or uuid.uuid4().hex
+        self._handlers: List[Handler] = []
+        self.published = 0
+        self.received = 0
+
+    def subscribe(self, handler: Handler) -> None:
+        """
+        Call ``handler(collection, record_id, record)`` for every change another worker made.
+        """
+        self._handlers.append(handler)
+
+    def unsubscribe(self, handler: Handler) -> None:
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+
+    async def start(self) -> None:
+        pass
+
+    def publish(self, collection: str, record_id: str, record: Optional[dict]) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+    async def live_workers(self) -> Set[str]:
+        """
+        Return the ids of the workers currently connected, this one included.
+        """
+        return {self.worker_id}
+
+    async def acquire(self, name: str, ttl: float) -> bool:
+        """
+        Take the lock ``name`` for ``ttl`` seconds unless another worker holds it.
+        """
+        return True
+
+    def _deliver(self, collection: str, record_id: str, record: Optional[dict]) -> None:
+        self.received += 1
+        for handler in self._handlers:
+            try:
+                handler(collection, record_id, record)
+            except Exception:
+                logger.exception("Handling a %s change from another worker failed", collection)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self).__name__,
+            "published": self.published,
+            "received": self.received,
+        }
+
+
+# In-memory buses by group name
+_LOCAL_GROUPS: Dict[str, List["InMemoryEventBus"]] = {}
+
+
+class InMemoryEventBus(EventBus):
+    """
+    Event bus between buses of the same group in one process.
+
+    With a single worker there are no peers and publishing costs nothing.
+    Tests create several buses in one group to stand in for workers.
+    Events go through the same encoding as on Redis, so a peer never
+    shares a record object with the publisher.
+    """
+
+    def __init__(self, group: str = "default", worker_id: Optional[str] = None):
+        super().__init__(worker_id)
+        self.group = group
+
+    async def start(self) -> None:
+        peers = _LOCAL_GROUPS.setdefault(self.group, [])
+        if self not in peers:
+            peers.append(self)
+
+    def publish(self, collection: str, record_id: str, record: Optional[dict]) -> None:
+        peers = [bus for bus in _LOCAL_GROUPS.get(self.group, ()) if bus is not self]
+        if not peers:
+            return
+        self.published += 1
+        payload = encode_record({"collection": collection, "id": record_id, "record": record})
+        for bus in peers:
+            event = decode_record(payload)
+            bus._deliver(event["collection"], event["id"], event["record"])
+
+    async def close(self) -> None:
+        peers = _LOCAL_GROUPS.get(self.group, [])
+        if self in peers:
+            peers.remove(self)
+
+    async def live_workers(self) -> Set[str]:
+        return {self.worker_id} | {bus.worker_id for bus in _LOCAL_GROUPS.get(self.group, ())}
+
+
+class RedisEventBus(EventBus):
+    """
+    Event bus over a Redis pub/sub channel shared by every worker.
+
+    Events are encoded once and queued for a sender task, so publishing
+    never waits on Redis; if Redis is unreachable the queue holds up to
+    ``max_pending`` events and then drops the oldest. Each event carries the
+    publishing worker's id so a worker can skip its own events. Pub/sub does
+    not keep messages, so events published while a worker is disconnected
+    are not delivered to it; it resubscribes after ``retry_interval``.
+
+    Every worker refreshes a ``<channel>:worker:<id>`` key expiring after
+    ``worker_ttl`` seconds, and counts as alive while it exists. Locks are
+    keys set only if absent, expiring on their own.
+    """
+
+    distributed = True
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        channel: str = "themachine:changes",
+        max_pending: int = 10000,
+        retry_interval: float = 1.0,
+        worker_ttl: float = 15.0,
+        worker_id: Optional[str] = None,
+    ):
+        super().__init__(worker_id)
+        self.host = host
+        self.port = port
+        self.channel = channel
+        self.retry_interval = retry_interval
+        self.worker_ttl = worker_ttl
+        self._outgoing: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._client = None
+        self._tasks: List[asyncio.Task] = []
+        self.dropped = 0
+        self.failures = 0
+
+    async def start(self) -> None:
+        # Imported here so the in-memory bus works without the Redis client
+        from redis import asyncio as aioredis
+
+        self._client = aioredis.Redis(host=self.host, port=self.port)
+        self._tasks = [
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._send()),
+            asyncio.create_task(self._heartbeat()),
+        ]
+
+    def publish(self, collection: str, record_id: str, record: Optional[dict]) -> None:
+        payload = encode_record(
+            {"origin": self.worker_id, "collection": collection, "id": record_id, "record": record}
+        )
+        if self._outgoing.full():
+            self._outgoing.get_nowait()
+            self.dropped += 1
+        self._outgoing.put_nowait(payload)
+        self.published += 1
+
+    async def _send(self) -> None:
+        while True:
+            payload = await self._outgoing.get()
+            try:
+                await self._client.publish(self.channel, payload)
+            except Exception:
+                self.failures += 1
+                logger.warning("Publishing a change to Redis failed", exc_info=True)
+            finally:
+                self._outgoing.task_done()
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    event = decode_record(message["data"].decode())
+                    if event["origin"] != self.worker_id:
+                        self._deliver(event["collection"], event["id"], event["record"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failures += 1
+                logger.warning(
+                    "Redis subscription lost; resubscribing in %.1fs",
+                    self.retry_interval,
+                    exc_info=True,
+                )
+            finally:
+                await pubsub.aclose()
+            await asyncio.sleep(self.retry_interval)
+
+    async def _heartbeat(self) -> None:
+        key = f"{self.channel}:worker:{self.worker_id}"
+        while True:
+            try:
+                await self._client.set(key, 1, px=int(self.worker_ttl * 1000))
+            except Exception:
+                self.failures += 1
+                logger.warning("Refreshing the worker heartbeat in Redis failed", exc_info=True)
+            await asyncio.sleep(self.worker_ttl / 3)
+
+    async def live_workers(self) -> Set[str]:
+        prefix = f"{self.channel}:worker:"
+        live = {self.worker_id}
+        async for key in self._client.scan_iter(match=f"{prefix}*"):
+            live.add(key.decode()[len(prefix):])
+        return live
+
+    async def acquire(self, name: str, ttl: float) -> bool:
+        key = f"{self.channel}:lock:{name}"
+        return bool(await self._client.set(key, self.worker_id, nx=True, px=int(ttl * 1000)))
+
+    async def close(self) -> None:
+        if self._client is None:
+            return
+        try:
+            # Give queued changes a moment to go out
+            await asyncio.wait_for(self._outgoing.join(), timeout=1.0)
+        except asyncio.TimeoutError:
+            pass
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        try:
+            # Leave at once rather than when the heartbeat expires
+            await self._client.delete(f"{self.channel}:worker:{self.worker_id}")
+        except Exception:
+            pass
+        await self._client.aclose()
+        self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "pending": self._outgoing.qsize(),
+            "dropped": self.dropped,
+            "failures": self.failures,
+        }
+
+
+def create_event_bus(
+    backend: str,
+    redis_host: str,
+    redis_port: int,
+    channel: str,
+    worker_ttl: float = 15.0,
+) -> EventBus:
+    """
+    Create this worker's event bus for an EVENT_BUS_BACKEND setting.
+    """
+    if backend == "memory":
+        return InMemoryEventBus(worker_id=WORKER_ID)
+    if backend == "redis":
+        return RedisEventBus(
+            redis_host, redis_port, channel, worker_ttl=worker_ttl, worker_id=WORKER_ID
+        )
+    raise ValueError(f"Unknown event bus backend: {backend}")
+
+
+def replicate_stores(bus: EventBus, stores: Dict[str, IndexedStore]) -> Callable[[], None]:
+    """
+    Publish changes to the stores on the bus and apply other workers' changes to them.
+
+    Returns a function that stops both, e.g. on shutdown.
+    """
+    listeners: List[Tuple[IndexedStore, Listener]] = []
+    for collection, store in stores.items():
+        def publish(record_id: str, record: Optional[dict], collection: str = collection) -> None:
+            bus.publish(collection, record_id, record)
+
+        store.subscribe(publish)
+        listeners.append((store, publish))
+
+    def apply(collection: str, record_id: str, record: Optional[dict]) -> None:
+        store = stores.get(collection)
+        if store is not None:
+            store.replicate(record_id, record)
+
+    bus.subscribe(apply)
+
+    def detach() -> None:
+        bus.unsubscribe(apply)
+        for store, listener in listeners:
+            store.unsubscribe(listener)
+
+    return detach
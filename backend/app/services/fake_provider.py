@@ -0,0 +1,315 @@
+import asyncio
+import hashlib
+import math
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Union
+
+from app.services.providers import DEFAULT_MAX_TOKENS, Completion, ProviderError
+from app.services.tokens import TokenCounter, token_counter
+
+# Timing and failure profile of a fake model. FAKE_PROVIDER_PROFILE overrides
+# these for every model, and a model's ``metadata["fake_provider"]`` for that
+# model only.
+DEFAULT_PROFILE: Dict[str, Any] = {
+    "latency": 0.2,  # Median seconds to the first token
+    "latency_distribution": "lognormal",  # fixed, uniform or lognormal
+    "latency_spread": 0.5,  # Fraction either side of the median for uniform, sigma for lognormal
+    "tokens_per_second": 50.0,  # Generation speed after the first token; 0 for no delay
+    "chunk_tokens": 1,  # Tokens per streamed chunk
+    "completion_tokens": 128,  # Reply length, capped by the request's max_tokens
+    "error_rate": 0.0,  # Fraction of calls failing with a 500
+    "rate_limit_rate": 0.0,  # Fraction of calls rejected with a 429
+    "requests_per_minute": 0,  # Calls per model per minute before 429s; 0 for no limit
+}
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+# Replies are drawn from these words, one token each in the GPT encodings
+_WORDS = (
+    "the", "model", "returns", "a", "result", "for", "this", "task", "with",
+    "code", "and", "tests", "that", "check", "each", "step", "of", "plan",
+    "data", "from", "input", "to", "output", "in", "order", "then", "we",
+    "update", "state", "when", "done", "it",
+)
+
+
+def fake_profile(model: Dict[str, Any], defaults: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Return the profile of a model record, layered over ``defaults``.
+
+    Raises ValueError for unknown keys or out-of-range values.
+    """
+    overrides = (model.get("metadata") or {}).get("fake_provider") or {}
+    if not isinstance(overrides, dict):
+        raise ValueError("metadata.fake_provider must be an object")
+    profile = {**DEFAULT_PROFILE, **(defaults or {}), **overrides}
+
+    unknown = sorted(set(profile) - set(DEFAULT_PROFILE))
+    if unknown:
+        raise ValueError(f"Unknown fake provider settings: {', '.join(unknown)}")
+    for key, value in DEFAULT_PROFILE.items():
+        if isinstance(value, str):
+            continue
+        try:
+            profile[key] = type(value)(profile[key])
+        except (TypeError, ValueError):
+            raise ValueError(f"{key} must be a number") from None
+    if profile["latency_distribution"] not in LATENCY_DISTRIBUTIONS:
+        raise ValueError(
+            f"latency_distribution must be one of {', '.join(LATENCY_DISTRIBUTIONS)}"
+        )
+    for key in ("latency", "latency_spread", "tokens_per_second", "requests_per_minute"):
+        if profile[key] < 0:
+            raise ValueError(f"{key} must not be negative")
+    for key in ("chunk_tokens", "completion_tokens"):
+        if profile[key] < 1:
+            raise ValueError(f"{key} must be at least 1")
+    for key in ("error_rate", "rate_limit_rate"):
+        if not 0 <= profile[key] <= 1:
+            raise ValueError(f"{key} must be between 0 and 1")
+    return profile
+
+
+def _latency(profile: Dict[str, Any], rng: random.Random) -> float:
+    median = profile["latency"]
+    spread = profile["latency_spread"]
+    distribution = profile["latency_distribution"]
+    if distribution == "uniform":
+        return max(rng.uniform(median * (1 - spread), median * (1 + spread)), 0.0)
+    if distribution == "lognormal":
+        return median * math.exp(rng.gauss(0.0, spread))
+    return median
+
+
+class FakeCall:
+    """
+    The outcome of one call, drawn before it starts.
+    """
+
+    __slots__ = ("latency", "status_code", "tokens", "token_interval", "chunk_tokens")
+
+    def __init__(
+        self,
+        latency: float,
+        status_code: int,
+        tokens: List[str],
+        token_interval: float,
+        chunk_tokens: int,
+    ):
+        self.latency = latency
+        self.status_code = status_code
+        self.tokens = tokens
+        self.token_interval = token_interval
+        self.chunk_tokens = chunk_tokens
+
+
+class FakeProviderClient:
+    """
+    In-process stand-in for an LLM provider, serving local and custom models.
+
+    Calls take time and fail like a remote provider's would, without a
+    network or API key: each waits for a time to first token drawn from the
+    model's latency distribution, then generates its reply at
+    ``tokens_per_second``, streamed ``chunk_tokens`` at a time. A share of
+    calls fails with a 500 or a 429, and a model called more than
+    ``requests_per_minute`` times within a minute is rate limited.
+
+    Outcomes are deterministic: the latency, any injected failure and the
+    reply are drawn from a generator seeded with ``seed``, the model id and
+    the prompt, so a run with the same prompts behaves the same way every
+    time. Only the per-minute rate limit depends on timing.
+
+    Prompt tokens are counted with the model's tokenizer, as cost estimates
+    are, and completion tokens are the tokens actually generated, so the
+    cost ledger settles the same amounts a real provider's usage would give.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_in_flight: int,
+        seed: int = 0,
+        defaults: Optional[Dict[str, Any]] = None,
+        tokens: Optional[TokenCounter] = None,
+    ):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.seed = seed
+        self.defaults = defaults or {}
+        self.tokens = tokens or token_counter
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        # model id -> start times of its calls within the last minute
+        self._recent: Dict[str, Deque[float]] = {}
+        # model id -> call counters
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def bind(self, model: Dict[str, Any]) -> "FakeModelClient":
+        return FakeModelClient(self, model)
+
+    def _counter(self, model: Dict[str, Any]) -> Dict[str, int]:
+        counter = self._counters.get(model["id"])
+        if counter is None:
+            counter = self._counters[model["id"]] = {
+                "calls": 0,
+                "completed": 0,
+                "errors": 0,
+                "rate_limited": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+            }
+        return counter
+
+    def _plan(self, model: Dict[str, Any], prompt: str, parameters: Dict[str, Any]) -> FakeCall:
+        try:
+            profile = fake_profile(model, self.defaults)
+        except ValueError as e:
+            raise ProviderError(f"Invalid fake provider profile for {model['id']}: {e}", 400) from e
+        digest = hashlib.blake2b(
+            f"{self.seed}\0{model['id']}\0{prompt}".encode(), digest_size=8
+        ).digest()
+        rng = random.Random(int.from_bytes(digest, "big"))
+
+        latency = _latency(profile, rng)
+        draw = rng.random()
+        if draw < profile["rate_limit_rate"]:
+            status_code = 429
+        elif draw < profile["rate_limit_rate"] + profile["error_rate"]:
+            status_code = 500
+        else:
+            status_code = 200
+
+        limit = profile["requests_per_minute"]
+        if limit:
+            now = time.monotonic()
+            recent = self._recent.setdefault(model["id"], deque())
+            while recent and recent[0] <= now - 60.0:
+                recent.popleft()
+            if len(recent) >= limit:
+                status_code = 429
+            else:
+                recent.append(now)
+
+        count = min(
+            profile["completion_tokens"],
+            parameters.get("max_tokens") or DEFAULT_MAX_TOKENS,
+        )
+        words = [rng.choice(_WORDS) for _ in range(count)]
+        tokens = [words[0]] + [f" {word}" for word in words[1:]]
+        speed = profile["tokens_per_second"]
+        return FakeCall(
+            latency,
+            status_code,
+            tokens,
+            1.0 / speed if speed else 0.0,
+            profile["chunk_tokens"],
+        )
+
+    def _fail(self, model: Dict[str, Any], call: FakeCall) -> None:
+        counter = self._counter(model)
+        if call.status_code == 429:
+            counter["rate_limited"] += 1
+            raise ProviderError(f"Fake provider rate limited {model['id']}", status_code=429)
+        counter["errors"] += 1
+        raise ProviderError(
+            f"Fake provider returned {call.status_code} for {model['id']}",
+            status_code=call.status_code,
+        )
+
+    def _completion(self, model: Dict[str, Any], prompt: str, call: FakeCall) -> Completion:
+        completion = Completion(
+            text="".join(call.tokens),
+            prompt_tokens=self.tokens.count(prompt, model),
+            completion_tokens=len(call.tokens),
+        )
+        counter = self._counter(model)
+        counter["completed"] += 1
+        counter["prompt_tokens"] += completion.prompt_tokens
+        counter["completion_tokens"] += completion.completion_tokens
+        return completion
+
+    async def complete(
+        self, model: Dict[str, Any], prompt: str, parameters: Dict[str, Any]
+    ) -> Completion:
+        """
+        Wait for the drawn latency and generation time, then return the reply.
+        """
+        call = self._plan(model, prompt, parameters)
+        self._counter(model)["calls"] += 1
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                if call.status_code == 429:
+                    # Rate limits are answered straight away, as providers do
+                    self._fail(model, call)
+                await asyncio.sleep(call.latency)
+                if call.status_code != 200:
+                    self._fail(model, call)
+                await asyncio.sleep(call.token_interval * (len(call.tokens) - 1))
+            finally:
+                self.in_flight -= 1
+        return self._completion(model, prompt, call)
+
+    async def stream(
+        self, model: Dict[str, Any], prompt: str, parameters: Dict[str, Any]
+    ) -> AsyncIterator[Union[str, Completion]]:
+        """
+        Yield the reply in chunks at the model's generation speed, then a
+        Completion with the full text and usage.
+        """
+        call = self._plan(model, prompt, parameters)
+        self._counter(model)["calls"] += 1
+        size = call.chunk_tokens
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                if call.status_code == 429:
+                    self._fail(model, call)
+                await asyncio.sleep(call.latency)
+                if call.status_code != 200:
+                    self._fail(model, call)
+                for start in range(0, len(call.tokens), size):
+                    if start:
+                        await asyncio.sleep(call.token_interval * size)
+                    yield "".join(call.tokens[start:start + size])
+            finally:
+                self.in_flight -= 1
+        yield self._completion(model, prompt, call)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "fake": True,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "seed": self.seed,
+            "models": {model_id: dict(counter) for model_id, counter in self._counters.items()},
+        }
+
+    async def aclose(self) -> None:
+        pass
+
+
+class FakeModelClient:
+    """
+    A fake provider client bound to one model record.
+
+    The HTTP clients are called with the provider's model id only, while the
+    fake provider needs the model's profile and tokenizer; this adapts its
+    calls to the same interface.
+    """
+
+    __slots__ = ("client", "model")
+
+    def __init__(self, client: FakeProviderClient, model: Dict[str, Any]):
+        self.client = client
+        self.model = model
+
+    async def complete(self, model: str, prompt: str, parameters: Dict[str, Any]) -> Completion:
+        return await self.client.complete(self.model, prompt, parameters)
+
+    def stream(
+        self, model: str, prompt: str, parameters: Dict[str, Any]
+    ) -> AsyncIterator[Union[str, Completion]]:
+        return self.client.stream(self.model, prompt, parameters)
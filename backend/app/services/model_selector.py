@@ -0,0 +1,250 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.core.store import IndexedStore
+from app.models.model import ModelCapability
+
+# Bit assigned to each capability in the capability masks
+CAPABILITY_BITS = {capability.value: 1 << bit for bit, capability in enumerate(ModelCapability)}
+
+# Token counts assumed when the caller gives no context size
+DEFAULT_PROMPT_TOKENS = 1000
+DEFAULT_COMPLETION_TOKENS = 500
+
+# Weight of observed latency and of a provider preference in the score
+LATENCY_WEIGHT = 0.1
+PREFERRED_PROVIDER_BONUS = 0.1
+
+# Smoothing factor for the observed latency moving average
+LATENCY_SMOOTHING = 0.2
+
+
+def capability_mask(capabilities: Sequence[Any]) -> int:
+    """
+    Fold a list of capabilities into a bitmask.
+
+    Raises ValueError for unknown capability names.
+    """
+    mask = 0
+    for capability in capabilities:
+        value = capability.value if isinstance(capability, ModelCapability) else capability
+        if value not in CAPABILITY_BITS:
+            raise ValueError(f"Unknown capability: {value}")
+        mask |= CAPABILITY_BITS[value]
+    return mask
+
+
+def quality_score(metadata: Optional[Dict[str, Any]]) -> Optional[float]:
+    """
+    Return the ``quality_score`` set in a model's metadata, or None if unset.
+
+    Raises ValueError unless the score is a number between 0 and 1.
+    """
+    score = (metadata or {}).get("quality_score")
+    if score is None:
+        return None
+    if isinstance(score, bool) or not isinstance(score, (int, float)):
+        raise ValueError("metadata.quality_score must be a number")
+    if not 0 <= score <= 1:
+        raise ValueError("metadata.quality_score must be between 0 and 1")
+    return float(score)
+
+
+def _quality(record: Dict[str, Any], mask: int) -> float:
+    try:
+        score = quality_score(record.get("metadata"))
+    except ValueError:
+        # Records loaded from storage may predate validation
+        score = None
+    if score is None:
+        return bin(mask).count("1") / len(CAPABILITY_BITS)
+    return score
+
+
+def _normalize(values: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    if values.size == 0:
+        return values
+    low = values.min()
+    spread = values.max() - low
+    if spread <= 0:
+        return np.zeros_like(values)
+    return (values - low) / spread
+
+
+class ModelSelector:
+    """
+    Ranks catalog models for a request with vectorized NumPy operations.
+
+    The catalog is mirrored into column arrays (capability bitmask, context
+    window, prompt and completion price, observed latency, quality) that are
+    rebuilt only when the models store's revision changes. A selection is
+    then a handful of array operations regardless of catalog size.
+
+    The score blends normalized estimated cost, weighted by
+    ``cost_sensitivity``, with the inverse of quality, where quality is the
+    model's ``metadata["quality_score"]`` (0-1) or else the share of known
+    capabilities it supports, also used when the stored score is not a valid
+    one. Observed latency and the preferred provider
+    nudge the score; lower is better.
+
+    NumPy is imported on the first selection rather than with the module,
+    since it dominates the cost of importing the API.
+    """
+
+    def __init__(self, models: IndexedStore):
+        self.models = models
+        self._revision: Optional[int] = None
+        self._latency: Dict[str, float] = {}
+        self._positions: Dict[str, int] = {}
+
+    def record_latency(self, model_id: str, seconds: float) -> None:
+        """
+        Fold an observed call latency into the model's moving average.
+        """
+        previous = self._latency.get(model_id)
+        if previous is None:
+            latency = seconds
+        else:
+            latency = previous + LATENCY_SMOOTHING * (seconds - previous)
+        self._latency[model_id] = latency
+
+        position = self._positions.get(model_id)
+        if self._revision is not None and position is not None:
+            self._latencies[position] = latency
+
+    def _build(self) -> None:
+        import numpy as np
+
+        records = list(self.models.values())
+        self._records = records
+        self._positions = {record["id"]: position for position, record in enumerate(records)}
+        self._providers = np.array(
+            [getattr(record["provider"], "value", record["provider"]) for record in records],
+            dtype=object,
+        )
+        masks = [capability_mask(record["capabilities"]) for record in records]
+        self._capabilities = np.array(masks, dtype=np.int64)
+        self._context_windows = np.array(
+            [record["context_window"] for record in records], dtype=np.int64
+        )
+        self._prompt_costs = np.array(
+            [record["cost_per_prompt_token"] for record in records], dtype=np.float64
+        )
+        self._completion_costs = np.array(
+            [record["cost_per_completion_token"] for record in records], dtype=np.float64
+        )
+        self._active = np.array([bool(record["is_active"]) for record in records], dtype=bool)
+        self._quality = np.array(
+            [_quality(record, mask) for record, mask in zip(records, masks)],
+            dtype=np.float64,
+        )
+        self._latencies = np.array(
+            [self._latency.get(record["id"], np.nan) for record in records], dtype=np.float64
+        )
+        self._revision = self.models.revision
+
+    def select(
+        self,
+        required_capabilities: Sequence[Any] = (),
+        context_size: Optional[int] = None,
+        cost_sensitivity: float = 0.5,
+        preferred_provider: Optional[str] = None,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        limit: int = 5,
+    ) -> List[Dict[str, Any]]:
+        """
+        Return up to ``limit`` eligible models, best first.
+
+        Each entry holds the model record, its score and the estimated cost
+        of the request. Raises ValueError for unknown capabilities.
+        """
+        import numpy as np
+
+        if self._revision != self.models.revision:
+            self._build()
+
+        required = capability_mask(required_capabilities)
+        prompt_tokens = prompt_tokens or context_size or DEFAULT_PROMPT_TOKENS
+        completion_tokens = completion_tokens or DEFAULT_COMPLETION_TOKENS
+
+        eligible = self._active & ((self._capabilities & required) == required)
+        if context_size:
+            eligible &= self._context_windows >= context_size
+        positions = np.flatnonzero(eligible)
+        if positions.size == 0:
+            return []
+
+        costs = (
+            self._prompt_costs[positions] * prompt_tokens
+            + self._completion_costs[positions] * completion_tokens
+        )
+        latencies = self._latencies[positions]
+        # Models without observations are treated as average
+        known = ~np.isnan(latencies)
+        fill = latencies[known].mean() if known.any() else 0.0
+        latencies = np.where(known, latencies, fill)
+
+        scores = (
+            cost_sensitivity * _normalize(costs)
+            + (1.0 - cost_sensitivity) * (1.0 - self._quality[positions])
+            + LATENCY_WEIGHT * _normalize(latencies)
+        )
+        if preferred_provider:
+            scores = scores - PREFERRED_PROVIDER_BONUS * (
+                self._providers[positions] == preferred_provider
+            )
+
+        # Partial sort: only the top entries need ordering
+        if positions.size > limit:
+            top = np.argpartition(scores, limit - 1)[:limit]
+        else:
+            top = np.arange(positions.size)
+        top = top[np.lexsort((costs[top], scores[top]))]
+
+        return [
+            {
+                "model": self._records[positions[index]],
+                "score": float(scores[index]),
+                "estimated_cost": float(costs[index]),
+                "latency": float(latencies[index]),
+                "quality": float(self._quality[positions[index]]),
+                "tokens": prompt_tokens + completion_tokens,
+            }
+            for index in top
+        ]
+
+
+def reason_not_selected(
+    candidate: Dict[str, Any],
+    selected: Dict[str, Any],
+    preferred_provider: Optional[str] = None,
+) -> str:
+    """
+    Explain why a ranked alternative lost to the selected model.
+    """
+    if preferred_provider:
+        providers = [
+            getattr(entry["model"]["provider"], "value", entry["model"]["provider"])
+            for entry in (candidate, selected)
+        ]
+        if providers[0] != preferred_provider and providers[1] == preferred_provider:
+            return "Not from the preferred provider"
+    if candidate["estimated_cost"] > selected["estimated_cost"]:
+        return "Higher cost"
+    if candidate["quality"] < selected["quality"]:
+        return "Lower quality"
+    if candidate["latency"] > selected["latency"]:
+        return "Higher observed latency"
+    return "Lower overall score"
+
+
+# Capabilities a model needs for each task type
+TASK_CAPABILITIES = {
+    "code": [ModelCapability.CODE],
+    "test": [ModelCapability.CODE],
+    "security": [ModelCapability.CODE, ModelCapability.REASONING],
+    "analysis": [ModelCapability.REASONING],
+    "design": [ModelCapability.TEXT],
+}
@@ -0,0 +1,237 @@
+"""
+CPU-bound post-processing of task results in worker processes.
+
+Processors are plain module-level functions registered per task type with
+``register_processor``, from any module. Workers are spawned, so they
+import each processor by its ``module:qualname`` reference rather than
+relying on the registry of the parent process; define processors at module
+level in an importable module.
+"""
+import asyncio
+import importlib
+import multiprocessing
+import pickle
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Processor = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+# Processors by task type value
+PROCESSORS: Dict[str, Processor] = {}
+
+# Processors resolved in this worker process, by reference
+_RESOLVED: Dict[str, Processor] = {}
+
+
+def processor_reference(function: Processor) -> str:
+    return f"{function.__module__}:{function.__qualname__}"
+
+
+def register_processor(task_type: Any) -> Callable[[Processor], Processor]:
+    """
+    Register a function as the result processor for a task type.
+
+    Raises ValueError for functions the worker processes cannot import,
+    such as nested functions and lambdas.
+    """
+    def decorator(function: Processor) -> Processor:
+        if "<" in function.__qualname__ or function.__module__ == "__main__":
+            raise ValueError(
+                f"Processor {processor_reference(function)} must be defined at "
+                "module level in an importable module"
+            )
+        PROCESSORS[getattr(task_type, "value", task_type)] = function
+        return function
+    return decorator
+
+
+def _resolve(reference: str) -> Processor:
+    function = _RESOLVED.get(reference)
+    if function is None:
+        module_name, qualname = reference.split(":")
+        function = importlib.import_module(module_name)
+        for attribute in qualname.split("."):
+            function = getattr(function, attribute)
+        _RESOLVED[reference] = function
+    return function
+
+
+def _encode(payload: Any) -> Tuple[bytes, List[pickle.PickleBuffer]]:
+    buffers: List[pickle.PickleBuffer] = []
+    data = pickle.dumps(payload, protocol=5, buffer_callback=buffers.append)
+    return data, buffers
+
+
+def _run_inline(reference: str, data: bytes) -> Dict[str, Any]:
+    return _resolve(reference)(pickle.loads(data))
+
+
+def _run_shared(reference: str, name: str, sizes: List[int]) -> Dict[str, Any]:
+    # The segment holds the pickle stream followed by its out-of-band buffers
+    segment = shared_memory.SharedMemory(name=name)
+    try:
+        view = segment.buf
+        offsets = [0]
+        for size in sizes:
+            offsets.append(offsets[-1] + size)
+        parts = [view[start:end] for start, end in zip(offsets, offsets[1:])]
+        payload = pickle.loads(parts[0], buffers=parts[1:])
+        summary = _resolve(reference)(payload)
+        del payload, parts, view
+        return summary
+    finally:
+        try:
+            segment.close()
+        except BufferError:
+            # A processor kept a zero-copy view; the mapping goes with the process
+            pass
+
+
+class ResultProcessor:
+    """
+    Runs registered result processors in a process pool.
+
+    Small payloads are pickled to the worker as usual. Payloads of at least
+    ``shared_memory_threshold`` bytes are pickled with protocol 5 into a
+    shared memory segment, out-of-band buffers included, and the worker
+    reads them from the segment without another copy through a pipe. The
+    pool is created on first use and defaults to one process per core.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, shared_memory_threshold: int = 1 << 20):
+        self.max_workers = max_workers
+        self.shared_memory_threshold = shared_memory_threshold
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned workers do not inherit the event loop or open sockets
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    def has_processor(self, task_type: Any) -> bool:
+        return getattr(task_type, "value", task_type) in PROCESSORS
+
+    async def process(self, task_type: Any, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Run the processor for a task type on a result, off the event loop.
+
+        Returns None if no processor is registered for the task type.
+        """
+        function = PROCESSORS.get(getattr(task_type, "value", task_type))
+        if function is None:
+            return None
+        reference = processor_reference(function)
+
+        loop = asyncio.get_running_loop()
+        data, buffers = _encode(result)
+        sizes = [len(data)] + [buffer.raw().nbytes for buffer in buffers]
+        if sum(sizes) < self.shared_memory_threshold and not buffers:
+            return await loop.run_in_executor(self.pool, _run_inline, reference, data)
+
+        segment = shared_memory.SharedMemory(create=True, size=max(sum(sizes), 1))
+        try:
+            position = 0
+            for part in [memoryview(data)] + [buffer.raw() for buffer in buffers]:
+                segment.buf[position:position + part.nbytes] = part.cast("B")
+                position += part.nbytes
+            return await loop.run_in_executor(
+                self.pool, _run_shared, reference, segment.name, sizes
+            )
+        finally:
+            segment.close()
+            segment.unlink()
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# Built-in processors. Agents answer in free text, so these read the common
+# formats (unified diffs, pytest summaries, severity-tagged findings) and
+# return counts the UI can show without rescanning the text.
+
+_TEST_COUNT = re.compile(r"(\d+) (passed|failed|skipped|errors?|xfailed|xpassed)\b")
+_TEST_FAILURE = re.compile(r"^(?:FAILED|ERROR) (\S+)", re.MULTILINE)
+_SEVERITY = re.compile(r"\b(critical|high|medium|low)\b", re.IGNORECASE)
+_CWE = re.compile(r"\bCWE-\d+\b")
+_SEVERITY_ORDER = ("critical", "high", "medium", "low")
+
+
+def _text(result: Dict[str, Any]) -> str:
+    text = result.get("result")
+    return text if isinstance(text, str) else ""
+
+
+@register_processor("code")
+def summarize_diff(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Count files, added and removed lines in unified diffs in a code result.
+    """
+    files: List[str] = []
+    additions = deletions = code_blocks = 0
+    for line in _text(result).splitlines():
+        if line.startswith("+++ "):
+            path = line[4:].strip()
+            files.append(path[2:] if path.startswith("b/") else path)
+        elif line.startswith("+") and not line.startswith("+++"):
+            additions += 1
+        elif line.startswith("-") and not line.startswith("---"):
+            deletions += 1
+        elif line.startswith("```"):
+            code_blocks += 1
+    return {
+        "files": files,
+        "additions": additions,
+        "deletions": deletions,
+        "code_blocks": code_blocks // 2,
+    }
+
+
+@register_processor("test")
+def aggregate_test_report(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Total the outcome counts and failed tests reported in a test result.
+    """
+    text = _text(result)
+    counts: Counter = Counter()
+    for number, outcome in _TEST_COUNT.findall(text):
+        counts["errors" if outcome.startswith("error") else outcome] += int(number)
+    failures = _TEST_FAILURE.findall(text)
+    total = sum(counts.values())
+    return {
+        "counts": dict(counts),
+        "total": total,
+        "failures": failures,
+        "pass_rate": counts["passed"] / total if total else None,
+    }
+
+
+@register_processor("security")
+def summarize_security_findings(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Count findings by severity and collect CWE ids in a security result.
+    """
+    severities: Counter = Counter()
+    cwes: Dict[str, None] = {}
+    for line in _text(result).splitlines():
+        match = _SEVERITY.search(line)
+        if match:
+            severities[match.group(1).lower()] += 1
+        for cwe in _CWE.findall(line):
+            cwes[cwe] = None
+    highest = next((level for level in _SEVERITY_ORDER if severities[level]), None)
+    return {
+        "findings": sum(severities.values()),
+        "by_severity": {level: severities[level] for level in _SEVERITY_ORDER},
+        "highest_severity": highest,
+        "cwes": list(cwes),
+    }
@@ -0,0 +1,77 @@
+import asyncio
+from typing import Any, Callable, Dict, Optional
+
+
+class ProgressCoalescer:
+    """
+    Collects high-frequency progress reports and applies them in batches.
+
+    Reports are keyed by record, so only the latest value per record within
+    a ``window`` survives. At the end of the window every pending value is
+    handed to ``apply`` in one call, which writes them back to the store, so
+    persistence and subscribers see one change per record per window no
+    matter how often it was reported.
+    """
+
+    def __init__(self, apply: Callable[[Dict[str, Any]], None], window: float = 0.25):
+        self.apply = apply
+        self.window = window
+        self._pending: Dict[str, Any] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.reported = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.applied = 0
+
+    def report(self, record_id: str, value: Any) -> None:
+        """
+        Queue the latest value for a record, applied at the end of the window.
+        """
+        self.reported += 1
+        if record_id in self._pending:
+            self.coalesced += 1
+        self._pending[record_id] = value
+        if self._timer is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # No loop to wait on; apply right away
+                self.flush()
+                return
+            self._timer = loop.call_later(self.window, self.flush)
+
+    def discard(self, record_id: str) -> None:
+        """
+        Drop a pending value, e.g. because its record was deleted or finished.
+        """
+        self._pending.pop(record_id, None)
+
+    def flush(self) -> None:
+        """
+        Apply all pending values now.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        self.flushes += 1
+        self.applied += len(pending)
+        self.apply(pending)
+
+    def close(self) -> None:
+        """
+        Apply whatever is still pending, e.g. on shutdown.
+        """
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window": self.window,
+            "pending": len(self._pending),
+            "reported": self.reported,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "applied": self.applied,
+        }
@@ -0,0 +1,154 @@
+"""
+OpenAI- and Anthropic-compatible stub server for local benchmarking.
+
+Run it next to the API and point the provider base URLs at it:
+
+    uvicorn app.services.provider_stub:app --port 9100
+    OPENAI_BASE_URL=http://localhost:9100 OPENAI_API_KEY=stub \
+    ANTHROPIC_BASE_URL=http://localhost:9100 ANTHROPIC_API_KEY=stub \
+    uvicorn app.main:app
+
+PROVIDER_STUB_LATENCY sets the simulated response time in seconds; with
+``"stream": true`` it is the time to the first token, and
+PROVIDER_STUB_TOKEN_INTERVAL spaces out the following ones.
+"""
+import asyncio
+import json
+import os
+from typing import Any, AsyncIterator, Dict, List
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+app = FastAPI(title="Provider stub")
+
+LATENCY = float(os.environ.get("PROVIDER_STUB_LATENCY", "0.05"))
+TOKEN_INTERVAL = float(os.environ.get("PROVIDER_STUB_TOKEN_INTERVAL", "0.01"))
+
+
+def _reply(prompt: str) -> Dict[str, Any]:
+    text = f"Stub completion for: {prompt[:80]}"
+    return {
+        "text": text,
+        "prompt_tokens": len(prompt.split()),
+        "completion_tokens": len(text.split()),
+    }
+
+
+def _prompt(body: Dict[str, Any]) -> str:
+    content = body["messages"][-1]["content"]
+    if isinstance(content, list):
+        return "".join(block.get("text", "") for block in content)
+    return content
+
+
+def _tokens(text: str) -> List[str]:
+    words = text.split(" ")
+    return [words[0]] + [f" {word}" for word in words[1:]]
+
+
+async def _events(events: AsyncIterator[Dict[str, Any]], done: bool) -> AsyncIterator[str]:
+    await asyncio.sleep(LATENCY)
+    async for event in events:
+        yield f"data: {json.dumps(event)}\n\n"
+    if done:
+        yield "data: [DONE]\n\n"
+
+
+async def _chat_chunks(body: Dict[str, Any], reply: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    for index, token in enumerate(_tokens(reply["text"])):
+        if index:
+            await asyncio.sleep(TOKEN_INTERVAL)
+        yield {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion.chunk",
+            "model": body.get("model"),
+            "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+        }
+    if (body.get("stream_options") or {}).get("include_usage"):
+        yield {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion.chunk",
+            "model": body.get("model"),
+            "choices": [],
+            "usage": {
+                "prompt_tokens": reply["prompt_tokens"],
+                "completion_tokens": reply["completion_tokens"],
+                "total_tokens": reply["prompt_tokens"] + reply["completion_tokens"],
+            },
+        }
+
+
+async def _message_events(body: Dict[str, Any], reply: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    yield {
+        "type": "message_start",
+        "message": {
+            "id": "msg-stub",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model"),
+            "content": [],
+            "usage": {"input_tokens": reply["prompt_tokens"], "output_tokens": 0},
+        },
+    }
+    yield {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}
+    for index, token in enumerate(_tokens(reply["text"])):
+        if index:
+            await asyncio.sleep(TOKEN_INTERVAL)
+        yield {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token}}
+    yield {"type": "content_block_stop", "index": 0}
+    yield {
+        "type": "message_delta",
+        "delta": {"stop_reason": "end_turn"},
+        "usage": {"output_tokens": reply["completion_tokens"]},
+    }
+    yield {"type": "message_stop"}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(body: Dict[str, Any]):
+    reply = _reply(_prompt(body))
+    if body.get("stream"):
+        return StreamingResponse(
+            _events(_chat_chunks(body, reply), done=True), media_type="text/event-stream"
+        )
+    await asyncio.sleep(LATENCY)
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "model": body.get("model"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": reply["text"]},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": reply["prompt_tokens"],
+            "completion_tokens": reply["completion_tokens"],
+            "total_tokens": reply["prompt_tokens"] + reply["completion_tokens"],
+        },
+    }
+
+
+@app.post("/v1/messages")
+async def messages(body: Dict[str, Any]):
+    reply = _reply(_prompt(body))
+    if body.get("stream"):
+        return StreamingResponse(
+            _events(_message_events(body, reply), done=False), media_type="text/event-stream"
+        )
+    await asyncio.sleep(LATENCY)
+    return {
+        "id": "msg-stub",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model"),
+        "content": [{"type": "text", "text": reply["text"]}],
+        "stop_reason": "end_turn",
+        "usage": {
+            "input_tokens": reply["prompt_tokens"],
+            "output_tokens": reply["completion_tokens"],
+        },
+    }
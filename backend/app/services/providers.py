@@ -0,0 +1,363 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, Optional, Union
+
+import httpx
+
+from app.core.config import settings
+
+# Request parameters forwarded to providers; anything else is agent-specific
+PROVIDER_PARAMETERS = ("temperature", "max_tokens", "top_p", "stop")
+
+DEFAULT_MAX_TOKENS = 1024
+
+# Providers served by the built-in fake provider when FAKE_PROVIDER_ENABLED is set
+FAKE_PROVIDERS = ("local", "custom")
+
+
+class ProviderError(Exception):
+    """
+    Raised when a provider call fails.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Completion:
+    """
+    Text and token usage returned by a provider.
+    """
+
+    __slots__ = ("text", "prompt_tokens", "completion_tokens")
+
+    def __init__(self, text: str, prompt_tokens: int, completion_tokens: int):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ProviderClient:
+    """
+    Base class for provider API clients.
+
+    Each client owns one ``httpx.AsyncClient`` whose connection pool is kept
+    alive for the life of the process, negotiating HTTP/2 when the ``h2``
+    package is installed, so agent calls reuse warm TLS connections. A
+    semaphore caps the number of requests in flight to the provider.
+    """
+
+    path = ""
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        max_in_flight: int,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+        timeout: float,
+    ):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_in_flight = max_in_flight
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._timeout = httpx.Timeout(timeout)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use so the pool binds to the running event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers(),
+                http2=_http2_available(),
+                limits=self._limits,
+                timeout=self._timeout,
+            )
+        return self._client
+
+    def headers(self) -> Dict[str, str]:
+        raise NotImplementedError
+
+    def payload(self, model: str, prompt: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def parse(self, data: Dict[str, Any]) -> Completion:
+        raise NotImplementedError
+
+    def parse_event(self, data: Dict[str, Any], usage: Dict[str, int]) -> str:
+        """
+        Extract the text delta from one streamed event, recording any usage.
+        """
+        raise NotImplementedError
+
+    async def complete(self, model: str, prompt: str, parameters: Dict[str, Any]) -> Completion:
+        """
+        Send a prompt to the provider and return the completion.
+        """
+        options = {key: parameters[key] for key in PROVIDER_PARAMETERS if key in parameters}
+        payload = self.payload(model, prompt, options)
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                response = await self.client.post(self.path, json=payload)
+            except httpx.HTTPError as e:
+                raise ProviderError(f"{type(self).__name__} request failed: {e}") from e
+            finally:
+                self.in_flight -= 1
+
+        if response.status_code >= 400:
+            raise ProviderError(
+                f"{type(self).__name__} returned {response.status_code}: {response.text[:200]}",
+                status_code=response.status_code,
+            )
+        try:
+            return self.parse(response.json())
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise ProviderError(
+                f"{type(self).__name__} returned a malformed response: {e!r}"
+            ) from e
+
+    async def stream(
+        self,
+        model: str,
+        prompt: str,
+        parameters: Dict[str, Any],
+    ) -> AsyncIterator[Union[str, Completion]]:
+        """
+        Stream a completion, yielding text deltas as the provider emits them.
+
+        The last item yielded is a Completion with the full text and usage.
+        """
+        options = {key: parameters[key] for key in PROVIDER_PARAMETERS if key in parameters}
+        payload = {**self.payload(model, prompt, options), **self.stream_options()}
+        usage = {"prompt_tokens": 0, "completion_tokens": 0}
+        parts = []
+
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                async with self.client.stream("POST", self.path, json=payload) as response:
+                    if response.status_code >= 400:
+                        body = (await response.aread()).decode(errors="replace")[:200]
+                        raise ProviderError(
+                            f"{type(self).__name__} returned {response.status_code}: {body}",
+                            status_code=response.status_code,
+                        )
+                    async for line in response.aiter_lines():
+                        # Server-sent events: only data lines carry payloads
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if not data or data == "[DONE]":
+                            continue
+                        try:
+                            delta = self.parse_event(json.loads(data), usage)
+                        except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+                            raise ProviderError(
+                                f"{type(self).__name__} sent a malformed event: {e!r}"
+                            ) from e
+                        if delta:
+                            parts.append(delta)
+                            yield delta
+            except httpx.HTTPError as e:
+                raise ProviderError(f"{type(self).__name__} request failed: {e}") from e
+            finally:
+                self.in_flight -= 1
+
+        yield Completion(
+            text="".join(parts),
+            prompt_tokens=usage["prompt_tokens"],
+            completion_tokens=usage["completion_tokens"],
+        )
+
+    def stream_options(self) -> Dict[str, Any]:
+        return {"stream": True}
+
+    def bind(self, model: Dict[str, Any]) -> "ProviderClient":
+        """
+        Return the client to call a model record with.
+
+        Requests name the model themselves, so this is the client itself.
+        """
+        return self
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": self.in_flight, "max_in_flight": self.max_in_flight}
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class OpenAIClient(ProviderClient):
+    path = "/v1/chat/completions"
+
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    def payload(self, model: str, prompt: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            **parameters,
+        }
+
+    def parse(self, data: Dict[str, Any]) -> Completion:
+        usage = data.get("usage") or {}
+        return Completion(
+            text=data["choices"][0]["message"]["content"] or "",
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+        )
+
+    def stream_options(self) -> Dict[str, Any]:
+        # Ask for a final chunk carrying token usage
+        return {"stream": True, "stream_options": {"include_usage": True}}
+
+    def parse_event(self, data: Dict[str, Any], usage: Dict[str, int]) -> str:
+        if data.get("usage"):
+            usage["prompt_tokens"] = data["usage"].get("prompt_tokens", 0)
+            usage["completion_tokens"] = data["usage"].get("completion_tokens", 0)
+        choices = data.get("choices") or []
+        if not choices:
+            return ""
+        return (choices[0].get("delta") or {}).get("content") or ""
+
+
+class AnthropicClient(ProviderClient):
+    path = "/v1/messages"
+
+    def headers(self) -> Dict[str, str]:
+        return {"x-api-key": self.api_key, "anthropic-version": "2023-06-01"}
+
+    def payload(self, model: str, prompt: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        options = dict(parameters)
+        if "stop" in options:
+            options["stop_sequences"] = options.pop("stop")
+        options.setdefault("max_tokens", DEFAULT_MAX_TOKENS)
+        return {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            **options,
+        }
+
+    def parse(self, data: Dict[str, Any]) -> Completion:
+        usage = data.get("usage") or {}
+        return Completion(
+            text="".join(block.get("text", "") for block in data.get("content", [])),
+            prompt_tokens=usage.get("input_tokens", 0),
+            completion_tokens=usage.get("output_tokens", 0),
+        )
+
+    def parse_event(self, data: Dict[str, Any], usage: Dict[str, int]) -> str:
+        event = data.get("type")
+        if event == "message_start":
+            message_usage = data["message"].get("usage") or {}
+            usage["prompt_tokens"] = message_usage.get("input_tokens", 0)
+            usage["completion_tokens"] = message_usage.get("output_tokens", 0)
+        elif event == "message_delta":
+            usage["completion_tokens"] = (data.get("usage") or {}).get(
+                "output_tokens", usage["completion_tokens"]
+            )
+        elif event == "content_block_delta":
+            return (data.get("delta") or {}).get("text", "")
+        elif event == "error":
+            raise ProviderError(f"AnthropicClient stream error: {data.get('error')}")
+        return ""
+
+
+class ProviderRegistry:
+    """
+    Lazily created, long-lived clients for each configured provider.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, Any] = {}
+
+    def _create(self, provider: str) -> Optional[Any]:
+        pool = {
+            "max_connections": settings.PROVIDER_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.PROVIDER_MAX_KEEPALIVE_CONNECTIONS,
+            "keepalive_expiry": settings.PROVIDER_KEEPALIVE_EXPIRY,
+            "timeout": settings.PROVIDER_TIMEOUT,
+        }
+        if provider == "openai" and settings.OPENAI_API_KEY:
+            return OpenAIClient(
+                base_url=settings.OPENAI_BASE_URL,
+                api_key=settings.OPENAI_API_KEY,
+                max_in_flight=settings.OPENAI_MAX_IN_FLIGHT,
+                **pool,
+            )
+        if provider == "anthropic" and settings.ANTHROPIC_API_KEY:
+            return AnthropicClient(
+                base_url=settings.ANTHROPIC_BASE_URL,
+                api_key=settings.ANTHROPIC_API_KEY,
+                max_in_flight=settings.ANTHROPIC_MAX_IN_FLIGHT,
+                **pool,
+            )
+        if provider in FAKE_PROVIDERS and settings.FAKE_PROVIDER_ENABLED:
+            from app.services.fake_provider import FakeProviderClient
+            return FakeProviderClient(
+                provider,
+                max_in_flight=settings.FAKE_PROVIDER_MAX_IN_FLIGHT,
+                seed=settings.FAKE_PROVIDER_SEED,
+                defaults=settings.FAKE_PROVIDER_PROFILE,
+            )
+        return None
+
+    def get(self, provider: Any) -> Optional[Any]:
+        """
+        Return the client for a provider, or None if it is not configured.
+        """
+        name = getattr(provider, "value", provider)
+        if name not in self._clients:
+            client = self._create(name)
+            if client is None:
+                return None
+            self._clients[name] = client
+        return self._clients[name]
+
+    def for_model(self, model: Dict[str, Any]) -> Optional[Any]:
+        """
+        Return the client to call a model record with, or None if its
+        provider is not configured.
+        """
+        client = self.get(model["provider"])
+        return None if client is None else client.bind(model)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the load on each provider client created so far.
+        """
+        return {name: client.stats() for name, client in self._clients.items()}
+
+    async def aclose(self) -> None:
+        """
+        Close every connection pool.
+        """
+        clients = list(self._clients.values())
+        self._clients.clear()
+        await asyncio.gather(*(client.aclose() for client in clients))
+
+
+providers = ProviderRegistry()
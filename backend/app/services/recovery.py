@@ -0,0 +1,66 @@
+import asyncio
+import logging
+from typing import Callable, List, Optional, Set
+
+from app.services.event_bus import EventBus
+
+logger = logging.getLogger(__name__)
+
+# Resumes the unfinished records not owned by any of the given live workers,
+# claiming them for this worker; returns how many it resumed
+Recoverer = Callable[[Set[str]], int]
+
+
+class WorkRecovery:
+    """
+    Resumes tasks and workflow executions left unfinished by workers that are gone.
+
+    Workers stamp the tasks and executions they run with their id in an
+    ``owner`` field. Recovery skips records whose owner is still alive on
+    the event bus and claims the rest in the same write that resumes them,
+    so work is never resumed next to a worker still running it. Only the
+    worker holding the bus's ``recovery`` lock recovers, so two workers
+    starting together do not both claim the same records before either
+    claim has reached the other.
+
+    Recovery runs at startup. On a distributed bus it runs again every
+    ``interval`` seconds, which picks up the work of a worker that stopped
+    while the others kept running, and of a restarted one whose previous
+    id was still alive at startup.
+    """
+
+    def __init__(self, bus: EventBus, recoverers: List[Recoverer], interval: float = 30.0):
+        self.bus = bus
+        self.recoverers = recoverers
+        self.interval = interval
+        self.recovered = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self) -> int:
+        """
+        Resume the work of departed workers, if no other worker is doing so.
+        """
+        if not await self.bus.acquire("recovery", self.interval):
+            return 0
+        live = await self.bus.live_workers()
+        recovered = sum(recover(live) for recover in self.recoverers)
+        self.recovered += recovered
+        return recovered
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run()
+            except Exception:
+                logger.warning("Recovering unfinished work failed", exc_info=True)
+
+    def start(self) -> None:
+        if self.bus.distributed and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
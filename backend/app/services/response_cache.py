@@ -0,0 +1,317 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Parameter that lets a caller opt in to (or out of) caching explicitly
+CACHE_PARAMETER = "cache"
+
+# Parameter that lets a caller opt out of sharing concurrent identical calls
+COALESCE_PARAMETER = "coalesce"
+
+# Parameters that steer execution rather than the completion, left out of keys
+CONTROL_PARAMETERS = (CACHE_PARAMETER, COALESCE_PARAMETER)
+
+
+def cache_key(
+    agent_id: str,
+    task: str,
+    prompt: str,
+    model_id: str,
+    parameters: Dict[str, Any],
+) -> str:
+    """
+    Hash an execution's inputs into a content address.
+
+    Parameters are serialized with sorted keys so equal dicts hash equally
+    regardless of insertion order.
+    """
+    canonical = json.dumps(
+        {
+            "agent_id": agent_id,
+            "task": task,
+            "prompt": prompt,
+            "model_id": model_id,
+            "parameters": {
+                key: value
+                for key, value in parameters.items()
+                if key not in CONTROL_PARAMETERS
+            },
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def is_cacheable(parameters: Dict[str, Any]) -> bool:
+    """
+    Decide whether an execution may be served from or stored in the cache.
+
+    Sampled completions (temperature above zero, or unset, which providers
+    treat as sampling) differ between calls, so they bypass the cache unless
+    the caller passes ``"cache": true``. ``"cache": false`` always bypasses.
+    """
+    opt_in = parameters.get(CACHE_PARAMETER)
+    if opt_in is not None:
+        return bool(opt_in)
+    temperature = parameters.get("temperature")
+    if temperature is None or isinstance(temperature, bool):
+        return False
+    try:
+        return float(temperature) <= 0
+    except (TypeError, ValueError):
+        # Not a number; left for the provider to reject, never cached
+        return False
+
+
+class ResponseCache:
+    """
+    Exact-match cache of agent execution results.
+
+    Entries are kept as encoded JSON in an LRU ordered dict bounded by both
+    entry count and total bytes, and expire ``ttl`` seconds after they were
+    stored. With a ``directory`` the cache also writes each entry to disk,
+    so results survive restarts and entries evicted from memory can be
+    promoted back on the next hit. Disk reads and writes run in a thread.
+
+    The disk tier has its own LRU budget of ``disk_max_entries`` and
+    ``disk_max_bytes``, tracked in an index of the files on disk. The index
+    is built by a sweep of the directory on first use, which also removes
+    expired entries and abandoned partial writes, and the sweep runs again
+    in the background every ``sweep_interval`` seconds. Files written by
+    other processes sharing the directory are counted at the next sweep.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        ttl: float,
+        directory: Optional[str] = None,
+        disk_max_entries: int = 65536,
+        disk_max_bytes: int = 512 * 1024 * 1024,
+        sweep_interval: float = 600.0,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.directory = directory
+        self.disk_max_entries = disk_max_entries
+        self.disk_max_bytes = disk_max_bytes
+        self.sweep_interval = sweep_interval
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        # key -> (expires_at, file size) of the entries on disk, oldest use first
+        self._disk: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        self._disk_bytes = 0
+        # Disk work runs in worker threads, which share the index
+        self._disk_lock = threading.Lock()
+        self._next_sweep = 0.0
+        self._sweep_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.expired_files = 0
+        self.saved_cost = 0.0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _store(self, key: str, expires_at: float, data: bytes) -> None:
+        if key in self._entries:
+            self._bytes -= len(self._entries.pop(key)[1])
+        if len(data) > self.max_bytes:
+            return
+        self._entries[key] = (expires_at, data)
+        self._bytes += len(data)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _forget(self, key: str) -> None:
+        # Caller holds _disk_lock
+        entry = self._disk.pop(key, None)
+        if entry is not None:
+            self._disk_bytes -= entry[1]
+
+    def _trim_disk(self) -> None:
+        # Caller holds _disk_lock
+        while self._disk and (
+            len(self._disk) > self.disk_max_entries or self._disk_bytes > self.disk_max_bytes
+        ):
+            key, (_, size) = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self._remove(self._path(key))
+            self.disk_evictions += 1
+
+    def _read_disk(self, key: str) -> Optional[Tuple[float, bytes]]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                expires_at = float(f.readline())
+                data = f.read()
+        except (OSError, ValueError):
+            return None
+        with self._disk_lock:
+            if expires_at <= time.time():
+                self._forget(key)
+                self._remove(path)
+                self.expired_files += 1
+                return None
+            if key in self._disk:
+                self._disk.move_to_end(key)
+        return expires_at, data
+
+    def _write_disk(self, key: str, expires_at: float, data: bytes) -> None:
+        path = self._path(key)
+        header = f"{expires_at}\n".encode()
+        size = len(header) + len(data)
+        if size > self.disk_max_bytes:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial entry
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(partial, "wb") as f:
+            f.write(header)
+            f.write(data)
+        with self._disk_lock:
+            os.replace(partial, path)
+            self._forget(key)
+            self._disk[key] = (expires_at, size)
+            self._disk_bytes += size
+            self._trim_disk()
+
+    def _sweep_disk(self) -> None:
+        """
+        Rebuild the disk index from the directory, removing expired entries
+        and partial writes left by a crash, then apply the disk budget.
+        """
+        now = time.time()
+        with self._disk_lock:
+            found = []
+            for root, _, names in os.walk(self.directory):
+                for name in names:
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                        if name.endswith(".tmp"):
+                            # Give writes still in progress a minute to finish
+                            if stat.st_mtime < now - 60:
+                                self._remove(path)
+                            continue
+                        if not name.endswith(".json"):
+                            continue
+                        with open(path, "rb") as f:
+                            expires_at = float(f.readline())
+                    except (OSError, ValueError):
+                        self._remove(path)
+                        continue
+                    if expires_at <= now:
+                        self._remove(path)
+                        self.expired_files += 1
+                        continue
+                    found.append((stat.st_mtime, name[:-len(".json")], expires_at, stat.st_size))
+            found.sort()
+            self._disk = OrderedDict(
+                (key, (expires_at, size)) for _, key, expires_at, size in found
+            )
+            self._disk_bytes = sum(size for _, _, _, size in found)
+            self._trim_disk()
+
+    def _maybe_sweep(self) -> None:
+        if self.directory is None or time.monotonic() < self._next_sweep:
+            return
+        if self._sweep_task is not None and not self._sweep_task.done():
+            return
+        self._next_sweep = time.monotonic() + self.sweep_interval
+        self._sweep_task = asyncio.create_task(self._sweep())
+
+    async def _sweep(self) -> None:
+        try:
+            await asyncio.to_thread(self._sweep_disk)
+        except OSError:
+            # Best effort, like the rest of the disk tier; retried next interval
+            pass
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a copy of the cached result for a key, or None on a miss.
+        """
+        self._maybe_sweep()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.time():
+            self._discard(key)
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(key)
+        elif self.directory is not None:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                self.disk_hits += 1
+                self._store(key, *entry)
+
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        result = json.loads(entry[1])
+        self.saved_cost += result.get("cost", {}).get("total_cost", 0.0)
+        return result
+
+    async def put(self, key: str, result: Dict[str, Any]) -> None:
+        """
+        Store an execution result.
+        """
+        self._maybe_sweep()
+        data = json.dumps(result, default=str).encode()
+        expires_at = time.time() + self.ttl
+        self._store(key, expires_at, data)
+        if self.directory is not None:
+            try:
+                await asyncio.to_thread(self._write_disk, key, expires_at, data)
+            except OSError:
+                # The disk tier is best effort; the memory tier still has the entry
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "disk_enabled": self.directory is not None,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_bytes,
+            "disk_max_entries": self.disk_max_entries,
+            "disk_max_bytes": self.disk_max_bytes,
+            "disk_evictions": self.disk_evictions,
+            "expired_files": self.expired_files,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "saved_cost": self.saved_cost,
+        }
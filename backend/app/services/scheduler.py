@@ -0,0 +1,160 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+# Queues from most to least urgent; a task's rank is its queue's position
+PRIORITIES = ("high", "medium", "low")
+
+
+def _priority(value: Any) -> str:
+    return getattr(value, "value", value)
+
+
+class TaskScheduler:
+    """
+    Runs queued tasks on a bounded pool of asyncio workers, by priority.
+
+    Each priority has a FIFO queue. A free worker takes the head of the most
+    urgent queue, except that a task gains one priority level for every
+    ``aging_interval`` seconds it has waited, so a steady stream of high
+    priority work cannot starve low priority tasks forever. Only queue heads
+    are compared, which keeps picking the next task O(number of priorities).
+
+    Workers are started on the first submit, so the scheduler can be created
+    at import time outside a running event loop.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[str], Awaitable[None]],
+        workers: int = 4,
+        aging_interval: float = 30.0,
+    ):
+        self.process = process
+        self.workers = workers
+        self.aging_interval = aging_interval
+        self._queues: Dict[str, Deque[Tuple[str, float]]] = {
+            priority: deque() for priority in PRIORITIES
+        }
+        self._available: Optional[asyncio.Semaphore] = None
+        self._workers: List[asyncio.Task] = []
+        self.running = 0
+        self.processed = 0
+        self.failed = 0
+        self._started = 0
+        self._waited = 0.0
+        self._max_wait = 0.0
+
+    def _ensure_workers(self) -> None:
+        if self._workers:
+            return
+        # Count tasks left queued by an earlier shutdown
+        self._available = asyncio.Semaphore(sum(len(queue) for queue in self._queues.values()))
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    def submit(self, task_id: str, priority: Any) -> None:
+        """
+        Queue a task for processing.
+        """
+        self._ensure_workers()
+        self._queues[_priority(priority)].append((task_id, time.monotonic()))
+        self._available.release()
+
+    def _remove(self, task_id: str) -> Optional[Tuple[str, Tuple[str, float]]]:
+        for priority, queue in self._queues.items():
+            for entry in queue:
+                if entry[0] == task_id:
+                    queue.remove(entry)
+                    return priority, entry
+        return None
+
+    def reprioritize(self, task_id: str, priority: Any) -> bool:
+        """
+        Move a queued task to another priority, keeping its original wait.
+
+        Returns False if the task is not queued.
+        """
+        found = self._remove(task_id)
+        if found is None:
+            return False
+        queue = self._queues[_priority(priority)]
+        entry = found[1]
+        # Keep the queue ordered by enqueue time so its head is the oldest
+        position = len(queue)
+        while position > 0 and queue[position - 1][1] > entry[1]:
+            position -= 1
+        queue.insert(position, entry)
+        return True
+
+    def discard(self, task_id: str) -> bool:
+        """
+        Drop a queued task. Returns False if the task is not queued.
+        """
+        return self._remove(task_id) is not None
+
+    def _next(self) -> Optional[Tuple[str, float]]:
+        now = time.monotonic()
+        best: Optional[Tuple[float, int, str]] = None
+        for rank, priority in enumerate(PRIORITIES):
+            queue = self._queues[priority]
+            if not queue:
+                continue
+            waited = now - queue[0][1]
+            effective = rank - waited / self.aging_interval
+            if best is None or (effective, rank) < best[:2]:
+                best = (effective, rank, priority)
+        if best is None:
+            return None
+        return self._queues[best[2]].popleft()
+
+    async def _work(self) -> None:
+        while True:
+            await self._available.acquire()
+            entry = self._next()
+            if entry is None:
+                # The task was discarded after it was queued
+                continue
+            task_id, enqueued_at = entry
+            waited = time.monotonic() - enqueued_at
+            self._started += 1
+            self._waited += waited
+            self._max_wait = max(self._max_wait, waited)
+            self.running += 1
+            try:
+                await self.process(task_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failed += 1
+            finally:
+                self.running -= 1
+                self.processed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "processed": self.processed,
+            "failed": self.failed,
+            "queues": {
+                priority: {
+                    "depth": len(queue),
+                    "oldest_wait": now - queue[0][1] if queue else 0.0,
+                }
+                for priority, queue in self._queues.items()
+            },
+            "average_wait": self._waited / self._started if self._started else 0.0,
+            "max_wait": self._max_wait,
+        }
+
+    async def shutdown(self) -> None:
+        """
+        Stop the workers, cancelling tasks being processed.
+        """
+        workers = self._workers
+        self._workers = []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls that share a key.
+
+    The first caller for a key starts the call as a task; callers arriving
+    while it is in flight await the same task instead of starting their own.
+    The task is shielded, so a caller being cancelled does not cancel the
+    call for the others; it is cancelled only once every caller waiting on
+    it has been. Errors propagate to every waiting caller.
+    """
+
+    def __init__(self):
+        # key -> [task, number of callers waiting on it]
+        self._calls: Dict[str, List[Any]] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def _finished(self, key: str, task: "asyncio.Task[Any]") -> None:
+        if self._calls.get(key, [None])[0] is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the error as retrieved; the callers have re-raised it already
+            task.exception()
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run ``call`` unless a call for ``key`` is already in flight.
+
+        Returns the result and whether it was shared from another caller's
+        call.
+        """
+        flight = self._calls.get(key)
+        shared = flight is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(call())
+            flight = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda done: self._finished(key, done))
+
+        task = flight[0]
+        flight[1] += 1
+        try:
+            return await asyncio.shield(task), shared
+        except asyncio.CancelledError:
+            if flight[1] == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            flight[1] -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,197 @@
+import hashlib
+import logging
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Encoding used for each provider when the model has no tokenizer of its own.
+# Anthropic, local and custom models have no public local tokenizer, so they
+# are approximated with a GPT encoding, which counts English text similarly.
+PROVIDER_ENCODINGS = {
+    "openai": "o200k_base",
+    "anthropic": "cl100k_base",
+    "local": "cl100k_base",
+    "custom": "cl100k_base",
+}
+DEFAULT_ENCODING = "cl100k_base"
+
+# Words, runs of digits and single symbols; roughly what BPE vocabularies split on
+_PIECES = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+# Letters per token for long words in the heuristic count
+HEURISTIC_CHARS_PER_TOKEN = 4
+
+
+class HeuristicEncoder:
+    """
+    Approximate token counts for when tiktoken or its encodings are unavailable.
+
+    Words count one token per four letters, digit runs one per three digits
+    and every other symbol one token, close to what the GPT encodings give
+    for English prose and code.
+    """
+
+    name = "heuristic"
+
+    def count(self, text: str) -> int:
+        tokens = 0
+        for piece in _PIECES.findall(text):
+            if piece[0].isalpha():
+                tokens += -(-len(piece) // HEURISTIC_CHARS_PER_TOKEN)
+            elif piece[0].isdigit():
+                tokens += -(-len(piece) // 3)
+            else:
+                tokens += 1
+        return tokens
+
+    def count_batch(self, texts: Sequence[str]) -> List[int]:
+        return [self.count(text) for text in texts]
+
+
+class TiktokenEncoder:
+    """
+    Exact counts from a tiktoken encoding.
+    """
+
+    def __init__(self, encoding: Any):
+        self.name = encoding.name
+        self._encoding = encoding
+
+    def count(self, text: str) -> int:
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def count_batch(self, texts: Sequence[str]) -> List[int]:
+        # Encodes on tiktoken's thread pool, outside the GIL
+        return [
+            len(tokens)
+            for tokens in self._encoding.encode_batch(list(texts), disallowed_special=())
+        ]
+
+
+def _load_encoding(model_id: Optional[str], encoding_name: str) -> Optional[Any]:
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        if model_id:
+            try:
+                return tiktoken.encoding_for_model(model_id)
+            except KeyError:
+                pass
+        return tiktoken.get_encoding(encoding_name)
+    except Exception:
+        # Encodings are downloaded on first use; fall back when offline
+        logger.warning("Loading tiktoken encoding %s failed", encoding_name, exc_info=True)
+        return None
+
+
+class TokenCounter:
+    """
+    Counts prompt tokens per model and estimates the cost of a call.
+
+    Encoders are loaded once per provider and model and reused, since
+    building a BPE encoder takes far longer than counting a prompt. Counts
+    are cached by a hash of the encoder and the text in an LRU of
+    ``max_entries``, so the same rendered prompt is encoded only once.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._encoders: Dict[Tuple[str, str], Any] = {}
+        self._counts: "OrderedDict[Tuple[str, bytes], int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def encoder(self, model: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Return the cached encoder for a model record, loading it on first use.
+        """
+        if model is None:
+            provider, model_id = "", ""
+        else:
+            provider = getattr(model["provider"], "value", model["provider"])
+            model_id = model["model_id"] if provider == "openai" else ""
+        key = (provider, model_id)
+        encoder = self._encoders.get(key)
+        if encoder is None:
+            encoding = _load_encoding(
+                model_id, PROVIDER_ENCODINGS.get(provider, DEFAULT_ENCODING)
+            )
+            encoder = HeuristicEncoder() if encoding is None else TiktokenEncoder(encoding)
+            self._encoders[key] = encoder
+        return encoder
+
+    def count(self, text: str, model: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Return the number of tokens in ``text`` for ``model``.
+        """
+        return self.count_batch([text], model)[0]
+
+    def count_batch(
+        self, texts: Sequence[str], model: Optional[Dict[str, Any]] = None
+    ) -> List[int]:
+        """
+        Return the token count of each text; uncached texts are encoded in one batch.
+        """
+        encoder = self.encoder(model)
+        counts: List[Optional[int]] = []
+        missing: Dict[Tuple[str, bytes], List[int]] = {}
+        for position, text in enumerate(texts):
+            key = (encoder.name, hashlib.blake2b(text.encode(), digest_size=16).digest())
+            count = self._counts.get(key)
+            if count is None:
+                missing.setdefault(key, []).append(position)
+            else:
+                self._counts.move_to_end(key)
+                self.hits += 1
+            counts.append(count)
+
+        if missing:
+            self.misses += len(missing)
+            keys = list(missing)
+            encoded = encoder.count_batch([texts[missing[key][0]] for key in keys])
+            for key, count in zip(keys, encoded):
+                for position in missing[key]:
+                    counts[position] = count
+                self._counts[key] = count
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return counts
+
+    def estimate(
+        self,
+        model: Dict[str, Any],
+        prompt_tokens: int,
+        completion_tokens: int,
+    ) -> Dict[str, Any]:
+        """
+        Price a call from the model's per-token costs.
+        """
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_cost": (
+                prompt_tokens * model["cost_per_prompt_token"]
+                + completion_tokens * model["cost_per_completion_token"]
+            ),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "encoders": {
+                f"{provider}:{model_id}" if model_id else provider or "default": encoder.name
+                for (provider, model_id), encoder in self._encoders.items()
+            },
+            "entries": len(self._counts),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+token_counter = TokenCounter(max_entries=settings.TOKEN_COUNT_CACHE_SIZE)
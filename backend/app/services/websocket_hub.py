@@ -0,0 +1,289 @@
+import asyncio
+import json
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+# A subscription: channel name and record id, or None for a whole channel
+Key = Tuple[str, Optional[str]]
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_message(message_type: str, data: Dict[str, Any]) -> str:
+    """
+    Serialize a message in the ``{"type", "data"}`` envelope clients expect.
+    """
+    return json.dumps({"type": message_type, "data": data}, default=_default, separators=(",", ":"))
+
+
+class Connection:
+    """
+    One client socket and its bounded queue of outgoing messages.
+
+    Messages for the same record are coalesced: a newer state replaces the
+    one still waiting in the queue instead of queueing behind it. When the
+    queue is full the oldest message is dropped, so a slow client misses
+    intermediate states but never holds more than ``max_queue`` messages.
+    A single writer task drains the queue, so publishers never wait on a
+    client's socket.
+    """
+
+    def __init__(self, websocket: WebSocket, max_queue: int):
+        self.websocket = websocket
+        self.client_id = f"client-{uuid.uuid4()}"
+        self.max_queue = max_queue
+        self.subscriptions: Set[Key] = set()
+        self._queue: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self._closing = False
+        self._writer: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def start(self) -> None:
+        self._writer = asyncio.create_task(self._write())
+
+    def send(self, payload: str, key: Optional[Hashable] = None) -> None:
+        """
+        Queue a serialized message; messages sharing ``key`` replace each other.
+        """
+        if self._closing:
+            return
+        if key is None:
+            key = object()
+        if key in self._queue:
+            self.coalesced += 1
+        elif len(self._queue) >= self.max_queue:
+            self._queue.popitem(last=False)
+            self.dropped += 1
+        self._queue[key] = payload
+        self._ready.set()
+
+    async def _write(self) -> None:
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                while self._queue:
+                    _, payload = self._queue.popitem(last=False)
+                    await self.websocket.send_text(payload)
+                    self.sent += 1
+                if self._closing:
+                    await self.websocket.close(code=1001)
+                    return
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # The client went away; the receive loop sees it and disconnects
+            self._closing = True
+            self._queue.clear()
+
+    def close(self, payload: Optional[str] = None) -> None:
+        """
+        Send ``payload`` after what is queued, then close the socket.
+        """
+        if payload is not None:
+            self.send(payload)
+        self._closing = True
+        self._ready.set()
+
+    async def wait_closed(self) -> None:
+        if self._writer is not None:
+            await asyncio.gather(self._writer, return_exceptions=True)
+
+    def stop(self) -> None:
+        self._closing = True
+        self._queue.clear()
+        if self._writer is not None:
+            self._writer.cancel()
+
+
+class WebSocketHub:
+    """
+    Fans events out to WebSocket clients subscribed by channel and record id.
+
+    Subscribers are indexed by ``(channel, id)`` and ``(channel, None)``, so
+    publishing touches only the clients that asked for the record. An event
+    is serialized once and the same string is queued on every subscriber;
+    nothing is serialized when nobody is listening. Each client has a
+    bounded queue drained by its own writer (see ``Connection``), so one
+    slow client cannot hold up the others or grow without limit.
+
+    ``start`` runs a ticker that publishes the system status to its channel
+    and pings every client on a fixed interval.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 10000,
+        max_queue: int = 256,
+        max_subscriptions: int = 50,
+    ):
+        self.max_connections = max_connections
+        self.max_queue = max_queue
+        self.max_subscriptions = max_subscriptions
+        self.connections: Dict[str, Connection] = {}
+        self._subscribers: Dict[Key, Set[Connection]] = {}
+        self._ticker: Optional[asyncio.Task] = None
+        self.published = 0
+        self.deliveries = 0
+
+    @property
+    def full(self) -> bool:
+        return len(self.connections) >= self.max_connections
+
+    def connect(self, websocket: WebSocket) -> Connection:
+        connection = Connection(websocket, self.max_queue)
+        self.connections[connection.client_id] = connection
+        connection.start()
+        return connection
+
+    def disconnect(self, connection: Connection) -> None:
+        for key in connection.subscriptions:
+            subscribers = self._subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del self._subscribers[key]
+        connection.subscriptions.clear()
+        self.connections.pop(connection.client_id, None)
+        connection.stop()
+
+    def subscribe(self, connection: Connection, channel: str, record_id: Optional[str] = None) -> bool:
+        """
+        Subscribe a client to a channel or one record in it.
+
+        Returns False if the client is at its subscription limit.
+        """
+        key = (channel, record_id)
+        if key in connection.subscriptions:
+            return True
+        if len(connection.subscriptions) >= self.max_subscriptions:
+            return False
+        connection.subscriptions.add(key)
+        self._subscribers.setdefault(key, set()).add(connection)
+        return True
+
+    def unsubscribe(self, connection: Connection, channel: str, record_id: Optional[str] = None) -> None:
+        key = (channel, record_id)
+        connection.subscriptions.discard(key)
+        subscribers = self._subscribers.get(key)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del self._subscribers[key]
+
+    def has_subscribers(self, keys: Iterable[Key]) -> bool:
+        return any(key in self._subscribers for key in keys)
+
+    def publish(
+        self,
+        keys: Iterable[Key],
+        message_type: str,
+        data: Callable[[], Dict[str, Any]],
+        coalesce_key: Optional[Hashable] = None,
+    ) -> int:
+        """
+        Send an event to every client subscribed to any of ``keys``.
+
+        ``data`` is only called when someone is subscribed. Clients
+        subscribed through several keys get the event once. Events with the
+        same ``coalesce_key`` replace each other in a client's queue.
+        Returns the number of clients the event was queued for.
+        """
+        groups = [self._subscribers[key] for key in keys if key in self._subscribers]
+        if not groups:
+            return 0
+        targets = groups[0] if len(groups) == 1 else set().union(*groups)
+        payload = encode_message(message_type, data())
+        for connection in targets:
+            connection.send(payload, coalesce_key)
+        self.published += 1
+        self.deliveries += len(targets)
+        return len(targets)
+
+    def broadcast(self, message_type: str, data: Dict[str, Any]) -> None:
+        """
+        Send an event to every connected client.
+        """
+        payload = encode_message(message_type, data)
+        for connection in self.connections.values():
+            connection.send(payload, message_type)
+
+    def start(
+        self,
+        status: Callable[[], Dict[str, Any]],
+        status_interval: float = 5.0,
+        ping_interval: float = 30.0,
+    ) -> None:
+        """
+        Start publishing ``status()`` to the ``system_status`` channel and pinging clients.
+        """
+        if self._ticker is None:
+            self._ticker = asyncio.create_task(self._tick(status, status_interval, ping_interval))
+
+    async def _tick(
+        self,
+        status: Callable[[], Dict[str, Any]],
+        status_interval: float,
+        ping_interval: float,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        next_ping = loop.time() + ping_interval
+        while True:
+            await asyncio.sleep(status_interval)
+            try:
+                self.publish([("system_status", None)], "system_status_update", status, "system_status")
+            except Exception:
+                logger.exception("Publishing the system status failed")
+            if loop.time() >= next_ping:
+                self.broadcast("ping", {"timestamp": datetime.now()})
+                next_ping = loop.time() + ping_interval
+
+    async def close(self, reason: str = "server_shutdown", message: str = "Server is shutting down") -> None:
+        """
+        Stop the ticker and close every connection after flushing its queue.
+        """
+        if self._ticker is not None:
+            self._ticker.cancel()
+            await asyncio.gather(self._ticker, return_exceptions=True)
+            self._ticker = None
+        payload = encode_message("connection_closed", {"reason": reason, "message": message})
+        connections: List[Connection] = list(self.connections.values())
+        for connection in connections:
+            connection.close(payload)
+        if connections:
+            await asyncio.wait(
+                [asyncio.ensure_future(connection.wait_closed()) for connection in connections],
+                timeout=1.0,
+            )
+        for connection in connections:
+            self.disconnect(connection)
+
+    def stats(self) -> Dict[str, Any]:
+        connections = self.connections.values()
+        return {
+            "connections": len(self.connections),
+            "subscriptions": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "published": self.published,
+            "deliveries": self.deliveries,
+            "queued": sum(connection.pending for connection in connections),
+            "coalesced": sum(connection.coalesced for connection in connections),
+            "dropped": sum(connection.dropped for connection in connections),
+        }
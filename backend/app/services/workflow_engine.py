@@ -0,0 +1,365 @@
+import asyncio
+import json
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from app.core.store import IndexedStore
+from app.models.workflow import WorkflowStatus, WorkflowStepType, WorkflowType
+from app.services.agent_executor import AgentExecutor
+from app.services.conditions import branch_targets, condition_context
+from app.services.workflow_plan import PlanCache, WorkflowPlan
+
+
+class WorkflowExecutionError(Exception):
+    """
+    Raised when a workflow step cannot be executed.
+    """
+
+
+# Returned by _run_step for a human step that is waiting for its review
+_AWAITING_REVIEW = object()
+
+
+class WorkflowEngine:
+    """
+    Runs workflow executions as asyncio tasks, walking ``next_steps`` as a DAG.
+
+    A step becomes ready once every step pointing at it has finished. Ready
+    steps of ``PARALLEL`` workflows run concurrently, up to the execution's
+    ``max_concurrency`` parameter or the engine default; all other workflow
+    types run one step at a time in topological order. Step lookups come
+    from the workflow's compiled plan. Progress is written back to the
+    executions store after every step.
+
+    A ``CONDITION`` step takes its first successor when its condition holds
+    and the remaining ones otherwise. Any other step with a condition is
+    skipped, along with everything only it leads to, when the condition
+    does not hold.
+
+    Each finished step is checkpointed in the execution's ``checkpoints``
+    together with its output and cost, in the same write. An execution
+    restarted after a crash or deploy (see ``recover``) replays checkpointed
+    steps from their recorded successors instead of running them again, so
+    completed agent calls are neither repeated nor billed twice.
+
+    A ``HUMAN`` step pauses its branch until the step is reviewed. Once
+    nothing else can run, the execution is left ``AWAITING_REVIEW`` with the
+    waiting steps in ``awaiting_review``; ``review`` checkpoints the decision
+    and resumes the execution from its checkpoints.
+
+    A run is cancelled when its execution is deleted or finished by anyone
+    else, including another worker process, so it never writes over that.
+    """
+
+    def __init__(
+        self,
+        workflows: IndexedStore,
+        executions: IndexedStore,
+        agents: IndexedStore,
+        executor: AgentExecutor,
+        plans: PlanCache,
+        max_concurrency: int = 4,
+        owner: Optional[str] = None,
+    ):
+        self.workflows = workflows
+        self.executions = executions
+        self.agents = agents
+        self.executor = executor
+        self.plans = plans
+        self.max_concurrency = max_concurrency
+        self.owner = owner
+        self._running: Dict[str, asyncio.Task] = {}
+        # Runs are also stopped when another worker cancels or deletes them
+        executions.subscribe(self._on_change, replicas=True)
+
+    def start(self, execution_id: str) -> None:
+        """
+        Schedule an execution to run in the background.
+        """
+        task = asyncio.create_task(self._run(execution_id))
+        self._running[execution_id] = task
+        task.add_done_callback(lambda _: self._running.pop(execution_id, None))
+
+    def cancel(self, execution_id: str) -> bool:
+        """
+        Stop a running execution. Returns False if it was not running.
+        """
+        task = self._running.get(execution_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    def _on_change(self, execution_id: str, execution: Optional[Dict[str, Any]]) -> None:
+        task = self._running.get(execution_id)
+        if task is None or task is asyncio.current_task():
+            return
+        if execution is None or execution["status"] in (
+            WorkflowStatus.COMPLETED,
+            WorkflowStatus.FAILED,
+        ):
+            task.cancel()
+
+    def recover(self, live_workers: Optional[Set[str]] = None) -> int:
+        """
+        Resume executions left in progress by a previous process.
+
+        Executions owned by one of ``live_workers`` are still running there
+        and are left alone. Returns the number of executions restarted.
+        """
+        live_workers = live_workers or set()
+        everything = len(self.executions)
+        orphaned = [
+            execution["id"]
+            for status in (WorkflowStatus.PENDING, WorkflowStatus.IN_PROGRESS)
+            for execution in self.executions.query({"status": status}, limit=everything)
+            if execution["id"] not in self._running
+            and execution.get("owner") not in live_workers
+        ]
+        for execution_id in orphaned:
+            self.start(execution_id)
+        return len(orphaned)
+
+    def review(
+        self, execution_id: str, step_id: str, approved: bool, comment: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Record the review of a human step and resume the execution.
+
+        An approved step continues with its ``next_steps``; a rejected one
+        fails the execution. Returns the updated execution.
+        """
+        execution = self.executions[execution_id]
+        if execution["status"] != WorkflowStatus.AWAITING_REVIEW:
+            raise WorkflowExecutionError(
+                f"Execution {execution_id} is not awaiting review"
+            )
+        if step_id not in (execution.get("awaiting_review") or []):
+            raise WorkflowExecutionError(f"Step {step_id} is not awaiting review")
+        workflow = self.workflows.get(execution["workflow_id"])
+        if workflow is None:
+            raise WorkflowExecutionError(f"Workflow {execution['workflow_id']} not found")
+        plan = self.plans.get(workflow)
+
+        output_data = dict(execution.get("output_data") or {})
+        output_data[step_id] = {
+            "status": "approved" if approved else "rejected",
+            "comment": comment,
+        }
+        if not approved:
+            self._update(
+                execution,
+                status=WorkflowStatus.FAILED,
+                output_data=output_data,
+                awaiting_review=None,
+                error=f"Step {step_id} was rejected in review",
+                completed_at=datetime.now(),
+            )
+            return execution
+
+        checkpoints = dict(execution.get("checkpoints") or {})
+        checkpoints[step_id] = {
+            "next_steps": list(plan.successors[step_id]),
+            "cost": 0.0,
+            "completed_at": datetime.now(),
+        }
+        self._update(
+            execution,
+            status=WorkflowStatus.IN_PROGRESS,
+            output_data=output_data,
+            checkpoints=checkpoints,
+            awaiting_review=None,
+        )
+        self.start(execution_id)
+        return execution
+
+    async def shutdown(self) -> None:
+        """
+        Cancel all running executions and wait for them to stop.
+        """
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _update(self, execution: Dict[str, Any], **changes: Any) -> None:
+        execution.update(changes)
+        execution["updated_at"] = datetime.now()
+        self.executions[execution["id"]] = execution
+
+    def _concurrency(self, workflow: Dict[str, Any], execution: Dict[str, Any]) -> int:
+        if workflow["type"] != WorkflowType.PARALLEL:
+            return 1
+        return max(int(execution["parameters"].get("max_concurrency", self.max_concurrency)), 1)
+
+    async def _run(self, execution_id: str) -> None:
+        execution = self.executions[execution_id]
+        # Claimed in the write that starts it, so recovery elsewhere skips it
+        self._update(execution, status=WorkflowStatus.IN_PROGRESS, owner=self.owner)
+
+        try:
+            workflow = self.workflows.get(execution["workflow_id"])
+            if workflow is None:
+                raise WorkflowExecutionError(f"Workflow {execution['workflow_id']} not found")
+            awaiting = await self._walk(self.plans.get(workflow), workflow, execution)
+        except asyncio.CancelledError:
+            # Cancellation status is recorded by whoever cancelled the run
+            raise
+        except Exception as e:
+            self._update(
+                execution,
+                status=WorkflowStatus.FAILED,
+                error=str(e),
+                completed_at=datetime.now(),
+            )
+        else:
+            if awaiting:
+                self._update(
+                    execution,
+                    status=WorkflowStatus.AWAITING_REVIEW,
+                    current_step_id=awaiting[0],
+                    awaiting_review=awaiting,
+                )
+                return
+            self._update(
+                execution,
+                status=WorkflowStatus.COMPLETED,
+                completed_at=datetime.now(),
+            )
+
+    async def _walk(
+        self,
+        plan: WorkflowPlan,
+        workflow: Dict[str, Any],
+        execution: Dict[str, Any],
+    ) -> List[str]:
+        """
+        Run every step that can run and return the human steps left waiting
+        for review, if any.
+        """
+        steps = plan.steps
+        waiting_on = {step_id: len(ids) for step_id, ids in plan.predecessors.items()}
+        ready: Deque[str] = deque(plan.entry_steps)
+        activated: Set[str] = set(ready)
+        running: Dict[asyncio.Task, str] = {}
+        awaiting: List[str] = []
+        limit = self._concurrency(workflow, execution)
+
+        def resolve(step_id: str, activate: bool) -> None:
+            # A step runs once all its predecessors are resolved and at least
+            # one of them activated it; otherwise it is skipped.
+            waiting_on[step_id] -= 1
+            if activate:
+                activated.add(step_id)
+            if waiting_on[step_id] > 0:
+                return
+            if step_id in activated:
+                ready.append(step_id)
+            else:
+                for next_id in plan.successors[step_id]:
+                    resolve(next_id, activate=False)
+
+        try:
+            while ready or running:
+                while ready and len(running) < limit:
+                    step = steps[ready.popleft()]
+                    checkpoint = (execution.get("checkpoints") or {}).get(step["id"])
+                    if checkpoint is not None:
+                        # Finished before a restart; follow its recorded branches
+                        for next_id in plan.successors[step["id"]]:
+                            resolve(next_id, activate=next_id in checkpoint["next_steps"])
+                        continue
+                    self._update(execution, current_step_id=step["id"])
+                    task = asyncio.create_task(self._run_step(plan, step, execution))
+                    running[task] = step["id"]
+                if not running:
+                    continue
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    step_id = running.pop(task)
+                    result, next_ids = task.result()
+                    if result is _AWAITING_REVIEW:
+                        # Its successors stay unresolved until the review
+                        awaiting.append(step_id)
+                        continue
+
+                    step_cost = result.get("cost", {}).get("total_cost", 0.0)
+                    output_data = dict(execution.get("output_data") or {})
+                    output_data[step_id] = result
+                    checkpoints = dict(execution.get("checkpoints") or {})
+                    checkpoints[step_id] = {
+                        "next_steps": list(next_ids),
+                        "cost": step_cost,
+                        "completed_at": datetime.now(),
+                    }
+                    self._update(
+                        execution,
+                        output_data=output_data,
+                        cost=execution.get("cost", 0.0) + step_cost,
+                        checkpoints=checkpoints,
+                    )
+
+                    for next_id in plan.successors[step_id]:
+                        resolve(next_id, activate=next_id in next_ids)
+        finally:
+            for task in running:
+                task.cancel()
+        return awaiting
+
+    async def _run_step(
+        self,
+        plan: WorkflowPlan,
+        step: Dict[str, Any],
+        execution: Dict[str, Any],
+    ) -> tuple:
+        """
+        Execute one step and return its result plus the successors it activates.
+        """
+        next_steps: Tuple[str, ...] = plan.successors[step["id"]]
+
+        condition = plan.conditions.get(step["id"])
+        if condition is not None:
+            passed = condition(condition_context(
+                execution["input_data"],
+                execution.get("output_data") or {},
+                execution["parameters"],
+            ))
+            if step["type"] == WorkflowStepType.CONDITION:
+                return {"status": "completed", "passed": passed}, tuple(branch_targets(list(next_steps), passed))
+            if not passed:
+                return {"status": "skipped"}, ()
+
+        if step["type"] == WorkflowStepType.AGENT:
+            agent = self.agents.get(step.get("agent_id"))
+            if agent is None:
+                raise WorkflowExecutionError(f"Agent {step.get('agent_id')} not found")
+            if not agent["is_active"]:
+                raise WorkflowExecutionError(f"Agent {agent['id']} is not active")
+
+            parameters = dict(step.get("parameters") or {})
+            task = parameters.pop("task", None) or step.get("description") or step["name"]
+            model_id = parameters.pop("model_id", None)
+            context = {
+                "input": execution["input_data"],
+                "previous": {
+                    step_id: output.get("result")
+                    for step_id, output in (execution.get("output_data") or {}).items()
+                },
+            }
+            task = f"{task}\n\nContext:\n{json.dumps(context, default=str)}"
+
+            result = await self.executor.run(
+                agent,
+                task,
+                model_id=model_id,
+                parameters=parameters,
+                workflow_id=execution["workflow_id"],
+            )
+            return result, next_steps
+
+        if step["type"] == WorkflowStepType.HUMAN:
+            return _AWAITING_REVIEW, ()
+
+        raise WorkflowExecutionError(f"Step type {step['type']} is not supported")
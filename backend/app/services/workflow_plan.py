@@ -0,0 +1,155 @@
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.models.workflow import WorkflowStepType
+from app.services.conditions import ConditionError, compile_condition
+
+
+class WorkflowPlanError(ValueError):
+    """
+    Raised when a workflow's steps do not form a valid plan.
+    """
+
+
+class WorkflowPlan:
+    """
+    A workflow's step list compiled into the lookups the engine needs.
+
+    ``order`` is a topological order of the step ids, ``entry_steps`` are the
+    steps nothing points at, and ``levels`` groups steps by their distance
+    from the entry steps; steps on the same level never depend on each other.
+    ``conditions`` holds the compiled condition of every step that has one.
+    """
+
+    __slots__ = (
+        "steps",
+        "order",
+        "successors",
+        "predecessors",
+        "entry_steps",
+        "levels",
+        "conditions",
+    )
+
+    def __init__(
+        self,
+        steps: Dict[str, Dict[str, Any]],
+        order: Tuple[str, ...],
+        successors: Dict[str, Tuple[str, ...]],
+        predecessors: Dict[str, Tuple[str, ...]],
+        entry_steps: Tuple[str, ...],
+        levels: Tuple[Tuple[str, ...], ...],
+        conditions: Dict[str, Callable[[Dict[str, Any]], bool]],
+    ):
+        self.steps = steps
+        self.order = order
+        self.successors = successors
+        self.predecessors = predecessors
+        self.entry_steps = entry_steps
+        self.levels = levels
+        self.conditions = conditions
+
+
+def compile_plan(steps: List[Dict[str, Any]]) -> WorkflowPlan:
+    """
+    Validate a workflow's steps and compile them into a WorkflowPlan.
+
+    Raises WorkflowPlanError for duplicate step ids, references to unknown
+    steps, agent steps without an agent, loop steps, which the engine cannot
+    run, invalid conditions and cycles.
+    """
+    by_id: Dict[str, Dict[str, Any]] = {}
+    conditions: Dict[str, Callable[[Dict[str, Any]], bool]] = {}
+    for step in steps:
+        if step["id"] in by_id:
+            raise WorkflowPlanError(f"Duplicate step id {step['id']}")
+        if step["type"] == WorkflowStepType.LOOP:
+            raise WorkflowPlanError(f"Loop step {step['id']} is not supported")
+        if step["type"] == WorkflowStepType.AGENT and not step.get("agent_id"):
+            raise WorkflowPlanError(f"Agent step {step['id']} has no agent_id")
+        if step["type"] == WorkflowStepType.CONDITION and not step.get("condition"):
+            raise WorkflowPlanError(f"Condition step {step['id']} has no condition")
+        if step.get("condition"):
+            try:
+                conditions[step["id"]] = compile_condition(step["condition"])
+            except ConditionError as e:
+                raise WorkflowPlanError(f"Step {step['id']} has an invalid condition: {e}")
+        by_id[step["id"]] = step
+
+    successors: Dict[str, Tuple[str, ...]] = {}
+    incoming: Dict[str, List[str]] = {step_id: [] for step_id in by_id}
+    for step_id, step in by_id.items():
+        next_ids = tuple(dict.fromkeys(step.get("next_steps") or []))
+        for next_id in next_ids:
+            if next_id not in by_id:
+                raise WorkflowPlanError(f"Step {step_id} points to unknown step {next_id}")
+            incoming[next_id].append(step_id)
+        successors[step_id] = next_ids
+    predecessors = {step_id: tuple(ids) for step_id, ids in incoming.items()}
+
+    # Kahn's algorithm, keeping list order among steps that are ready together
+    entry_steps = tuple(step_id for step_id in by_id if not predecessors[step_id])
+    remaining = {step_id: len(ids) for step_id, ids in predecessors.items()}
+    depth = {step_id: 0 for step_id in entry_steps}
+    queue = deque(entry_steps)
+    order: List[str] = []
+    while queue:
+        step_id = queue.popleft()
+        order.append(step_id)
+        for next_id in successors[step_id]:
+            depth[next_id] = max(depth.get(next_id, 0), depth[step_id] + 1)
+            remaining[next_id] -= 1
+            if remaining[next_id] == 0:
+                queue.append(next_id)
+
+    if len(order) != len(by_id):
+        cyclic = sorted(step_id for step_id, count in remaining.items() if count > 0)
+        raise WorkflowPlanError(f"Workflow steps contain a cycle through {', '.join(cyclic)}")
+
+    levels: List[List[str]] = []
+    for step_id in order:
+        if depth[step_id] == len(levels):
+            levels.append([])
+        levels[depth[step_id]].append(step_id)
+
+    return WorkflowPlan(
+        steps=by_id,
+        order=tuple(order),
+        successors=successors,
+        predecessors=predecessors,
+        entry_steps=entry_steps,
+        levels=tuple(tuple(level) for level in levels),
+        conditions=conditions,
+    )
+
+
+class PlanCache:
+    """
+    Compiled plans keyed by workflow id and the workflow's ``updated_at``.
+
+    A plan is reused for as long as the workflow's ``updated_at`` matches
+    the one it was compiled for, so starting an execution is a dict lookup.
+    """
+
+    def __init__(self):
+        self._plans: Dict[str, Tuple[Any, WorkflowPlan]] = {}
+
+    def put(self, workflow: Dict[str, Any]) -> WorkflowPlan:
+        """
+        Compile and cache the plan for a workflow's current version.
+        """
+        plan = compile_plan(workflow["steps"])
+        self._plans[workflow["id"]] = (workflow["updated_at"], plan)
+        return plan
+
+    def get(self, workflow: Dict[str, Any]) -> WorkflowPlan:
+        """
+        Return the cached plan, compiling it if the workflow has changed.
+        """
+        cached: Optional[Tuple[Any, WorkflowPlan]] = self._plans.get(workflow["id"])
+        if cached is not None and cached[0] == workflow["updated_at"]:
+            return cached[1]
+        return self.put(workflow)
+
+    def invalidate(self, workflow_id: str) -> None:
+        self._plans.pop(workflow_id, None)
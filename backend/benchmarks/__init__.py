@@ -0,0 +1,14 @@
+"""
+Benchmark suite and load generator for the API.
+
+Run from the backend directory:
+
+    python -m benchmarks --transport asgi
+    python -m benchmarks --transport socket --scenarios list_tasks --sizes 10000
+
+Scenarios run against ``app.main:app`` in-process through an ASGI transport,
+or against a uvicorn server over a real socket, with agent calls going to
+the local provider stub or the app's built-in fake provider. Each scenario
+reports p50/p95/p99 latency, throughput and RSS, and results are compared
+against a stored baseline.
+"""
@@ -0,0 +1,183 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from benchmarks.harness import compare, format_table, load_baseline, save_results
+from benchmarks.scenarios import SCENARIOS
+from benchmarks.targets import BACKEND_DIR, InProcessTarget, ServerProcess, SocketTarget
+
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "benchmarks", "baseline.json")
+
+
+def _list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _sizes(value: str) -> List[int]:
+    return [int(item) for item in _list(value)]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark the API in-process or over a socket against a local provider.",
+    )
+    parser.add_argument("--transport", choices=("asgi", "socket", "both"), default="asgi")
+    parser.add_argument(
+        "--scenarios", type=_list, default=list(SCENARIOS),
+        help=f"Comma-separated scenarios (default: {','.join(SCENARIOS)})",
+    )
+    parser.add_argument(
+        "--sizes", type=_sizes, default=[10000, 100000, 1000000],
+        help="Seeded task counts for list_tasks",
+    )
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent clients")
+    parser.add_argument("--pages", type=int, default=5, help="Cursor pages listed per filter")
+    parser.add_argument("--executions", type=int, default=100, help="Workflow executions")
+    parser.add_argument("--fanout", type=int, default=8, help="Parallel steps per workflow")
+    parser.add_argument("--poll-interval", type=float, default=0.02, help="Seconds between execution polls")
+    parser.add_argument("--clients", type=int, default=100, help="WebSocket subscribers")
+    parser.add_argument("--updates", type=int, default=200, help="Tasks broadcast to subscribers")
+    parser.add_argument("--delivery-timeout", type=float, default=30.0, help="Seconds to wait for broadcasts")
+    parser.add_argument(
+        "--provider", choices=("stub", "fake"), default="stub",
+        help="Serve agent calls from the provider stub over HTTP, or the app's built-in fake provider",
+    )
+    parser.add_argument(
+        "--provider-latency", type=float, default=0.05, help="Provider response time in seconds"
+    )
+    parser.add_argument(
+        "--provider-profile", type=json.loads, default={},
+        help="Fake provider profile settings as JSON, e.g. '{\"error_rate\": 0.01}'",
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2,
+        help="Allowed fraction by which a metric may be worse than the baseline",
+    )
+    options = parser.parse_args(argv)
+    unknown = [name for name in options.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+    return options
+
+
+def app_env(options: argparse.Namespace, provider_url: Optional[str]) -> Dict[str, str]:
+    """
+    Settings for the app under test: agent calls go to the provider stub or
+    the fake provider, and are neither cached nor capped by the daily cost
+    limit.
+    """
+    env = {
+        "RESPONSE_CACHE_ENABLED": "False",
+        "COST_LIMIT_DAILY": "1000000",
+        "PERSISTENCE_BACKEND": "memory",
+        "EXECUTION_LOG_ENABLED": "False",
+    }
+    if provider_url is not None:
+        env.update({
+            "OPENAI_BASE_URL": provider_url,
+            "OPENAI_API_KEY": "stub",
+            "ANTHROPIC_BASE_URL": provider_url,
+            "ANTHROPIC_API_KEY": "stub",
+        })
+    else:
+        # Fixed latency and instant tokens match the stub unless overridden
+        profile = {
+            "latency": options.provider_latency,
+            "latency_distribution": "fixed",
+            "tokens_per_second": 0,
+            **options.provider_profile,
+        }
+        env.update({
+            "FAKE_PROVIDER_ENABLED": "True",
+            "FAKE_PROVIDER_PROFILE": json.dumps(profile),
+        })
+    return env
+
+
+async def run(options: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    provider = None
+    if options.provider == "stub":
+        provider = ServerProcess(
+            "app.services.provider_stub:app",
+            {"PROVIDER_STUB_LATENCY": str(options.provider_latency)},
+        )
+        await provider.start()
+    try:
+        env = app_env(options, provider.url if provider is not None else None)
+        transports = ("asgi", "socket") if options.transport == "both" else (options.transport,)
+        for transport in transports:
+            if transport == "asgi":
+                # Settings are read when the app is imported, in this process
+                os.environ.update(env)
+                target: Any = InProcessTarget()
+            else:
+                target = SocketTarget(env)
+            await target.start()
+            try:
+                for name in options.scenarios:
+                    for result in await SCENARIOS[name](target, options):
+                        key = f"{target.name}:{result['name']}"
+                        results[key] = result
+                        print(
+                            f"{key}: {result['throughput']}/s, p50 {result['p50_ms']} ms, "
+                            f"p99 {result['p99_ms']} ms, {result['errors']} errors",
+                            file=sys.stderr,
+                        )
+            finally:
+                await target.close()
+    finally:
+        if provider is not None:
+            provider.stop()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    options = parse_args(argv)
+    results = asyncio.run(run(options))
+    print(format_table(results))
+
+    metadata = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "options": {
+            key: value for key, value in vars(options).items()
+            if key not in ("output", "baseline", "save_baseline")
+        },
+    }
+    if options.output:
+        save_results(options.output, results, metadata)
+
+    status = 0
+    baseline = load_baseline(options.baseline)
+    if baseline is None:
+        print(f"\nNo baseline at {options.baseline}; run with --save-baseline to store one.")
+    else:
+        regressions = compare(results, baseline, options.tolerance)
+        if regressions:
+            print(f"\nRegressions against {options.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            status = 1
+        else:
+            print(f"\nNo regressions against {options.baseline} (tolerance {options.tolerance:.0%}).")
+    if options.save_baseline:
+        save_results(options.baseline, results, metadata)
+        print(f"Baseline saved to {options.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import math
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+# Metrics compared against the baseline, and whether a higher value is worse
+COMPARED_METRICS = {
+    "p50_ms": True,
+    "p95_ms": True,
+    "p99_ms": True,
+    "throughput": False,
+    "rss_mb": True,
+}
+
+
+def rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """
+    Return the resident set size of a process, this one by default.
+
+    Reads ``/proc`` where it exists; elsewhere only this process's peak RSS
+    is available, from ``getrusage``.
+    """
+    path = f"/proc/{pid or 'self'}/status"
+    try:
+        with open(path) as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if pid is None or pid == os.getpid():
+        import resource  # Unix only
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+    return None
+
+
+def percentile(ordered: Sequence[float], fraction: float) -> float:
+    """
+    Return the nearest-rank percentile of already sorted values.
+    """
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(
+    name: str,
+    latencies: List[float],
+    errors: int,
+    duration: float,
+    rss: Optional[int],
+    operations: Optional[int] = None,
+    **extra: Any,
+) -> Dict[str, Any]:
+    """
+    Build the result of a scenario from its latencies in seconds.
+
+    Throughput counts ``operations`` per second, or the successful
+    latencies when it is not given.
+    """
+    ordered = sorted(latencies)
+    count = len(ordered) if operations is None else operations
+    result = {
+        "name": name,
+        "operations": count,
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput": round(count / duration, 1) if duration > 0 else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        "rss_mb": round(rss / (1024 * 1024), 1) if rss is not None else None,
+    }
+    result.update(extra)
+    return result
+
+
+async def run_load(
+    operation: Callable[[int], Awaitable[None]],
+    total: int,
+    concurrency: int,
+) -> Dict[str, Any]:
+    """
+    Call ``operation(index)`` for each index below ``total`` from
+    ``concurrency`` workers, timing each call.
+
+    Returns the latencies of the calls that succeeded, the number that
+    raised, and the wall-clock duration of the whole run.
+    """
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal errors, next_index
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                await operation(index)
+            except Exception:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(min(concurrency, total), 1))))
+    return {
+        "latencies": latencies,
+        "errors": errors,
+        "duration": time.perf_counter() - started,
+    }
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as baseline:
+        return json.load(baseline)["results"]
+
+
+def save_results(path: str, results: Dict[str, Dict[str, Any]], metadata: Dict[str, Any]) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as output:
+        json.dump({"metadata": metadata, "results": results}, output, indent=2, sort_keys=True)
+        output.write("\n")
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float,
+) -> List[str]:
+    """
+    Return a description of every metric that is worse than the baseline by
+    more than ``tolerance`` (a fraction), for scenarios present in both.
+
+    A scenario with more errors than its baseline is always a regression.
+    """
+    regressions = []
+    for key, result in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+        if result["errors"] > expected.get("errors", 0):
+            regressions.append(
+                f"{key}: {result['errors']} errors (baseline {expected.get('errors', 0)})"
+            )
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            value, reference = result.get(metric), expected.get(metric)
+            if value is None or not reference:
+                continue
+            change = (value - reference) / reference
+            if (change if higher_is_worse else -change) > tolerance:
+                regressions.append(
+                    f"{key}: {metric} {value} vs baseline {reference} ({change:+.0%})"
+                )
+    return regressions
+
+
+def format_table(results: Dict[str, Dict[str, Any]]) -> str:
+    columns = ("operations", "errors", "throughput", "p50_ms", "p95_ms", "p99_ms", "rss_mb")
+    width = max([len("scenario")] + [len(key) for key in results])
+    lines = [
+        "scenario".ljust(width) + "".join(column.rjust(12) for column in columns)
+    ]
+    for key, result in results.items():
+        lines.append(
+            key.ljust(width)
+            + "".join(str(result.get(column)).rjust(12) for column in columns)
+        )
+    return "\n".join(lines)
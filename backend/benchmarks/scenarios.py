@@ -0,0 +1,283 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.harness import run_load, summarize
+from benchmarks.targets import TASK_PRIORITIES, TASK_TYPES
+
+TASKS_PATH = "/api/v1/tasks/"
+
+# Filters cycled through by the list_tasks scenario
+LIST_FILTERS = (
+    {},
+    {"status": "failed"},
+    {"type": "code"},
+    {"status": "completed", "type": "design"},
+)
+
+
+# Agents pointed at the fake model when running with --provider fake
+AGENT_IDS = ("code-agent", "design-agent", "test-agent")
+FAKE_MODEL_NAME = "Benchmark fake model"
+
+
+def _check(response: Any, *statuses: int) -> Any:
+    if response.status_code not in (statuses or (200,)):
+        raise RuntimeError(f"{response.request.url}: HTTP {response.status_code}")
+    return response
+
+
+async def _use_fake_model(client: Any) -> None:
+    models = _check(await client.get("/api/v1/models/", params={"provider": "local"})).json()
+    model = next((model for model in models if model["name"] == FAKE_MODEL_NAME), None)
+    if model is None:
+        model = _check(await client.post("/api/v1/models/", json={
+            "name": FAKE_MODEL_NAME,
+            "provider": "local",
+            "model_id": "benchmark-fake",
+            "capabilities": ["text", "code", "reasoning", "planning"],
+            "context_window": 128000,
+            "cost_per_prompt_token": 0.00000015,
+            "cost_per_completion_token": 0.0000006,
+        })).json()
+    for agent_id in AGENT_IDS:
+        _check(await client.patch(
+            f"/api/v1/agents/{agent_id}", json={"default_model_id": model["id"]}
+        ))
+
+
+async def prepare(target: Any, options: Any, tasks: int = 0) -> None:
+    """
+    Reset the target to ``tasks`` seeded tasks and, with the fake provider,
+    point the agents at a model it serves.
+    """
+    await target.reset(tasks)
+    if options.provider == "fake":
+        await _use_fake_model(target.client)
+
+
+async def task_burst(target: Any, options: Any) -> List[Dict[str, Any]]:
+    """
+    Create tasks as fast as ``concurrency`` clients can, on an empty store.
+
+    Every task is queued for the scheduler, so agent calls to the provider
+    run in the background while the burst continues.
+    """
+    await prepare(target, options)
+
+    async def create(index: int) -> None:
+        _check(await target.client.post(TASKS_PATH, json={
+            "type": TASK_TYPES[index % len(TASK_TYPES)],
+            "title": f"Benchmark task {index}",
+            "description": f"Summarize benchmark input number {index}",
+            "priority": TASK_PRIORITIES[index % len(TASK_PRIORITIES)],
+        }))
+
+    load = await run_load(create, options.requests, options.concurrency)
+    return [summarize("task_burst", rss=target.rss(), **load)]
+
+
+def _page_params(filters: Dict[str, str], cursor: Optional[str]) -> Dict[str, Any]:
+    params: Dict[str, Any] = {**filters, "limit": 100}
+    if cursor:
+        params["cursor"] = cursor
+    return params
+
+
+async def _cursors(client: Any, filters: Dict[str, str], pages: int) -> List[Optional[str]]:
+    cursors: List[Optional[str]] = [None]
+    while len(cursors) < pages:
+        response = _check(await client.get(TASKS_PATH, params=_page_params(filters, cursors[-1])))
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+        cursors.append(cursor)
+    return cursors
+
+
+async def list_tasks(target: Any, options: Any) -> List[Dict[str, Any]]:
+    """
+    Page through filtered task lists at each of ``sizes`` seeded tasks.
+
+    Requests cycle through the filters and through the first ``pages``
+    cursor pages of each, 100 tasks per page. Cursors are collected before
+    the run; the store does not change while it is listed.
+    """
+    results = []
+    for size in options.sizes:
+        await prepare(target, options, size)
+        requests: List[Tuple[Dict[str, str], Optional[str]]] = []
+        for filters in LIST_FILTERS:
+            for cursor in await _cursors(target.client, filters, options.pages):
+                requests.append((filters, cursor))
+
+        async def list_page(index: int) -> None:
+            filters, cursor = requests[index % len(requests)]
+            _check(await target.client.get(TASKS_PATH, params=_page_params(filters, cursor)))
+
+        load = await run_load(list_page, options.requests, options.concurrency)
+        results.append(summarize(f"list_tasks[{size}]", rss=target.rss(), records=size, **load))
+    return results
+
+
+def fanout_workflow(width: int) -> Dict[str, Any]:
+    """
+    A parallel workflow with one planning step, ``width`` concurrent agent
+    steps and a step merging their results.
+    """
+    agents = ("code-agent", "test-agent")
+    workers = [f"worker-{index}" for index in range(width)]
+    steps = [{
+        "id": "plan",
+        "type": "agent",
+        "name": "Split the request into parts",
+        "agent_id": "design-agent",
+        "next_steps": workers,
+    }]
+    steps.extend({
+        "id": step_id,
+        "type": "agent",
+        "name": f"Handle part {index}",
+        "agent_id": agents[index % len(agents)],
+        "next_steps": ["merge"],
+    } for index, step_id in enumerate(workers))
+    steps.append({
+        "id": "merge",
+        "type": "agent",
+        "name": "Merge the parts",
+        "agent_id": "code-agent",
+    })
+    return {
+        "name": f"Benchmark fan-out x{width}",
+        "description": "Benchmark workflow",
+        "type": "parallel",
+        "steps": steps,
+        "parameters": {"max_concurrency": width},
+    }
+
+
+async def workflow_fanout(target: Any, options: Any) -> List[Dict[str, Any]]:
+    """
+    Run workflow executions end to end, from the create request until
+    polling sees them finish.
+
+    Polls send the last ETag, so an unchanged execution costs a 304.
+    """
+    await prepare(target, options)
+    client = target.client
+    workflow = _check(await client.post(
+        "/api/v1/orchestration/workflows", json=fanout_workflow(options.fanout)
+    )).json()
+
+    async def execute(index: int) -> None:
+        execution = _check(await client.post("/api/v1/orchestration/executions", json={
+            "workflow_id": workflow["id"],
+            "input_data": {"request": f"Benchmark request {index}"},
+        })).json()
+        path = f"/api/v1/orchestration/executions/{execution['id']}"
+        etag = None
+        deadline = time.monotonic() + 120
+        while execution["status"] not in ("completed", "failed"):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Execution {execution['id']} did not finish")
+            await asyncio.sleep(options.poll_interval)
+            response = _check(
+                await client.get(path, headers={"If-None-Match": etag} if etag else {}),
+                200, 304,
+            )
+            if response.status_code == 200:
+                etag = response.headers.get("etag")
+                execution = response.json()
+        if execution["status"] == "failed":
+            raise RuntimeError(f"Execution {execution['id']} failed: {execution['error']}")
+
+    load = await run_load(execute, options.executions, options.concurrency)
+    return [summarize(
+        f"workflow_fanout[{options.fanout}]",
+        rss=target.rss(),
+        steps_per_execution=options.fanout + 2,
+        **load,
+    )]
+
+
+async def _subscribe(target: Any) -> Any:
+    websocket = target.websocket()
+    await websocket.connect()
+    await websocket.receive()  # connection_established
+    await websocket.send(json.dumps({"type": "subscribe", "data": {"channel": "tasks"}}))
+    # Subscriptions are not acknowledged, but requests on a connection are
+    # handled in order, so the error answering this one confirms the subscribe
+    await websocket.send(json.dumps({"type": "subscribed?"}))
+    while json.loads(await websocket.receive())["type"] != "error":
+        pass
+    return websocket
+
+
+async def websocket_broadcast(target: Any, options: Any) -> List[Dict[str, Any]]:
+    """
+    Measure how long task updates take to reach ``clients`` WebSocket
+    subscribers of the ``tasks`` channel.
+
+    Each created task is broadcast to every client; latency runs from the
+    create request being sent to a client receiving the task's first
+    update, and throughput counts delivered messages.
+    """
+    await prepare(target, options)
+    clients = await asyncio.gather(*(_subscribe(target) for _ in range(options.clients)))
+    # task id -> time the create request was sent
+    sent: Dict[str, float] = {}
+    received: List[Dict[str, float]] = [{} for _ in clients]
+    expected = options.updates
+
+    async def listen(websocket: Any, first_seen: Dict[str, float]) -> None:
+        while len(first_seen) < expected:
+            message = json.loads(await websocket.receive())
+            task_id = (message.get("data") or {}).get("task_id")
+            if task_id is not None and task_id not in first_seen:
+                first_seen[task_id] = time.perf_counter()
+
+    listeners = [
+        asyncio.create_task(listen(websocket, first_seen))
+        for websocket, first_seen in zip(clients, received)
+    ]
+
+    async def create(index: int) -> None:
+        started = time.perf_counter()
+        response = _check(await target.client.post(TASKS_PATH, json={
+            "type": TASK_TYPES[index % len(TASK_TYPES)],
+            "title": f"Broadcast task {index}",
+            "description": f"Broadcast benchmark input number {index}",
+        }))
+        sent[response.json()["id"]] = started
+
+    started = time.perf_counter()
+    await run_load(create, expected, options.concurrency)
+    await asyncio.wait(listeners, timeout=options.delivery_timeout)
+    duration = time.perf_counter() - started
+    for listener in listeners:
+        listener.cancel()
+    await asyncio.gather(*(websocket.close() for websocket in clients), return_exceptions=True)
+
+    latencies = [
+        seen_at - sent[task_id]
+        for first_seen in received
+        for task_id, seen_at in first_seen.items()
+        if task_id in sent
+    ]
+    return [summarize(
+        f"websocket_broadcast[{options.clients}]",
+        latencies,
+        errors=expected * len(clients) - len(latencies),
+        duration=duration,
+        rss=target.rss(),
+        clients=len(clients),
+    )]
+
+
+SCENARIOS = {
+    "task_burst": task_burst,
+    "list_tasks": list_tasks,
+    "workflow_fanout": workflow_fanout,
+    "websocket_broadcast": websocket_broadcast,
+}
@@ -0,0 +1,328 @@
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Optional
+
+import httpx
+
+from benchmarks.harness import rss_bytes
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TASK_TYPES = ("code", "design", "test", "security", "analysis")
+TASK_PRIORITIES = ("low", "medium", "high")
+
+
+def seed_tasks(count: int) -> Iterator[dict]:
+    """
+    Yield ``count`` finished task records, the same ones on every run.
+
+    Seeded tasks are completed or failed, so a restarted server does not
+    requeue them and the scheduler stays idle while they are listed.
+    """
+    start = datetime(2024, 1, 1)
+    for index in range(count):
+        created_at = start + timedelta(seconds=index)
+        yield {
+            "id": f"seed-{index:07d}",
+            "type": TASK_TYPES[index % len(TASK_TYPES)],
+            "title": f"Seeded task {index}",
+            "description": "Benchmark seed record",
+            "priority": TASK_PRIORITIES[index % len(TASK_PRIORITIES)],
+            "status": "failed" if index % 4 == 0 else "completed",
+            "progress": 1.0,
+            "result": None,
+            "error": None,
+            "cost": 0.0,
+            "created_at": created_at,
+            "updated_at": created_at,
+            "completed_at": created_at,
+            "context": {},
+        }
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+class ServerProcess:
+    """
+    An ASGI app served by uvicorn in a subprocess, from the backend directory.
+    """
+
+    def __init__(self, app_path: str, env: Optional[Dict[str, str]] = None):
+        self.app_path = app_path
+        self.env = env or {}
+        self.port = 0
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self, timeout: float = 300.0) -> None:
+        """
+        Start the server and wait until it answers HTTP requests.
+
+        The timeout is generous since a server loading a million seeded
+        records takes a while to start.
+        """
+        self.port = free_port()
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", self.app_path,
+                "--host", "127.0.0.1",
+                "--port", str(self.port),
+                "--log-level", "warning",
+            ],
+            cwd=BACKEND_DIR,
+            env={**os.environ, **self.env},
+            # Its own process group, so stop() also reaches the worker pools it forks
+            start_new_session=True,
+        )
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient(base_url=self.url) as client:
+            while True:
+                if self.process.poll() is not None:
+                    raise RuntimeError(
+                        f"{self.app_path} exited with code {self.process.returncode}"
+                    )
+                try:
+                    # Any response, even a 404, means the server is accepting requests
+                    await client.get("/")
+                    return
+                except httpx.TransportError:
+                    if time.monotonic() > deadline:
+                        self.stop()
+                        raise RuntimeError(f"{self.app_path} did not start in {timeout}s")
+                    await asyncio.sleep(0.1)
+
+    def rss(self) -> Optional[int]:
+        if self.process is None:
+            return None
+        return rss_bytes(self.process.pid)
+
+    def stop(self) -> None:
+        if self.process is None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (AttributeError, ProcessLookupError, PermissionError):
+            pass
+        self.process = None
+
+
+class ASGIWebSocket:
+    """
+    WebSocket client talking to an ASGI app in the same process.
+
+    Messages are passed straight through the ASGI ``receive``/``send``
+    callables, with no socket or framing in between.
+    """
+
+    def __init__(self, app: Any, path: str):
+        self.app = app
+        self.path = path
+        self._incoming: asyncio.Queue = asyncio.Queue()
+        self._outgoing: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def connect(self) -> None:
+        scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "server": ("benchmark", 80),
+            "client": ("benchmark", 0),
+            "root_path": "",
+            "path": self.path,
+            "raw_path": self.path.encode(),
+            "query_string": b"",
+            "headers": [(b"host", b"benchmark")],
+            "subprotocols": [],
+            "state": {},
+        }
+        await self._incoming.put({"type": "websocket.connect"})
+        self._task = asyncio.create_task(
+            self.app(scope, self._incoming.get, self._outgoing.put)
+        )
+        message = await self._outgoing.get()
+        if message["type"] != "websocket.accept":
+            raise ConnectionError(f"WebSocket rejected: {message}")
+
+    async def send(self, text: str) -> None:
+        await self._incoming.put({"type": "websocket.receive", "text": text})
+
+    async def receive(self) -> str:
+        message = await self._outgoing.get()
+        if message["type"] != "websocket.send":
+            raise ConnectionError(f"WebSocket closed: {message}")
+        return message["text"]
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        await self._incoming.put({"type": "websocket.disconnect", "code": 1000})
+        try:
+            await asyncio.wait_for(self._task, timeout=5)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+        self._task = None
+
+
+class SocketWebSocket:
+    """
+    WebSocket client connected to a server over TCP.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self._connection: Any = None
+
+    async def connect(self) -> None:
+        # Installed with uvicorn[standard] from requirements.txt; only socket runs need it
+        import websockets
+        self._connection = await websockets.connect(self.url, max_size=None)
+
+    async def send(self, text: str) -> None:
+        await self._connection.send(text)
+
+    async def receive(self) -> str:
+        return await self._connection.recv()
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+
+class InProcessTarget:
+    """
+    Drives ``app.main:app`` in this process through an ASGI transport.
+
+    The lifespan is run here as a server would, since the ASGI transport
+    only sends requests. RSS is that of this process, so it includes the
+    load generator itself.
+    """
+
+    name = "asgi"
+
+    def __init__(self):
+        self.app: Any = None
+        self.client: Optional[httpx.AsyncClient] = None
+        self._lifespan: Optional[asyncio.Task] = None
+        self._incoming: asyncio.Queue = asyncio.Queue()
+        self._outgoing: asyncio.Queue = asyncio.Queue()
+
+    async def start(self) -> None:
+        # Imported here, after the benchmark settings are in the environment
+        from app.main import app
+        self.app = app
+        scope = {"type": "lifespan", "asgi": {"version": "3.0", "spec_version": "2.0"}, "state": {}}
+        self._lifespan = asyncio.create_task(app(scope, self._incoming.get, self._outgoing.put))
+        await self._incoming.put({"type": "lifespan.startup"})
+        message = await self._outgoing.get()
+        if message["type"] != "lifespan.startup.complete":
+            raise RuntimeError(f"App startup failed: {message.get('message')}")
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=60.0
+        )
+
+    async def reset(self, tasks: int = 0) -> None:
+        """
+        Replace the stored tasks with ``tasks`` seeded records.
+        """
+        from app.api.api_v1.endpoints.tasks import TASKS
+        TASKS.reset({record["id"]: record for record in seed_tasks(tasks)})
+
+    def websocket(self) -> ASGIWebSocket:
+        return ASGIWebSocket(self.app, "/ws")
+
+    def rss(self) -> Optional[int]:
+        return rss_bytes()
+
+    async def close(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+        if self._lifespan is not None:
+            await self._incoming.put({"type": "lifespan.shutdown"})
+            await self._outgoing.get()
+            await self._lifespan
+
+
+class SocketTarget:
+    """
+    Drives ``app.main:app`` served by uvicorn in a subprocess, over TCP.
+
+    Every reset starts a fresh server on a new SQLite file holding the
+    seeded tasks, so each scenario begins from the same state and RSS is
+    the server's own.
+    """
+
+    name = "socket"
+
+    def __init__(self, env: Dict[str, str]):
+        self.env = env
+        self.client: Optional[httpx.AsyncClient] = None
+        self._server: Optional[ServerProcess] = None
+        self._directory = tempfile.TemporaryDirectory(prefix="themachine-bench-")
+
+    async def start(self) -> None:
+        await self.reset(0)
+
+    async def _seed(self, path: str, tasks: int) -> None:
+        from app.db.repository import SQLiteRepository, encode_record
+        repository = SQLiteRepository(path)
+        try:
+            batch = []
+            for record in seed_tasks(tasks):
+                batch.append(("tasks", record["id"], encode_record(record)))
+                if len(batch) == 10000:
+                    await repository.write(batch)
+                    batch = []
+            await repository.write(batch)
+        finally:
+            await repository.close()
+
+    async def reset(self, tasks: int = 0) -> None:
+        await self._stop()
+        path = os.path.join(self._directory.name, f"tasks-{tasks}-{time.monotonic_ns()}.db")
+        await self._seed(path, tasks)
+        self._server = ServerProcess(
+            "app.main:app",
+            {**self.env, "PERSISTENCE_BACKEND": "sqlite", "SQLITE_PATH": path},
+        )
+        await self._server.start()
+        self.client = httpx.AsyncClient(base_url=self._server.url, timeout=60.0)
+
+    def websocket(self) -> SocketWebSocket:
+        return SocketWebSocket(self._server.url.replace("http://", "ws://") + "/ws")
+
+    def rss(self) -> Optional[int]:
+        return self._server.rss() if self._server is not None else None
+
+    async def _stop(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+        if self._server is not None:
+            self._server.stop()
+            self._server = None
+
+    async def close(self) -> None:
+        await self._stop()
+        self._directory.cleanup()
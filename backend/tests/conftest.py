@@ -0,0 +1,123 @@
+import os
+import tempfile
+
+# Settings are read when app modules are first imported, so the test
+# environment is set up before anything from app is imported
+_DATA_DIR = tempfile.mkdtemp(prefix="themachine-tests-")
+os.environ.update({
+    "PERSISTENCE_BACKEND": "memory",
+    "EXECUTION_LOG_ENABLED": "False",
+    "EVENT_BUS_BACKEND": "memory",
+    "RESPONSE_CACHE_DISK": "False",
+    "FAKE_PROVIDER_ENABLED": "False",
+    "VECTOR_DB_PATH": os.path.join(_DATA_DIR, "vectordb"),
+    "UPLOAD_DIR": os.path.join(_DATA_DIR, "uploads"),
+    "SQLITE_PATH": os.path.join(_DATA_DIR, "themachine.db"),
+    "EXECUTION_LOG_DIR": os.path.join(_DATA_DIR, "execution_log"),
+})
+# Without provider keys every agent call gets a mock result
+for _key in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY"):
+    os.environ.pop(_key, None)
+
+import asyncio
+from typing import AsyncIterator
+
+import httpx
+import pytest
+
+
+async def wait_for(predicate, timeout: float = 5.0, interval: float = 0.01):
+    """
+    Poll ``predicate`` until it returns something truthy, and return that.
+    """
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        result = await predicate() if asyncio.iscoroutinefunction(predicate) else predicate()
+        if result:
+            return result
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("Condition not met in time")
+        await asyncio.sleep(interval)
+
+
+def make_client(cls, transport, max_in_flight=4):
+    """
+    A provider client whose connection pool sends requests to ``transport``.
+    """
+    client = cls(
+        base_url="http://provider",
+        api_key="test-key",
+        max_in_flight=max_in_flight,
+        max_connections=4,
+        max_keepalive_connections=2,
+        keepalive_expiry=5.0,
+        timeout=5.0,
+    )
+    client._client = httpx.AsyncClient(
+        transport=transport, base_url=client.base_url, headers=client.headers()
+    )
+    return client
+
+
+def make_agent(**fields) -> dict:
+    return {
+        "id": "test-agent",
+        "prompt_template": "You are a test agent. Your task is to: {{task}}",
+        "default_model_id": "test-model",
+        "parameters": {"temperature": 0.0},
+        "is_active": True,
+        **fields,
+    }
+
+
+def make_model(**fields) -> dict:
+    return {
+        "id": "test-model",
+        "name": "Test model",
+        "provider": "openai",
+        "model_id": "test-model-v1",
+        "capabilities": ["text", "code"],
+        "context_window": 8000,
+        "cost_per_prompt_token": 0.001,
+        "cost_per_completion_token": 0.002,
+        "is_active": True,
+        "metadata": {},
+        **fields,
+    }
+
+
+class StaticProviders:
+    """
+    Stands in for the provider registry, serving every model with one client.
+    """
+
+    def __init__(self, client=None):
+        self.client = client
+
+    def for_model(self, model):
+        return self.client
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """
+    A transport to the provider stub app, answering without delay.
+    """
+    from app.services import provider_stub
+
+    monkeypatch.setattr(provider_stub, "LATENCY", 0.0)
+    monkeypatch.setattr(provider_stub, "TOKEN_INTERVAL", 0.0)
+    return httpx.ASGITransport(app=provider_stub.app)
+
+
+@pytest.fixture
+async def client() -> AsyncIterator[httpx.AsyncClient]:
+    """
+    An HTTP client for the app, with its lifespan running for the test.
+    """
+    from app.main import app, lifespan
+
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            yield http
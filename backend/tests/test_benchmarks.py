@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from app.services.workflow_plan import compile_plan
+from benchmarks.__main__ import parse_args
+from benchmarks.harness import (
+    compare,
+    format_table,
+    load_baseline,
+    percentile,
+    rss_bytes,
+    run_load,
+    save_results,
+    summarize,
+)
+from benchmarks.scenarios import fanout_workflow
+from benchmarks.targets import seed_tasks
+
+
+def result(**fields):
+    return {
+        "errors": 0, "p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0,
+        "throughput": 100.0, "rss_mb": 50.0, **fields,
+    }
+
+
+def test_percentiles_use_the_nearest_rank():
+    ordered = [float(value) for value in range(1, 101)]
+
+    assert percentile(ordered, 0.50) == 50.0
+    assert percentile(ordered, 0.99) == 99.0
+    assert percentile([7.0], 0.95) == 7.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_summarize_reports_milliseconds_and_throughput():
+    summary = summarize("burst", [0.001, 0.002, 0.003, 0.004], errors=1, duration=2.0,
+                        rss=64 * 1024 * 1024, records=10)
+
+    assert summary["operations"] == 4
+    assert summary["throughput"] == 2.0
+    assert (summary["p50_ms"], summary["max_ms"], summary["mean_ms"]) == (2.0, 4.0, 2.5)
+    assert summary["rss_mb"] == 64.0
+    assert summary["records"] == 10
+    assert summarize("empty", [], errors=0, duration=0.0, rss=None, operations=0)["throughput"] == 0.0
+
+
+async def test_run_load_counts_errors_and_caps_concurrency():
+    active = 0
+    peak = 0
+
+    async def operation(index):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.001)
+        active -= 1
+        if index % 5 == 0:
+            raise RuntimeError("failed request")
+
+    load = await run_load(operation, total=20, concurrency=4)
+
+    assert peak == 4
+    assert (len(load["latencies"]), load["errors"]) == (16, 4)
+    assert load["duration"] > 0
+
+
+@pytest.mark.parametrize("changed, regressed", [
+    ({}, []),
+    ({"p95_ms": 23.0}, []),
+    ({"p95_ms": 25.0}, ["p95_ms"]),
+    ({"throughput": 70.0}, ["throughput"]),
+    ({"throughput": 200.0, "p50_ms": 5.0}, []),
+    ({"rss_mb": None}, []),
+    ({"errors": 1}, ["errors"]),
+])
+def test_compare_flags_metrics_worse_than_the_tolerance(changed, regressed):
+    regressions = compare({"burst": result(**changed)}, {"burst": result()}, tolerance=0.2)
+
+    assert len(regressions) == len(regressed)
+    for regression, metric in zip(regressions, regressed):
+        assert regression.startswith("burst: ")
+        assert metric in regression
+
+
+def test_compare_skips_scenarios_missing_from_the_baseline():
+    assert compare({"new": result(errors=5)}, {"burst": result()}, tolerance=0.2) == []
+
+
+def test_results_roundtrip_through_the_baseline_file(tmp_path):
+    path = str(tmp_path / "results" / "baseline.json")
+    results = {"burst": result()}
+
+    assert load_baseline(path) is None
+    save_results(path, results, {"transport": "asgi"})
+
+    assert load_baseline(path) == results
+
+
+def test_format_table_has_a_row_per_scenario():
+    lines = format_table({"burst": result(operations=5), "list_tasks[10]": result()}).splitlines()
+
+    assert lines[0].split()[:3] == ["scenario", "operations", "errors"]
+    assert [line.split()[0] for line in lines[1:]] == ["burst", "list_tasks[10]"]
+
+
+def test_rss_of_this_process():
+    assert rss_bytes() > 0
+
+
+def test_seeded_tasks_are_finished_and_repeatable():
+    first, second = list(seed_tasks(8)), list(seed_tasks(8))
+
+    assert first == second
+    assert len({task["id"] for task in first}) == 8
+    assert {task["status"] for task in first} == {"completed", "failed"}
+
+
+def test_fanout_workflow_is_a_valid_parallel_plan():
+    plan = compile_plan(fanout_workflow(4)["steps"])
+
+    assert [len(level) for level in plan.levels] == [1, 4, 1]
+
+
+async def test_fanout_workflow_is_accepted_by_the_api(client):
+    response = await client.post("/api/v1/orchestration/workflows", json=fanout_workflow(3))
+
+    assert response.status_code == 200
+
+
+def test_unknown_scenarios_are_rejected():
+    assert parse_args(["--scenarios", "task_burst", "--sizes", "10,20"]).sizes == [10, 20]
+    with pytest.raises(SystemExit):
+        parse_args(["--scenarios", "nonexistent"])
@@ -0,0 +1,138 @@
+import asyncio
+from datetime import datetime
+
+from app.core.store import IndexedStore
+from app.models.workflow import WorkflowStatus, WorkflowStepType, WorkflowType
+from app.services.workflow_engine import WorkflowEngine
+from app.services.workflow_plan import PlanCache
+from tests.conftest import make_agent, wait_for
+
+
+class CountingExecutor:
+    """
+    Runs agent steps instantly, except the ones named in ``hold``.
+    """
+
+    def __init__(self, hold=()):
+        self.calls = []
+        self.hold = set(hold)
+        self.release = asyncio.Event()
+
+    async def run(self, agent, task, model_id=None, parameters=None, workflow_id=None):
+        name = task.split("\n", 1)[0]
+        self.calls.append(name)
+        if name in self.hold:
+            await self.release.wait()
+        return {"status": "completed", "result": name, "cost": {"total_cost": 0.25}}
+
+
+def make_engine(executor, owner="worker-1"):
+    workflows = IndexedStore(order_by=("name",))
+    workflows["w"] = {
+        "id": "w",
+        "name": "Three steps",
+        "type": WorkflowType.SEQUENTIAL,
+        "updated_at": datetime(2024, 1, 1),
+        "steps": [
+            {"id": step_id, "type": WorkflowStepType.AGENT, "name": step_id,
+             "agent_id": "test-agent", "parameters": {}, "next_steps": next_steps}
+            for step_id, next_steps in (("a", ["b"]), ("b", ["c"]), ("c", None))
+        ],
+    }
+    executions = IndexedStore(order_by=("created_at",), indexes=(("status",),))
+    agents = IndexedStore(order_by=("id",))
+    agents["test-agent"] = make_agent()
+    engine = WorkflowEngine(workflows, executions, agents, executor, PlanCache(), owner=owner)
+    return engine, executions
+
+
+def add_execution(executions, execution_id="e", **fields):
+    executions[execution_id] = {
+        "id": execution_id,
+        "workflow_id": "w",
+        "status": WorkflowStatus.IN_PROGRESS,
+        "current_step_id": "a",
+        "input_data": {},
+        "output_data": None,
+        "parameters": {},
+        "error": None,
+        "cost": 0.0,
+        "checkpoints": {},
+        "owner": None,
+        "created_at": datetime.now(),
+        "updated_at": datetime.now(),
+        "completed_at": None,
+        **fields,
+    }
+    return executions[execution_id]
+
+
+async def test_each_finished_step_is_checkpointed_with_its_cost():
+    executor = CountingExecutor()
+    engine, executions = make_engine(executor)
+    add_execution(executions)
+
+    engine.start("e")
+    await wait_for(lambda: executions["e"]["status"] == WorkflowStatus.COMPLETED)
+
+    checkpoints = executions["e"]["checkpoints"]
+    assert list(checkpoints) == ["a", "b", "c"]
+    assert checkpoints["a"]["next_steps"] == ["b"]
+    assert checkpoints["c"]["next_steps"] == []
+    assert all(checkpoint["cost"] == 0.25 for checkpoint in checkpoints.values())
+    assert executions["e"]["cost"] == 0.75
+
+
+async def test_an_interrupted_execution_resumes_after_its_last_checkpoint():
+    executor = CountingExecutor(hold={"b"})
+    engine, executions = make_engine(executor)
+    add_execution(executions)
+    engine.start("e")
+    await wait_for(lambda: "b" in executor.calls)
+
+    # A restart: the process running the execution goes away mid-step
+    await engine.shutdown()
+    assert list(executions["e"]["checkpoints"]) == ["a"]
+    executor.hold.clear()
+
+    assert engine.recover(live_workers=set()) == 1
+    await wait_for(lambda: executions["e"]["status"] == WorkflowStatus.COMPLETED)
+
+    assert executor.calls == ["a", "b", "b", "c"]
+    assert executions["e"]["cost"] == 0.75
+    assert set(executions["e"]["output_data"]) == {"a", "b", "c"}
+
+
+async def test_checkpointed_steps_are_not_run_again():
+    executor = CountingExecutor()
+    engine, executions = make_engine(executor)
+    add_execution(
+        executions,
+        output_data={"a": {"result": "a"}, "b": {"result": "b"}},
+        checkpoints={
+            step_id: {"next_steps": [next_id], "cost": 0.25, "completed_at": datetime.now()}
+            for step_id, next_id in (("a", "b"), ("b", "c"))
+        },
+        cost=0.5,
+    )
+
+    engine.recover()
+    await wait_for(lambda: executions["e"]["status"] == WorkflowStatus.COMPLETED)
+
+    assert executor.calls == ["c"]
+    assert executions["e"]["cost"] == 0.75
+
+
+async def test_recovery_leaves_executions_of_live_workers_alone():
+    executor = CountingExecutor()
+    engine, executions = make_engine(executor, owner="worker-2")
+    add_execution(executions, "alive", owner="worker-1")
+    add_execution(executions, "orphaned", owner="worker-0")
+    add_execution(executions, "done", status=WorkflowStatus.COMPLETED)
+
+    assert engine.recover(live_workers={"worker-1", "worker-2"}) == 1
+    await wait_for(lambda: executions["orphaned"]["status"] == WorkflowStatus.COMPLETED)
+
+    assert executions["orphaned"]["owner"] == "worker-2"
+    assert executions["alive"]["status"] == WorkflowStatus.IN_PROGRESS
+    assert executions["alive"]["owner"] == "worker-1"
@@ -0,0 +1,120 @@
+import pytest
+
+from app.services.conditions import (
+    MAX_EXPRESSION_LENGTH,
+    ConditionError,
+    branch_targets,
+    compile_condition,
+    condition_context,
+)
+from tests.conftest import wait_for
+
+CONTEXT = condition_context(
+    {"score": 7, "tags": ["api", "db"], "owner": {"name": "ops"}},
+    {"step1": {"status": "completed", "result": {"issues": 3}}},
+    {"threshold": 5},
+)
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("input.score > parameters.threshold", True),
+    ("input.score * 2 >= 15", False),
+    ("'db' in input.tags and not 'ui' in input.tags", True),
+    ("steps['step1']['result']['issues'] == 3", True),
+    ("steps.step1.status == 'completed'", True),
+    ("input.missing is None", True),
+    ("input.missing.deeper == null", True),
+    ("len(input.tags) == 2 and max(1, input.score) == 7", True),
+    ("1 < input.score < 5", False),
+    ("input.owner.name if input.owner else false", True),
+    ("input.tags[5]", False),
+    ("true or 1 / 0", True),
+])
+def test_conditions_evaluate_against_the_context(expression, expected):
+    assert compile_condition(expression)(CONTEXT) is expected
+
+
+@pytest.mark.parametrize("expression", [
+    "__import__('os').system('true')",
+    "open('/etc/passwd')",
+    "(lambda: 1)()",
+    "[x for x in input.tags]",
+    "2 ** 100000000",
+    "'x' * 1000000000",
+    "'%999999999d' % 1",
+    "int('1', base=2)",
+    "input.score := 1",
+    "{**input}",
+    "input.tags.pop()",
+    "x" * (MAX_EXPRESSION_LENGTH + 1),
+])
+def test_unsafe_or_unsupported_conditions_are_rejected(expression):
+    with pytest.raises(ConditionError):
+        compile_condition(expression)(CONTEXT)
+
+
+def test_attribute_access_only_reads_keys():
+    assert compile_condition("input.__class__ == None")(CONTEXT)
+    assert compile_condition("input.tags.__len__ == None")(CONTEXT)
+
+
+def test_runtime_errors_surface_as_condition_errors():
+    condition = compile_condition("input.score / 0 > 1")
+
+    with pytest.raises(ConditionError, match="failed"):
+        condition(CONTEXT)
+
+
+def test_conditions_are_compiled_once():
+    assert compile_condition("input.score > 1") is compile_condition("input.score > 1")
+
+
+def test_branch_targets_split_on_the_first_successor():
+    assert branch_targets(["yes", "no1", "no2"], True) == ["yes"]
+    assert branch_targets(["yes", "no1", "no2"], False) == ["no1", "no2"]
+
+
+async def test_workflow_with_an_unsafe_condition_is_rejected(client):
+    response = await client.post("/api/v1/orchestration/workflows", json={
+        "name": "Unsafe",
+        "description": "Condition that imports a module",
+        "type": "conditional",
+        "steps": [{
+            "id": "check",
+            "type": "condition",
+            "name": "Check",
+            "condition": "__import__('os').getcwd()",
+            "next_steps": None,
+        }],
+    })
+
+    assert response.status_code == 400
+    assert "invalid condition" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("urgent, taken, skipped", [(True, "fast", "slow"), (False, "slow", "fast")])
+async def test_condition_step_picks_a_branch(client, urgent, taken, skipped):
+    workflow = (await client.post("/api/v1/orchestration/workflows", json={
+        "name": "Branching",
+        "description": "Routes on an input flag",
+        "type": "conditional",
+        "steps": [
+            {"id": "check", "type": "condition", "name": "Check",
+             "condition": "input.urgent == true", "next_steps": ["fast", "slow"]},
+            {"id": "fast", "type": "agent", "name": "Fast", "agent_id": "code-agent"},
+            {"id": "slow", "type": "agent", "name": "Slow", "agent_id": "code-agent"},
+        ],
+    })).json()
+    started = (await client.post("/api/v1/orchestration/executions", json={
+        "workflow_id": workflow["id"],
+        "input_data": {"urgent": urgent},
+    })).json()
+
+    async def completed():
+        execution = (await client.get(f"/api/v1/orchestration/executions/{started['id']}")).json()
+        return execution if execution["status"] == "completed" else None
+
+    execution = await wait_for(completed)
+    assert execution["output_data"]["check"] == {"status": "completed", "passed": urgent}
+    assert taken in execution["output_data"]
+    assert skipped not in execution["output_data"]
@@ -0,0 +1,140 @@
+from datetime import date
+
+import pytest
+
+from app.api.api_v1.endpoints.agents import COST_LEDGER
+from app.core.store import IndexedStore
+from app.services.cost_ledger import (
+    CostLedger,
+    CostLimitExceeded,
+    RedisCostLedger,
+    Reservation,
+    create_cost_ledger,
+)
+from tests.conftest import wait_for
+
+
+def make_store():
+    return IndexedStore(order_by=("id",), indexes=(("scope",),))
+
+
+async def test_reservations_count_against_the_limit_until_settled():
+    ledger = CostLedger(make_store(), daily_limit=1.0, flush_interval=60)
+    first = await ledger.reserve(0.6, "model", "agent")
+
+    with pytest.raises(CostLimitExceeded, match="Daily cost limit of \\$1.00"):
+        await ledger.reserve(0.6, "model", "agent")
+
+    ledger.settle(first, 0.1)
+    second = await ledger.reserve(0.6, "model", "agent")
+    ledger.release(second)
+
+    summary = ledger.summary()
+    assert (summary["spent"], summary["reserved"], summary["rejected"]) == (0.1, 0.0, 1)
+    assert summary["remaining"] == pytest.approx(0.9)
+    await ledger.close()
+
+
+async def test_settled_costs_roll_up_per_model_agent_workflow_and_day():
+    store = make_store()
+    ledger = CostLedger(store, daily_limit=10.0, flush_interval=60)
+    for model_id, workflow_id, cost in (("m1", "w1", 0.25), ("m1", None, 0.5), ("m2", "w1", 1.0)):
+        reservation = await ledger.reserve(cost, model_id, "agent", workflow_id)
+        ledger.settle(reservation, cost)
+
+    rollups = ledger.summary()["rollups"]
+    assert rollups["model"] == {"m1": {"cost": 0.75, "calls": 2}, "m2": {"cost": 1.0, "calls": 1}}
+    assert rollups["workflow"] == {"w1": {"cost": 1.25, "calls": 2}}
+    assert rollups["agent"]["agent"] == {"cost": 1.75, "calls": 3}
+    assert rollups["day"][date.today().isoformat()]["calls"] == 3
+
+    # Nothing is written until the flush
+    assert len(store) == 0
+    await ledger.close()
+    assert store["model:m1"]["cost"] == 0.75
+    assert store.count({"scope": "workflow"}) == 1
+
+
+async def test_rollups_are_written_after_the_flush_interval():
+    store = make_store()
+    ledger = CostLedger(store, daily_limit=10.0, flush_interval=0.01)
+    ledger.settle(await ledger.reserve(0.1, "m", "a"), 0.1)
+
+    await wait_for(lambda: "model:m" in store)
+
+
+def test_spend_is_picked_up_from_the_store():
+    store = make_store()
+    ledger = CostLedger(store, daily_limit=1.0)
+    ledger.settle(Reservation(0.0, ledger.summary()["day"], "m", "a", None), 0.75)
+
+    reloaded = CostLedger(store, daily_limit=1.0)
+    reloaded.load()
+
+    assert reloaded.spent == 0.75
+    assert reloaded.summary()["rollups"]["model"]["m"] == {"cost": 0.75, "calls": 1}
+
+
+def test_reservations_from_an_earlier_day_do_not_touch_today():
+    ledger = CostLedger(make_store(), daily_limit=1.0)
+    ledger.reserved = 0.5
+    yesterday = Reservation(0.5, "2000-01-01", "m", "a", None)
+
+    ledger.settle(yesterday, 0.4)
+
+    assert (ledger.spent, ledger.reserved) == (0.0, 0.5)
+    assert ledger.summary()["rollups"]["day"]["2000-01-01"] == {"cost": 0.4, "calls": 1}
+
+
+def test_ledger_selection():
+    assert type(create_cost_ledger("memory", make_store(), 1.0, 5.0, "", 0, "costs")) is CostLedger
+    assert isinstance(create_cost_ledger("redis", make_store(), 1.0, 5.0, "", 0, "costs"), RedisCostLedger)
+    with pytest.raises(ValueError):
+        create_cost_ledger("kafka", make_store(), 1.0, 5.0, "", 0, "costs")
+
+
+async def test_unstarted_redis_ledger_enforces_the_limit_locally():
+    ledger = RedisCostLedger(make_store(), daily_limit=0.5)
+
+    await ledger.reserve(0.4, "m", "a")
+    with pytest.raises(CostLimitExceeded):
+        await ledger.reserve(0.4, "m", "a")
+    assert ledger.summary()["shared"] is True
+
+
+@pytest.fixture
+def exhausted_budget(monkeypatch):
+    monkeypatch.setattr(COST_LEDGER, "daily_limit", COST_LEDGER.spent + COST_LEDGER.reserved)
+
+
+async def test_executions_past_the_daily_limit_get_a_429(client, exhausted_budget):
+    response = await client.post(
+        "/api/v1/agents/code-agent/execute", params={"task": "Over budget"}
+    )
+
+    assert response.status_code == 429
+    assert "Daily cost limit" in response.json()["detail"]
+
+
+async def test_streams_past_the_daily_limit_end_with_an_error_frame(client, exhausted_budget):
+    response = await client.post(
+        "/api/v1/agents/code-agent/execute/stream", params={"task": "Over budget, streamed"}
+    )
+
+    assert response.status_code == 200
+    assert '"error"' in response.text
+    assert "Daily cost limit" in response.text
+
+
+async def test_costs_endpoint_reports_executions(client):
+    before = (await client.get("/api/v1/agents/costs")).json()
+
+    response = await client.post(
+        "/api/v1/agents/code-agent/execute", params={"task": "Charged to the ledger"}
+    )
+    after = (await client.get("/api/v1/agents/costs")).json()
+
+    assert response.status_code == 200
+    assert after["spent"] == pytest.approx(before["spent"] + response.json()["cost"]["total_cost"])
+    calls = after["rollups"]["agent"]["code-agent"]["calls"]
+    assert calls == before["rollups"]["agent"].get("code-agent", {"calls": 0})["calls"] + 1
@@ -0,0 +1,147 @@
+from datetime import datetime
+
+import pytest
+from pydantic import BaseModel
+from starlette.requests import Request
+
+from app.api.api_v1.endpoints.tasks import TASKS, TaskPriority, TaskStatus
+from app.api.serialization import RecordSerializer
+from app.core.store import IndexedStore
+
+
+class Item(BaseModel):
+    id: str
+    created_at: datetime
+
+
+def item(item_id):
+    return {"id": item_id, "created_at": datetime(2024, 1, 1)}
+
+
+def conditional(etag):
+    headers = [] if etag is None else [(b"if-none-match", etag.encode())]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def make_serializer():
+    store = IndexedStore(order_by=("created_at",))
+    store["a"] = item("a")
+    return store, RecordSerializer(store, Item)
+
+
+def test_record_etags_follow_the_record_version():
+    store, serializer = make_serializer()
+    before = serializer.etag(store["a"])
+
+    store["a"] = store["a"]
+
+    assert before.startswith('W/"')
+    assert serializer.etag(store["a"]) != before
+    assert serializer.etag(dict(store["a"])) is None
+
+
+def test_list_etags_follow_the_store_revision():
+    store, serializer = make_serializer()
+    before = serializer.list_etag()
+
+    assert serializer.list_etag() == before
+    store["b"] = item("b")
+    assert serializer.list_etag() != before
+
+
+def test_etags_differ_between_serializers():
+    store, serializer = make_serializer()
+
+    assert RecordSerializer(store, Item).etag(store["a"]) != serializer.etag(store["a"])
+
+
+@pytest.mark.parametrize("header", ["{etag}", 'W/"other", {etag}', "*"])
+def test_matching_requests_get_a_304_without_encoding(header):
+    store, serializer = make_serializer()
+    etag = serializer.etag(store["a"])
+
+    response = serializer.response(store["a"], request=conditional(header.format(etag=etag)))
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.body == b""
+    assert serializer.stats()["misses"] == 0
+    assert serializer.stats()["not_modified"] == 1
+
+
+@pytest.mark.parametrize("header", [None, 'W/"stale"'])
+def test_other_requests_get_the_record(header):
+    store, serializer = make_serializer()
+
+    response = serializer.response(store["a"], request=conditional(header))
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == serializer.etag(store["a"])
+
+
+@pytest.fixture
+def stored_task():
+    now = datetime.now()
+    TASKS["etag-task"] = {
+        "id": "etag-task",
+        "type": "analysis",
+        "title": "Cached by clients",
+        "description": "Fetched conditionally",
+        "priority": TaskPriority.LOW,
+        "status": TaskStatus.VERIFYING,
+        "progress": 0.5,
+        "result": None,
+        "error": None,
+        "cost": 0.0,
+        "created_at": now,
+        "updated_at": now,
+        "completed_at": None,
+        "context": {},
+        "owner": None,
+    }
+    yield TASKS["etag-task"]
+    del TASKS["etag-task"]
+
+
+async def test_conditional_get_of_a_task(client, stored_task):
+    first = await client.get("/api/v1/tasks/etag-task")
+    etag = first.headers["etag"]
+
+    unchanged = await client.get("/api/v1/tasks/etag-task", headers={"If-None-Match": etag})
+    stored_task["progress"] = 0.75
+    TASKS["etag-task"] = stored_task
+    changed = await client.get("/api/v1/tasks/etag-task", headers={"If-None-Match": etag})
+
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    assert changed.status_code == 200
+    assert changed.json()["progress"] == 0.75
+    assert changed.headers["etag"] != etag
+
+
+async def test_conditional_get_of_a_list_keeps_the_cursor(client, stored_task):
+    params = {"type": "analysis", "limit": 1}
+    first = await client.get("/api/v1/tasks/", params=params)
+    etag = first.headers["etag"]
+
+    unchanged = await client.get("/api/v1/tasks/", params=params, headers={"If-None-Match": etag})
+    TASKS["etag-task"] = stored_task
+    changed = await client.get("/api/v1/tasks/", params=params, headers={"If-None-Match": etag})
+
+    assert unchanged.status_code == 304
+    assert unchanged.headers.get("x-next-cursor") == first.headers.get("x-next-cursor")
+    assert changed.status_code == 200
+
+
+@pytest.mark.parametrize("path", [
+    "/api/v1/agents/code-agent",
+    "/api/v1/models/gpt-4o",
+    "/api/v1/orchestration/workflows/code-review-workflow",
+    "/api/v1/agents/",
+    "/api/v1/models/",
+    "/api/v1/orchestration/workflows",
+])
+async def test_other_resources_answer_conditional_gets(client, path):
+    etag = (await client.get(path)).headers["etag"]
+
+    assert (await client.get(path, headers={"If-None-Match": etag})).status_code == 304
@@ -0,0 +1,142 @@
+from datetime import datetime
+
+import pytest
+
+from app.api.api_v1.endpoints.tasks import TASKS, TaskPriority, TaskStatus, requeue_unfinished_tasks
+from app.core.store import IndexedStore
+from app.services.event_bus import (
+    WORKER_ID,
+    InMemoryEventBus,
+    RedisEventBus,
+    create_event_bus,
+    replicate_stores,
+)
+from app.services.recovery import WorkRecovery
+from tests.conftest import wait_for
+
+
+def make_store():
+    return IndexedStore(order_by=("created_at",), indexes=(("status",),))
+
+
+def record(record_id, **fields):
+    return {"id": record_id, "status": "pending", "created_at": datetime(2024, 1, 1), **fields}
+
+
+async def start_workers(group, count):
+    workers = []
+    for i in range(count):
+        bus = InMemoryEventBus(group, worker_id=f"{group}-{i}")
+        await bus.start()
+        store = make_store()
+        workers.append((bus, store, replicate_stores(bus, {"tasks": store})))
+    return workers
+
+
+async def test_changes_are_replicated_to_the_other_workers():
+    (bus_a, store_a, _), (bus_b, store_b, _) = await start_workers("replicate", 2)
+    seen = []
+    store_b.subscribe(lambda record_id, value: seen.append(record_id))
+
+    store_a["t1"] = record("t1")
+    store_b["t1"] = {**store_b["t1"], "status": "completed"}
+    del store_a["t1"]
+    store_a["t2"] = record("t2")
+
+    assert list(store_b) == ["t2"]
+    assert store_b.count({"status": "pending"}) == 1
+    # Applying a peer's change is not published again, nor passed to
+    # listeners that did not ask for replicas
+    assert (bus_a.published, bus_b.published) == (3, 1)
+    assert seen == ["t1"]
+    # The peer gets its own copy of the record
+    assert store_b["t2"] is not store_a["t2"]
+    await bus_a.close()
+    await bus_b.close()
+
+
+async def test_detached_stores_stop_publishing_and_applying():
+    (bus_a, store_a, detach_a), (bus_b, store_b, _) = await start_workers("detach", 2)
+
+    detach_a()
+    store_a["t1"] = record("t1")
+    store_b["t2"] = record("t2")
+
+    assert list(store_b) == ["t2"]
+    assert list(store_a) == ["t1"]
+    await bus_a.close()
+    await bus_b.close()
+
+
+async def test_live_workers_follow_the_group():
+    workers = await start_workers("live", 3)
+    bus = workers[0][0]
+
+    assert await bus.live_workers() == {"live-0", "live-1", "live-2"}
+    await workers[2][0].close()
+    assert await bus.live_workers() == {"live-0", "live-1"}
+    await workers[1][0].close()
+    await bus.close()
+
+
+def test_event_bus_selection():
+    assert isinstance(create_event_bus("memory", "", 0, "changes"), InMemoryEventBus)
+    assert isinstance(create_event_bus("redis", "localhost", 6379, "changes"), RedisEventBus)
+    with pytest.raises(ValueError):
+        create_event_bus("kafka", "", 0, "changes")
+
+
+class LockedBus(InMemoryEventBus):
+    def __init__(self, locked):
+        super().__init__("locks", worker_id="me")
+        self.locked = locked
+
+    async def acquire(self, name, ttl):
+        return not self.locked
+
+
+async def test_recovery_passes_live_workers_and_needs_the_lock():
+    calls = []
+
+    def recover(live):
+        calls.append(live)
+        return 2
+
+    assert await WorkRecovery(LockedBus(locked=True), [recover]).run() == 0
+    assert calls == []
+
+    recovery = WorkRecovery(LockedBus(locked=False), [recover, recover])
+    assert await recovery.run() == 4
+    assert calls == [{"me"}, {"me"}]
+    assert recovery.recovered == 4
+
+
+async def test_only_orphaned_tasks_are_requeued(client):
+    now = datetime.now()
+    for task_id, owner in (("requeue-orphan", "gone"), ("requeue-alive", "other-worker")):
+        TASKS[task_id] = {
+            "id": task_id,
+            "type": "design",
+            "title": task_id,
+            "description": "Left unfinished",
+            "priority": TaskPriority.MEDIUM,
+            "status": TaskStatus.IN_PROGRESS,
+            "progress": 0.4,
+            "result": None,
+            "error": None,
+            "cost": 0.0,
+            "created_at": now,
+            "updated_at": now,
+            "completed_at": None,
+            "context": {},
+            "owner": owner,
+        }
+    try:
+        assert requeue_unfinished_tasks({WORKER_ID, "other-worker"}) == 1
+        await wait_for(lambda: TASKS["requeue-orphan"]["status"] == TaskStatus.COMPLETED)
+
+        assert TASKS["requeue-orphan"]["owner"] == WORKER_ID
+        assert TASKS["requeue-alive"]["status"] == TaskStatus.IN_PROGRESS
+        assert TASKS["requeue-alive"]["progress"] == 0.4
+    finally:
+        del TASKS["requeue-orphan"], TASKS["requeue-alive"]
@@ -0,0 +1,150 @@
+import json
+import os
+from datetime import datetime
+
+from app.core.store import IndexedStore
+from app.db.event_log import SNAPSHOT_PREFIX, ExecutionEventLog
+
+
+def make_store():
+    return IndexedStore(order_by=("created_at",), indexes=(("status",),))
+
+
+def execution(execution_id, **fields):
+    return {
+        "id": execution_id,
+        "status": "in_progress",
+        "output_data": {},
+        "created_at": datetime(2024, 1, 1),
+        **fields,
+    }
+
+
+def reopen(directory, **options):
+    log = ExecutionEventLog(str(directory), **options)
+    records = log.replay()
+    store = make_store()
+    store.reset(records)
+    log.attach(store)
+    return log, store
+
+
+async def test_changes_are_replayed_after_a_restart(tmp_path):
+    log, store = reopen(tmp_path)
+    store["a"] = execution("a")
+    record = store["a"]
+    record["output_data"]["step1"] = {"result": "done"}
+    record["status"] = "completed"
+    store["a"] = record
+    store["b"] = execution("b")
+    del store["b"]
+    await log.close()
+
+    log, store = reopen(tmp_path)
+
+    assert list(store) == ["a"]
+    assert store["a"]["status"] == "completed"
+    assert store["a"]["output_data"] == {"step1": {"result": "done"}}
+    assert store["a"]["created_at"] == datetime(2024, 1, 1)
+    await log.close()
+
+
+async def test_only_changed_fields_and_dict_keys_are_logged(tmp_path):
+    log, store = reopen(tmp_path)
+    store["a"] = execution("a", output_data={"step1": {"result": "x" * 1000}})
+    record = store["a"]
+    record["output_data"] = {**record["output_data"], "step2": {"result": "small"}}
+    store["a"] = record
+    store["a"] = record
+
+    events = log.history("a")
+
+    assert [event["event"] for event in events] == ["created", "updated"]
+    assert events[1]["patch"] == {"output_data": {"step2": {"result": "small"}}}
+    assert "set" not in events[1]
+    await log.close()
+
+
+async def test_snapshots_bound_the_replay(tmp_path):
+    log, store = reopen(tmp_path, snapshot_events=5)
+    for i in range(12):
+        store[f"e{i}"] = execution(f"e{i}")
+        # A snapshot still being written puts off the next; let each finish
+        if log._snapshotting is not None:
+            await log._snapshotting
+    await log.close()
+
+    snapshots = sorted(name for name in os.listdir(tmp_path) if name.startswith(SNAPSHOT_PREFIX))
+    assert len(snapshots) == 2
+    assert snapshots[-1] == f"{SNAPSHOT_PREFIX}{10:016d}.json"
+
+    log = ExecutionEventLog(str(tmp_path), snapshot_events=5)
+    records = log.replay()
+    assert len(records) == 12
+    assert log.seq == 12
+    assert log._since_snapshot == 2
+    await log.close()
+
+
+async def test_an_unreadable_snapshot_falls_back_to_the_previous_one(tmp_path):
+    log, store = reopen(tmp_path, snapshot_events=3)
+    for i in range(7):
+        store[f"e{i}"] = execution(f"e{i}")
+        if log._snapshotting is not None:
+            await log._snapshotting
+    await log.close()
+    with open(tmp_path / f"{SNAPSHOT_PREFIX}{6:016d}.json", "w") as f:
+        f.write("{truncated")
+
+    log = ExecutionEventLog(str(tmp_path), snapshot_events=3)
+
+    assert len(log.replay()) == 7
+    await log.close()
+
+
+async def test_a_torn_last_line_is_dropped(tmp_path):
+    log, store = reopen(tmp_path)
+    store["a"] = execution("a")
+    store["b"] = execution("b")
+    await log.close()
+    segment = next(tmp_path.glob("*.log"))
+    with open(segment, "a") as f:
+        f.write(json.dumps({"seq": 3, "id": "c", "event": "created"})[:20])
+
+    log, store = reopen(tmp_path)
+    store["d"] = execution("d")
+    await log.close()
+
+    log, store = reopen(tmp_path)
+    assert sorted(store) == ["a", "b", "d"]
+    await log.close()
+
+
+async def test_segments_roll_over_and_are_all_kept(tmp_path):
+    log, store = reopen(tmp_path, segment_bytes=200)
+    for i in range(6):
+        store[f"e{i}"] = execution(f"e{i}")
+    await log.close()
+
+    assert len(list(tmp_path.glob("*.log"))) > 1
+    log, store = reopen(tmp_path, segment_bytes=200)
+    assert len(store) == 6
+    assert [event["event"] for event in log.history("e0")] == ["created"]
+    await log.close()
+
+
+async def test_closed_log_stops_following_the_store(tmp_path):
+    log, store = reopen(tmp_path)
+    store["a"] = execution("a")
+    await log.close()
+    store["b"] = execution("b")
+
+    log, store = reopen(tmp_path)
+    assert list(store) == ["a"]
+    await log.close()
+
+
+async def test_events_endpoint_requires_the_log(client):
+    response = await client.get("/api/v1/orchestration/executions/any/events")
+
+    assert response.status_code == 400
@@ -0,0 +1,176 @@
+import pytest
+
+from app.core.config import settings
+from app.core.store import IndexedStore
+from app.services.agent_executor import AgentExecutionError, AgentExecutor
+from app.services.fake_provider import FakeProviderClient, fake_profile
+from app.services.providers import Completion, ProviderError, ProviderRegistry
+from tests.conftest import StaticProviders, make_agent, make_model
+
+# No waiting, so the tests run at full speed
+INSTANT = {"latency": 0.0, "tokens_per_second": 0.0}
+
+
+def fake_model(**profile):
+    return make_model(
+        id="fake-model", provider="local", metadata={"fake_provider": {**INSTANT, **profile}}
+    )
+
+
+async def test_replies_are_deterministic_per_prompt_and_seed():
+    model = fake_model(completion_tokens=20)
+    client = FakeProviderClient("local", max_in_flight=4, seed=1)
+
+    first = await client.complete(model, "Summarize the diff", {})
+    again = await client.complete(model, "Summarize the diff", {})
+    other_prompt = await client.complete(model, "Review the tests", {})
+    other_seed = await FakeProviderClient("local", max_in_flight=4, seed=2).complete(
+        model, "Summarize the diff", {}
+    )
+
+    assert first.text == again.text
+    assert first.completion_tokens == 20
+    assert other_prompt.text != first.text
+    assert other_seed.text != first.text
+
+
+def test_latency_draws_are_deterministic_and_follow_the_distribution():
+    client = FakeProviderClient("local", max_in_flight=1)
+
+    fixed = client._plan(fake_model(latency=0.3, latency_distribution="fixed"), "p", {})
+    lognormal = [
+        client._plan(fake_model(latency=0.3, latency_distribution="lognormal"), "p", {}).latency
+        for _ in range(2)
+    ]
+    uniform = client._plan(
+        fake_model(latency=0.3, latency_distribution="uniform", latency_spread=0.5), "q", {}
+    )
+
+    assert fixed.latency == 0.3
+    assert lognormal[0] == lognormal[1] != 0.3
+    assert 0.15 <= uniform.latency <= 0.45
+
+
+async def test_max_tokens_caps_the_reply_and_usage_is_counted():
+    client = FakeProviderClient("local", max_in_flight=1)
+    model = fake_model(completion_tokens=50)
+
+    completion = await client.complete(model, "Write a haiku", {"max_tokens": 5})
+
+    assert completion.completion_tokens == 5
+    assert len(completion.text.split(" ")) == 5
+    assert completion.prompt_tokens == client.tokens.count("Write a haiku", model)
+    counter = client.stats()["models"]["fake-model"]
+    assert (counter["calls"], counter["completed"], counter["completion_tokens"]) == (1, 1, 5)
+
+
+async def test_streamed_chunks_add_up_to_the_completion():
+    client = FakeProviderClient("local", max_in_flight=1)
+    model = fake_model(completion_tokens=7, chunk_tokens=3)
+
+    frames = [frame async for frame in client.stream(model, "Stream it", {})]
+
+    chunks, completion = frames[:-1], frames[-1]
+    assert len(chunks) == 3
+    assert isinstance(completion, Completion)
+    assert "".join(chunks) == completion.text
+    assert completion.text == (await client.complete(model, "Stream it", {})).text
+
+
+@pytest.mark.parametrize("profile, status_code, counter", [
+    ({"error_rate": 1.0}, 500, "errors"),
+    ({"rate_limit_rate": 1.0}, 429, "rate_limited"),
+])
+async def test_injected_failures(profile, status_code, counter):
+    client = FakeProviderClient("local", max_in_flight=1)
+
+    with pytest.raises(ProviderError) as error:
+        await client.complete(fake_model(**profile), "Fail", {})
+
+    assert error.value.status_code == status_code
+    assert client.stats()["models"]["fake-model"][counter] == 1
+
+
+async def test_calls_past_requests_per_minute_are_rate_limited():
+    client = FakeProviderClient("local", max_in_flight=1)
+    model = fake_model(requests_per_minute=2)
+
+    for prompt in ("one", "two"):
+        await client.complete(model, prompt, {})
+    with pytest.raises(ProviderError) as error:
+        await client.complete(model, "three", {})
+
+    assert error.value.status_code == 429
+
+
+@pytest.mark.parametrize("overrides, message", [
+    ({"jitter": 1}, "Unknown fake provider settings: jitter"),
+    ({"latency": "slow"}, "latency must be a number"),
+    ({"latency": -1}, "latency must not be negative"),
+    ({"latency_distribution": "pareto"}, "latency_distribution must be one of"),
+    ({"chunk_tokens": 0}, "chunk_tokens must be at least 1"),
+    ({"error_rate": 1.5}, "error_rate must be between 0 and 1"),
+])
+def test_invalid_profiles_are_rejected(overrides, message):
+    with pytest.raises(ValueError, match=message):
+        fake_profile(make_model(metadata={"fake_provider": overrides}))
+
+
+def test_profiles_layer_model_settings_over_the_defaults():
+    model = make_model(metadata={"fake_provider": {"latency": 1}})
+
+    profile = fake_profile(model, {"latency": 2, "error_rate": 0.1})
+
+    assert profile["latency"] == 1.0
+    assert isinstance(profile["latency"], float)
+    assert profile["error_rate"] == 0.1
+
+
+async def test_invalid_profiles_fail_the_call_with_a_400():
+    client = FakeProviderClient("local", max_in_flight=1)
+    model = make_model(provider="local", metadata={"fake_provider": {"latency": -1}})
+
+    with pytest.raises(ProviderError) as error:
+        await client.complete(model, "p", {})
+
+    assert error.value.status_code == 400
+
+
+def test_registry_serves_local_models_only_when_enabled(monkeypatch):
+    assert ProviderRegistry().for_model(make_model(provider="local")) is None
+
+    monkeypatch.setattr(settings, "FAKE_PROVIDER_ENABLED", True)
+    registry = ProviderRegistry()
+
+    assert registry.for_model(make_model(provider="custom")) is not None
+    assert registry.stats()["custom"]["fake"] is True
+    assert registry.for_model(make_model(provider="openai")) is None
+
+
+async def test_executor_passes_fake_rate_limits_on_as_429():
+    client = FakeProviderClient("local", max_in_flight=1)
+    model = fake_model(rate_limit_rate=1.0)
+    models = IndexedStore(order_by=("id",))
+    models[model["id"]] = model
+    executor = AgentExecutor(models, StaticProviders(client.bind(model)))
+
+    with pytest.raises(AgentExecutionError) as error:
+        await executor.run(make_agent(default_model_id=model["id"]), "Rate limited task")
+
+    assert error.value.status_code == 429
+
+
+async def test_models_with_invalid_profiles_are_rejected_by_the_api(client):
+    response = await client.post("/api/v1/models/", json={
+        "name": "Broken fake model",
+        "provider": "local",
+        "model_id": "broken",
+        "capabilities": ["text"],
+        "context_window": 4096,
+        "cost_per_prompt_token": 0,
+        "cost_per_completion_token": 0,
+        "metadata": {"fake_provider": {"error_rate": 2}},
+    })
+
+    assert response.status_code == 400
+    assert "error_rate" in response.json()["detail"]
@@ -0,0 +1,151 @@
+import pytest
+
+from app.core.store import IndexedStore
+from app.models.model import ModelCapability, ModelProvider
+from app.services.model_selector import (
+    CAPABILITY_BITS,
+    ModelSelector,
+    capability_mask,
+    quality_score,
+    reason_not_selected,
+)
+
+
+def model(model_id, capabilities, prompt_cost, completion_cost=None, **fields):
+    return {
+        "id": model_id,
+        "name": model_id,
+        "provider": ModelProvider.OPENAI,
+        "capabilities": capabilities,
+        "context_window": 8000,
+        "cost_per_prompt_token": prompt_cost,
+        "cost_per_completion_token": prompt_cost if completion_cost is None else completion_cost,
+        "is_active": True,
+        "metadata": {},
+        **fields,
+    }
+
+
+@pytest.fixture
+def models():
+    store = IndexedStore(order_by=("name",))
+    for record in (
+        model("cheap-text", [ModelCapability.TEXT], 0.000001, metadata={"quality_score": 0.3}),
+        model("mid-code", ["text", "code"], 0.00001, metadata={"quality_score": 0.7}),
+        model("best-code", ["text", "code", "reasoning"], 0.0001, metadata={"quality_score": 0.95},
+              context_window=128000, provider=ModelProvider.ANTHROPIC),
+        model("retired", ["text", "code", "reasoning"], 0.0, is_active=False),
+    ):
+        store[record["id"]] = record
+    return store
+
+
+def selected_ids(ranked):
+    return [entry["model"]["id"] for entry in ranked]
+
+
+def test_capability_mask_accepts_enums_and_values():
+    assert capability_mask([ModelCapability.CODE, "text"]) == CAPABILITY_BITS["code"] | CAPABILITY_BITS["text"]
+    with pytest.raises(ValueError, match="Unknown capability: telepathy"):
+        capability_mask(["telepathy"])
+
+
+def test_quality_score_validation():
+    assert quality_score(None) is None
+    assert quality_score({"quality_score": 1}) == 1.0
+    for invalid in (True, "high", 1.5, -0.1):
+        with pytest.raises(ValueError):
+            quality_score({"quality_score": invalid})
+
+
+def test_required_capabilities_and_context_filter_models(models):
+    selector = ModelSelector(models)
+
+    assert set(selected_ids(selector.select(["code"]))) == {"mid-code", "best-code"}
+    assert selected_ids(selector.select(["reasoning"])) == ["best-code"]
+    assert selected_ids(selector.select(context_size=100000)) == ["best-code"]
+    assert selector.select(["vision"]) == []
+
+
+def test_cost_sensitivity_trades_cost_against_quality(models):
+    selector = ModelSelector(models)
+
+    assert selected_ids(selector.select(cost_sensitivity=1.0))[0] == "cheap-text"
+    assert selected_ids(selector.select(cost_sensitivity=0.0))[0] == "best-code"
+
+
+def test_estimated_cost_uses_token_counts(models):
+    ranked = ModelSelector(models).select(["reasoning"], prompt_tokens=2000, completion_tokens=100)
+
+    assert ranked[0]["estimated_cost"] == pytest.approx(0.0001 * 2100)
+    assert ranked[0]["tokens"] == 2100
+
+
+def test_preferred_provider_breaks_near_ties(models):
+    models["mid-code"] = dict(models["mid-code"], metadata={"quality_score": 0.95}, cost_per_prompt_token=0.0001,
+                              cost_per_completion_token=0.0001)
+    selector = ModelSelector(models)
+
+    assert selected_ids(selector.select(["code"], preferred_provider="anthropic"))[0] == "best-code"
+    assert selected_ids(selector.select(["code"], preferred_provider="openai"))[0] == "mid-code"
+
+
+def test_limit_returns_the_best_entries_in_order(models):
+    selector = ModelSelector(models)
+    everything = selector.select(limit=10)
+
+    assert [entry["score"] for entry in everything] == sorted(entry["score"] for entry in everything)
+    assert selected_ids(selector.select(limit=2)) == selected_ids(everything)[:2]
+
+
+def test_columns_are_rebuilt_when_the_catalog_changes(models):
+    selector = ModelSelector(models)
+    assert selected_ids(selector.select(["reasoning"])) == ["best-code"]
+
+    models["retired"] = dict(models["retired"], is_active=True)
+
+    assert set(selected_ids(selector.select(["reasoning"]))) == {"best-code", "retired"}
+
+
+def test_observed_latency_is_smoothed(models):
+    selector = ModelSelector(models)
+    selector.select()
+    selector.record_latency("cheap-text", 10.0)
+    selector.record_latency("cheap-text", 20.0)
+    selector.record_latency("mid-code", 0.1)
+
+    ranked = {entry["model"]["id"]: entry for entry in selector.select(limit=10)}
+
+    assert ranked["cheap-text"]["latency"] == pytest.approx(12.0)
+    assert ranked["mid-code"]["latency"] == pytest.approx(0.1)
+
+
+def test_reason_not_selected_names_the_deciding_factor():
+    selected = {"model": {"provider": "openai"}, "estimated_cost": 1.0, "quality": 0.9, "latency": 1.0}
+
+    assert reason_not_selected({**selected, "model": {"provider": "local"}}, selected, "openai") == \
+        "Not from the preferred provider"
+    assert reason_not_selected({**selected, "estimated_cost": 2.0}, selected) == "Higher cost"
+    assert reason_not_selected({**selected, "quality": 0.5}, selected) == "Lower quality"
+    assert reason_not_selected({**selected, "latency": 3.0}, selected) == "Higher observed latency"
+
+
+async def test_task_type_capabilities_are_required(client):
+    response = await client.post(
+        "/api/v1/orchestration/model-selection",
+        params={"task_type": "security", "cost_sensitivity": 1.0},
+        json=[],
+    )
+    assert response.status_code == 200
+    for entry in [response.json()["selected_model"], *response.json()["alternatives"]]:
+        assert {"code", "reasoning"} <= set(entry["capabilities"])
+
+
+async def test_unknown_capability_is_rejected(client):
+    response = await client.post(
+        "/api/v1/orchestration/model-selection",
+        params={"task_type": "code"},
+        json=["telepathy"],
+    )
+
+    assert response.status_code == 400
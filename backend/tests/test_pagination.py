@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+import uuid
+
+import pytest
+
+from app.api.api_v1.endpoints.tasks import TASKS, TaskPriority, TaskStatus, TaskType
+
+# Later than any task the API creates, so these come first newest-first
+FUTURE = datetime(2100, 1, 1)
+
+
+def make_task(created_at: datetime, task_type: TaskType = TaskType.ANALYSIS) -> dict:
+    task_id = str(uuid.uuid4())
+    return {
+        "id": task_id,
+        "type": task_type,
+        "title": "Listed task",
+        "description": "Only listed, never run",
+        "priority": TaskPriority.LOW,
+        "status": TaskStatus.VERIFYING,
+        "progress": 0.0,
+        "result": None,
+        "error": None,
+        "cost": 0.0,
+        "created_at": created_at,
+        "updated_at": created_at,
+        "completed_at": None,
+        "context": {},
+        "owner": None,
+    }
+
+
+@pytest.fixture
+def listed_tasks():
+    """
+    Tasks in their own status, newest first, removed again after the test.
+    """
+    tasks = [make_task(FUTURE - timedelta(seconds=i)) for i in range(25)]
+    for task in tasks:
+        TASKS[task["id"]] = task
+    yield tasks
+    for task_id in list(TASKS):
+        if TASKS[task_id]["status"] == TaskStatus.VERIFYING:
+            del TASKS[task_id]
+
+
+async def read_all(client, url, params):
+    pages = []
+    cursor = None
+    while True:
+        response = await client.get(url, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        pages.append([record["id"] for record in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+
+
+async def test_cursor_pages_cover_every_task_once(client, listed_tasks):
+    pages = await read_all(client, "/api/v1/tasks/", {"status": "verifying", "limit": 10})
+
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert sum(pages, []) == [task["id"] for task in listed_tasks]
+
+
+async def test_last_page_has_no_next_cursor(client, listed_tasks):
+    response = await client.get("/api/v1/tasks/", params={"status": "verifying", "limit": 25})
+
+    assert len(response.json()) == 25
+    assert "X-Next-Cursor" not in response.headers
+
+
+async def test_cursor_is_stable_across_inserts(client, listed_tasks):
+    first = await client.get("/api/v1/tasks/", params={"status": "verifying", "limit": 10})
+    newer = make_task(FUTURE + timedelta(seconds=1))
+    TASKS[newer["id"]] = newer
+
+    second = await client.get(
+        "/api/v1/tasks/",
+        params={"status": "verifying", "limit": 10, "cursor": first.headers["X-Next-Cursor"]},
+    )
+
+    assert [task["id"] for task in second.json()] == [task["id"] for task in listed_tasks[10:20]]
+
+
+async def test_cursor_respects_filters(client, listed_tasks):
+    other = make_task(FUTURE - timedelta(seconds=3, milliseconds=500), TaskType.DESIGN)
+    TASKS[other["id"]] = other
+
+    pages = await read_all(client, "/api/v1/tasks/", {"status": "verifying", "type": "analysis", "limit": 4})
+
+    assert other["id"] not in sum(pages, [])
+    assert sum(pages, []) == [task["id"] for task in listed_tasks]
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "W10", "WyJ4Il0", "eyJhIjogMX0", "WzEsICJ4Il0"])
+async def test_invalid_cursor_is_rejected(client, listed_tasks, cursor):
+    response = await client.get("/api/v1/tasks/", params={"cursor": cursor})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+async def test_invalid_cursor_is_rejected_on_other_lists(client):
+    for url in ("/api/v1/agents/", "/api/v1/models/", "/api/v1/orchestration/workflows"):
+        response = await client.get(url, params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400, url
+
+
+async def test_agents_page_by_cursor(client):
+    everything = (await client.get("/api/v1/agents/", params={"limit": 1000})).json()
+
+    pages = await read_all(client, "/api/v1/agents/", {"limit": 1})
+
+    assert sum(pages, []) == [agent["id"] for agent in everything]
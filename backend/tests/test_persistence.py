@@ -0,0 +1,180 @@
+import asyncio
+from datetime import datetime
+from enum import Enum
+
+import pytest
+
+from app.core.store import IndexedStore
+from app.db.persistence import WriteBatcher, attach_stores
+from app.db.repository import (
+    Repository,
+    SQLiteRepository,
+    async_database_url,
+    create_repository,
+    decode_record,
+    encode_record,
+)
+
+
+class Status(str, Enum):
+    OPEN = "open"
+
+
+class RecordingRepository(Repository):
+    """
+    In-memory repository that records each batch and can fail on demand.
+    """
+
+    def __init__(self, records=None):
+        self.records = records or {}
+        self.batches = []
+        self.fail = False
+
+    async def load(self, collection):
+        return {
+            record_id: decode_record(data)
+            for (name, record_id), data in self.records.items()
+            if name == collection
+        }
+
+    async def write(self, writes):
+        if self.fail:
+            raise RuntimeError("database down")
+        self.batches.append(writes)
+        for collection, record_id, data in writes:
+            if data is None:
+                self.records.pop((collection, record_id), None)
+            else:
+                self.records[(collection, record_id)] = data
+
+
+def make_store():
+    return IndexedStore(order_by=("created_at",), indexes=(("status",),))
+
+
+def record(record_id, **fields):
+    return {"id": record_id, "created_at": datetime(2024, 1, 1), "status": Status.OPEN, **fields}
+
+
+def test_records_roundtrip_with_datetimes_and_enums():
+    original = record("a", note="__datetime__ is only a tag inside its own object")
+
+    decoded = decode_record(encode_record(original))
+
+    assert decoded == original
+    assert isinstance(decoded["created_at"], datetime)
+
+
+async def test_sqlite_repository_upserts_deletes_and_reloads(tmp_path):
+    path = str(tmp_path / "state.db")
+    repository = SQLiteRepository(path)
+    await repository.write([
+        ("tasks", "a", encode_record(record("a"))),
+        ("tasks", "b", encode_record(record("b"))),
+        ("agents", "a", encode_record(record("a", name="agent"))),
+    ])
+    await repository.write([
+        ("tasks", "a", encode_record(record("a", progress=0.5))),
+        ("tasks", "b", None),
+    ])
+    await repository.close()
+
+    reopened = SQLiteRepository(path)
+    assert await reopened.load("tasks") == {"a": record("a", progress=0.5)}
+    assert (await reopened.load("agents"))["a"]["name"] == "agent"
+    await reopened.close()
+
+
+async def test_changes_within_a_window_are_written_once():
+    repository = RecordingRepository()
+    batcher = WriteBatcher(repository, interval=0.01)
+    for progress in (0.1, 0.2, 0.3):
+        batcher.enqueue("tasks", "a", record("a", progress=progress))
+    batcher.enqueue("tasks", "b", record("b"))
+
+    await asyncio.sleep(0.05)
+
+    assert len(repository.batches) == 1
+    assert len(repository.batches[0]) == 2
+    assert decode_record(repository.records[("tasks", "a")])["progress"] == 0.3
+    assert batcher.stats() == {"pending": 0, "batches": 1, "writes": 2, "coalesced": 2, "failures": 0}
+
+
+async def test_full_batches_are_written_early():
+    repository = RecordingRepository()
+    batcher = WriteBatcher(repository, interval=60, max_batch=3)
+    for i in range(3):
+        batcher.enqueue("tasks", str(i), record(str(i)))
+
+    await asyncio.sleep(0.01)
+
+    assert len(repository.batches) == 1
+    await batcher.close()
+
+
+async def test_failed_batches_are_retried_with_newer_changes():
+    repository = RecordingRepository()
+    repository.fail = True
+    batcher = WriteBatcher(repository, interval=0.01)
+    batcher.enqueue("tasks", "a", record("a", progress=0.1))
+    await batcher.flush()
+    batcher.enqueue("tasks", "a", record("a", progress=0.2))
+
+    repository.fail = False
+    await asyncio.sleep(0.05)
+
+    assert batcher.stats()["failures"] == 1
+    assert decode_record(repository.records[("tasks", "a")])["progress"] == 0.2
+
+
+async def test_attach_seeds_empty_collections_and_loads_existing_ones():
+    existing = {("tasks", "stored"): encode_record(record("stored"))}
+    repository = RecordingRepository(existing)
+    tasks, agents = make_store(), make_store()
+    tasks["seed"] = record("seed")
+    agents["builtin"] = record("builtin")
+    batcher = WriteBatcher(repository, interval=0.01)
+
+    await attach_stores({"tasks": tasks, "agents": agents}, repository, batcher)
+
+    assert list(tasks) == ["stored"]
+    assert ("agents", "builtin") in repository.records
+    await batcher.close()
+
+
+async def test_attached_stores_are_persisted_until_the_batcher_closes():
+    repository = RecordingRepository()
+    store = make_store()
+    batcher = WriteBatcher(repository, interval=0.01)
+    await attach_stores({"tasks": store}, repository, batcher)
+
+    store["a"] = record("a")
+    store["b"] = record("b")
+    del store["b"]
+    await batcher.close()
+    store["c"] = record("c")
+    await asyncio.sleep(0.03)
+
+    assert set(repository.records) == {("tasks", "a")}
+
+
+async def test_state_survives_a_restart_on_sqlite(tmp_path):
+    path = str(tmp_path / "state.db")
+    for expected in ([], ["a"]):
+        repository = SQLiteRepository(path)
+        store = make_store()
+        batcher = WriteBatcher(repository, interval=0.01)
+        await attach_stores({"tasks": store}, repository, batcher)
+        assert list(store) == expected
+        store["a"] = record("a")
+        await batcher.close()
+        await repository.close()
+
+
+def test_repository_selection():
+    assert create_repository("memory", "", "") is None
+    assert isinstance(create_repository("sqlite", "", ":memory:"), SQLiteRepository)
+    with pytest.raises(ValueError):
+        create_repository("mongo", "", "")
+    assert async_database_url("postgresql://db/app") == "postgresql+asyncpg://db/app"
+    assert async_database_url("sqlite:///state.db") == "sqlite+aiosqlite:///state.db"
@@ -0,0 +1,129 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.services import postprocessing
+from app.services.postprocessing import (
+    ResultProcessor,
+    aggregate_test_report,
+    register_processor,
+    summarize_diff,
+    summarize_security_findings,
+)
+from tests.conftest import wait_for
+
+
+def describe_payload(result):
+    """
+    Processor run in the worker processes by the tests below.
+    """
+    array = result["array"]
+    return {"pid": os.getpid(), "size": int(array.size), "total": int(array.sum()), "tag": result["tag"]}
+
+
+@pytest.fixture(scope="module")
+def processor():
+    processor = ResultProcessor(max_workers=1, shared_memory_threshold=1024)
+    yield processor
+    processor.shutdown()
+
+
+@pytest.fixture
+def registered(monkeypatch):
+    monkeypatch.setitem(postprocessing.PROCESSORS, "payload", describe_payload)
+
+
+def test_summarize_diff():
+    text = "\n".join([
+        "--- a/app/main.py",
+        "+++ b/app/main.py",
+        "-old line",
+        "+new line",
+        "+another line",
+        "```python",
+        "print('x')",
+        "```",
+    ])
+
+    assert summarize_diff({"result": text}) == {
+        "files": ["app/main.py"], "additions": 2, "deletions": 1, "code_blocks": 1,
+    }
+
+
+def test_aggregate_test_report():
+    text = "FAILED tests/test_a.py::test_one\n3 passed, 1 failed, 2 errors in 0.5s"
+
+    summary = aggregate_test_report({"result": text})
+
+    assert summary["counts"] == {"passed": 3, "failed": 1, "errors": 2}
+    assert summary["total"] == 6
+    assert summary["failures"] == ["tests/test_a.py::test_one"]
+    assert summary["pass_rate"] == 0.5
+
+
+def test_summarize_security_findings():
+    text = "High: SQL injection (CWE-89)\nLow: verbose errors\nhigh: XSS CWE-79, CWE-89"
+
+    summary = summarize_security_findings({"result": text})
+
+    assert summary["findings"] == 3
+    assert summary["by_severity"] == {"critical": 0, "high": 2, "medium": 0, "low": 1}
+    assert summary["highest_severity"] == "high"
+    assert summary["cwes"] == ["CWE-89", "CWE-79"]
+
+
+def test_processors_ignore_non_text_results():
+    assert summarize_diff({"result": None})["files"] == []
+    assert aggregate_test_report({})["pass_rate"] is None
+
+
+def test_only_importable_functions_can_be_registered():
+    def nested(result):
+        return result
+
+    with pytest.raises(ValueError, match="module level"):
+        register_processor("code")(nested)
+    with pytest.raises(ValueError):
+        register_processor("code")(lambda result: result)
+
+
+async def test_small_results_run_in_a_worker_process(processor, registered):
+    summary = await processor.process("payload", {"array": np.arange(4), "tag": "small"})
+
+    assert summary["pid"] != os.getpid()
+    assert (summary["size"], summary["total"], summary["tag"]) == (4, 6, "small")
+
+
+async def test_large_results_go_through_shared_memory(processor, registered):
+    array = np.arange(100_000, dtype=np.int64)
+
+    summary = await processor.process("payload", {"array": array, "tag": "large"})
+
+    assert (summary["size"], summary["total"], summary["tag"]) == (100_000, int(array.sum()), "large")
+
+
+async def test_built_in_processor_runs_off_the_event_loop(processor):
+    summary = await processor.process("test", {"result": "2 passed, 2 failed"})
+
+    assert summary["pass_rate"] == 0.5
+
+
+async def test_task_types_without_a_processor_return_none(processor):
+    assert not processor.has_processor("design")
+    assert await processor.process("design", {"result": "anything"}) is None
+
+
+async def test_completed_tasks_carry_the_analysis(client):
+    task = (await client.post("/api/v1/tasks/", json={
+        "type": "security",
+        "title": "Audit the login form",
+        "description": "Look for injection issues",
+    })).json()
+
+    async def completed():
+        current = (await client.get(f"/api/v1/tasks/{task['id']}")).json()
+        return current if current["status"] == "completed" else None
+
+    analysis = (await wait_for(completed))["result"]["analysis"]
+    assert set(analysis) == {"findings", "by_severity", "highest_severity", "cwes"}
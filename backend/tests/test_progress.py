@@ -0,0 +1,148 @@
+from datetime import datetime
+
+import pytest
+
+from app.api.api_v1.endpoints.tasks import PROGRESS, TASKS, TaskPriority, TaskStatus
+from app.services.progress import ProgressCoalescer
+from tests.conftest import wait_for
+
+
+class Applied:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, updates):
+        self.batches.append(updates)
+
+
+async def test_only_the_latest_value_per_record_is_applied_once_per_window():
+    applied = Applied()
+    coalescer = ProgressCoalescer(applied, window=0.01)
+    for progress in (0.1, 0.2, 0.3):
+        coalescer.report("a", progress)
+    coalescer.report("b", 0.5)
+
+    assert applied.batches == []
+    await wait_for(lambda: applied.batches)
+
+    assert applied.batches == [{"a": 0.3, "b": 0.5}]
+    assert coalescer.stats() == {
+        "window": 0.01, "pending": 0, "reported": 4, "coalesced": 2, "flushes": 1, "applied": 2,
+    }
+
+
+async def test_discarded_and_closed_reports():
+    applied = Applied()
+    coalescer = ProgressCoalescer(applied, window=60)
+    coalescer.report("a", 0.1)
+    coalescer.report("b", 0.2)
+    coalescer.discard("a")
+
+    coalescer.close()
+
+    assert applied.batches == [{"b": 0.2}]
+    coalescer.flush()
+    assert len(applied.batches) == 1
+
+
+def test_reports_without_a_running_loop_apply_at_once():
+    applied = Applied()
+    ProgressCoalescer(applied).report("a", 0.5)
+
+    assert applied.batches == [{"a": 0.5}]
+
+
+@pytest.fixture
+def running_task():
+    now = datetime.now()
+    task_ids = []
+
+    def create(status=TaskStatus.VERIFYING):
+        task_id = f"progress-{len(task_ids)}"
+        TASKS[task_id] = {
+            "id": task_id,
+            "type": "code",
+            "title": task_id,
+            "description": "Reports its progress",
+            "priority": TaskPriority.LOW,
+            "status": status,
+            "progress": 0.0,
+            "result": None,
+            "error": None,
+            "cost": 0.0,
+            "created_at": now,
+            "updated_at": now,
+            "completed_at": None,
+            "context": {},
+            "owner": None,
+        }
+        task_ids.append(task_id)
+        return task_id
+
+    yield create
+    for task_id in task_ids:
+        if task_id in TASKS:
+            del TASKS[task_id]
+
+
+async def test_reported_progress_is_written_once_per_window(client, running_task):
+    task_id = running_task()
+    writes = []
+
+    def listener(record_id, record):
+        if record_id == task_id:
+            writes.append(record["progress"])
+
+    TASKS.subscribe(listener)
+    try:
+        for progress in (0.2, 0.4, 0.6):
+            response = await client.post(f"/api/v1/tasks/{task_id}/progress", json={"progress": progress})
+            assert response.status_code == 202
+        PROGRESS.flush()
+    finally:
+        TASKS.unsubscribe(listener)
+
+    assert writes == [0.6]
+    assert (await client.get(f"/api/v1/tasks/{task_id}")).json()["progress"] == 0.6
+
+
+async def test_progress_of_missing_finished_or_invalid_reports(client, running_task):
+    finished = running_task(status=TaskStatus.COMPLETED)
+    running = running_task()
+
+    missing = await client.post("/api/v1/tasks/missing/progress", json={"progress": 0.5})
+    done = await client.post(f"/api/v1/tasks/{finished}/progress", json={"progress": 0.5})
+    out_of_range = await client.post(f"/api/v1/tasks/{running}/progress", json={"progress": 1.5})
+
+    assert missing.status_code == 404
+    assert done.status_code == 409
+    assert out_of_range.status_code == 422
+
+
+async def test_batch_reports_reject_missing_and_finished_tasks(client, running_task):
+    first, second = running_task(), running_task()
+    finished = running_task(status=TaskStatus.FAILED)
+
+    response = await client.post("/api/v1/tasks/progress", json=[
+        {"task_id": first, "progress": 0.3},
+        {"task_id": second, "progress": 0.7},
+        {"task_id": finished, "progress": 0.5},
+        {"task_id": "missing", "progress": 0.5},
+    ])
+    PROGRESS.flush()
+
+    assert response.status_code == 202
+    assert response.json() == {"accepted": 2, "rejected": [finished, "missing"]}
+    assert (TASKS[first]["progress"], TASKS[second]["progress"]) == (0.3, 0.7)
+    assert TASKS[finished]["progress"] == 0.0
+
+
+async def test_tasks_finishing_before_the_flush_keep_their_final_progress(client, running_task):
+    task_id = running_task()
+    await client.post(f"/api/v1/tasks/{task_id}/progress", json={"progress": 0.5})
+    task = TASKS[task_id]
+    TASKS[task_id] = {**task, "status": TaskStatus.COMPLETED, "progress": 1.0}
+
+    PROGRESS.flush()
+
+    assert TASKS[task_id]["progress"] == 1.0
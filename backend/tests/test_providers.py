@@ -0,0 +1,128 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.providers import (
+    DEFAULT_MAX_TOKENS,
+    AnthropicClient,
+    OpenAIClient,
+    ProviderError,
+    ProviderRegistry,
+)
+from tests.conftest import make_client
+
+
+@pytest.mark.parametrize("cls", [OpenAIClient, AnthropicClient])
+async def test_complete_parses_text_and_usage(stub, cls):
+    client = make_client(cls, stub)
+
+    completion = await client.complete("model-x", "Say hello to the tests", {"temperature": 0.2})
+
+    assert completion.text == "Stub completion for: Say hello to the tests"
+    assert completion.prompt_tokens == 5
+    assert completion.completion_tokens == 8
+    await client.aclose()
+
+
+def test_payloads_only_forward_provider_parameters():
+    openai = make_client(OpenAIClient, httpx.MockTransport(lambda request: None))
+    anthropic = make_client(AnthropicClient, httpx.MockTransport(lambda request: None))
+
+    assert openai.payload("m", "hi", {"stop": ["\n"]}) == {
+        "model": "m", "messages": [{"role": "user", "content": "hi"}], "stop": ["\n"],
+    }
+    assert anthropic.payload("m", "hi", {"stop": ["\n"]}) == {
+        "model": "m",
+        "messages": [{"role": "user", "content": "hi"}],
+        "stop_sequences": ["\n"],
+        "max_tokens": DEFAULT_MAX_TOKENS,
+    }
+
+
+async def test_agent_specific_parameters_are_not_sent():
+    sent = []
+
+    def handler(request):
+        sent.append(request)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    client = make_client(OpenAIClient, httpx.MockTransport(handler))
+    await client.complete("m", "hi", {"temperature": 0.1, "focus": "security", "system_prompt": "x"})
+
+    body = sent[0].read()
+    assert b"focus" not in body and b"system_prompt" not in body
+    assert sent[0].headers["Authorization"] == "Bearer test-key"
+
+
+async def test_requests_in_flight_are_capped():
+    active = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    client = make_client(OpenAIClient, httpx.MockTransport(handler), max_in_flight=2)
+    await asyncio.gather(*(client.complete("m", f"prompt {i}", {}) for i in range(8)))
+
+    assert peak == 2
+    assert client.stats() == {"in_flight": 0, "max_in_flight": 2}
+
+
+async def test_connection_pool_is_reused_until_closed(stub):
+    client = make_client(OpenAIClient, stub)
+    pool = client.client
+
+    await client.complete("m", "one", {})
+    await client.complete("m", "two", {})
+    assert client.client is pool
+
+    await client.aclose()
+    assert client._client is None
+
+
+@pytest.mark.parametrize("response, message", [
+    (httpx.Response(429, text="slow down"), "returned 429: slow down"),
+    (httpx.Response(200, json={"choices": []}), "malformed response"),
+    (httpx.Response(200, text="not json"), "malformed response"),
+])
+async def test_failures_raise_provider_errors(response, message):
+    client = make_client(OpenAIClient, httpx.MockTransport(lambda request: response))
+
+    with pytest.raises(ProviderError, match=message) as raised:
+        await client.complete("m", "hi", {})
+
+    assert raised.value.status_code == (429 if response.status_code == 429 else None)
+
+
+async def test_transport_errors_raise_provider_errors():
+    def handler(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    client = make_client(AnthropicClient, httpx.MockTransport(handler))
+
+    with pytest.raises(ProviderError, match="request failed"):
+        await client.complete("m", "hi", {})
+    assert client.in_flight == 0
+
+
+async def test_registry_creates_one_client_per_configured_provider(monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "ANTHROPIC_API_KEY", None)
+    registry = ProviderRegistry()
+
+    client = registry.get("openai")
+    assert isinstance(client, OpenAIClient)
+    assert registry.for_model({"provider": "openai"}) is client
+    assert registry.get("anthropic") is None
+    assert set(registry.stats()) == {"openai"}
+
+    await registry.aclose()
+    assert registry.stats() == {}
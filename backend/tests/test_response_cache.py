@@ -0,0 +1,173 @@
+import os
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.core.store import IndexedStore
+from app.services import response_cache
+from app.services.agent_executor import AgentExecutor
+from app.services.providers import OpenAIClient
+from app.services.response_cache import ResponseCache, cache_key, is_cacheable
+from tests.conftest import StaticProviders, make_agent, make_client, make_model
+
+
+def result(text="ok", cost=0.5):
+    return {"result": text, "cost": {"total_cost": cost}}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Wall-clock time for the cache module, advanced by hand.
+    """
+    now = [time.time()]
+    monkeypatch.setattr(
+        response_cache, "time", SimpleNamespace(time=lambda: now[0], monotonic=time.monotonic)
+    )
+    return now
+
+
+def test_cache_key_ignores_parameter_order_and_control_parameters():
+    key = cache_key("agent", "task", "prompt", "model", {"temperature": 0, "max_tokens": 10})
+
+    assert key == cache_key("agent", "task", "prompt", "model", {"max_tokens": 10, "temperature": 0})
+    assert key == cache_key("agent", "task", "prompt", "model",
+                            {"temperature": 0, "max_tokens": 10, "cache": True, "coalesce": False})
+    assert key != cache_key("agent", "other task", "prompt", "model", {"temperature": 0, "max_tokens": 10})
+
+
+@pytest.mark.parametrize("parameters, cacheable", [
+    ({"temperature": 0}, True),
+    ({"temperature": 0.0, "cache": False}, False),
+    ({"temperature": 0.7}, False),
+    ({"temperature": 0.7, "cache": True}, True),
+    ({}, False),
+    ({"temperature": True}, False),
+    ({"temperature": "cold"}, False),
+])
+def test_only_deterministic_executions_are_cacheable(parameters, cacheable):
+    assert is_cacheable(parameters) is cacheable
+
+
+async def test_hits_return_copies_and_count_saved_cost():
+    cache = ResponseCache(max_entries=10, max_bytes=10_000, ttl=60)
+    await cache.put("k", result())
+
+    first = await cache.get("k")
+    first["result"] = "changed"
+
+    assert (await cache.get("k"))["result"] == "ok"
+    assert await cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["saved_cost"]) == (2, 1, 1.0)
+
+
+async def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache(max_entries=2, max_bytes=10_000, ttl=60)
+    await cache.put("a", result())
+    await cache.put("b", result())
+    await cache.get("a")
+    await cache.put("c", result())
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+async def test_byte_budget_is_enforced():
+    cache = ResponseCache(max_entries=100, max_bytes=200, ttl=60)
+    await cache.put("big", result("x" * 500))
+    for i in range(10):
+        await cache.put(f"k{i}", result())
+
+    assert await cache.get("big") is None
+    assert cache.stats()["bytes"] <= 200
+
+
+async def test_entries_expire_after_the_ttl(clock):
+    cache = ResponseCache(max_entries=10, max_bytes=10_000, ttl=60)
+    await cache.put("k", result())
+
+    clock[0] += 61
+
+    assert await cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+async def test_disk_tier_survives_a_new_cache(tmp_path):
+    await ResponseCache(10, 10_000, 60, directory=str(tmp_path)).put("k" * 64, result())
+
+    cache = ResponseCache(10, 10_000, 60, directory=str(tmp_path))
+
+    assert (await cache.get("k" * 64))["result"] == "ok"
+    assert cache.stats()["disk_hits"] == 1
+    assert await cache.get("k" * 64) is not None
+    assert cache.stats()["disk_hits"] == 1
+
+
+async def test_disk_tier_has_its_own_budget(tmp_path):
+    cache = ResponseCache(10, 10_000, 60, directory=str(tmp_path), disk_max_entries=2)
+    for key in ("a" * 64, "b" * 64, "c" * 64):
+        await cache.put(key, result())
+
+    assert not os.path.exists(cache._path("a" * 64))
+    assert cache.stats()["disk_entries"] == 2
+    assert cache.stats()["disk_evictions"] == 1
+
+
+async def test_sweep_removes_expired_entries_and_stale_partial_writes(tmp_path, clock):
+    cache = ResponseCache(10, 10_000, 60, directory=str(tmp_path))
+    await cache.put("a" * 64, result())
+    # Let the sweep started by the first use finish before sweeping by hand
+    await cache._sweep_task
+    stale = os.path.join(tmp_path, "aa", "leftover.tmp")
+    open(stale, "w").close()
+    os.utime(stale, (clock[0] - 120, clock[0] - 120))
+
+    clock[0] += 61
+    cache._sweep_disk()
+
+    assert os.listdir(os.path.join(tmp_path, "aa")) == []
+    assert cache.stats()["expired_files"] == 1
+    assert cache.stats()["disk_entries"] == 0
+
+
+async def test_executor_serves_repeated_deterministic_calls_from_the_cache():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": "answer"}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5},
+        })
+
+    models = IndexedStore(order_by=("name",))
+    models["test-model"] = make_model()
+    executor = AgentExecutor(
+        models,
+        StaticProviders(make_client(OpenAIClient, httpx.MockTransport(handler))),
+        cache=ResponseCache(10, 10_000, 60),
+    )
+    agent = make_agent()
+
+    first = await executor.run(agent, "same task")
+    second = await executor.run(agent, "same task")
+    sampled = await executor.run(agent, "same task", parameters={"temperature": 0.9})
+
+    assert len(calls) == 2
+    assert "cached" not in first and first["cost"]["total_cost"] > 0
+    assert second["cached"] is True
+    assert second["result"] == "answer"
+    assert second["cost"]["total_cost"] == 0.0
+    assert "cached" not in sampled
+
+
+async def test_cache_stats_endpoint(client):
+    response = await client.get("/api/v1/agents/cache/stats")
+
+    assert response.status_code == 200
+    assert response.json()["enabled"] is True
+    assert "hit_rate" in response.json()
@@ -0,0 +1,152 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.services import scheduler as scheduler_module
+from app.services.scheduler import TaskScheduler
+from tests.conftest import wait_for
+
+
+class Recorder:
+    """
+    Processes tasks by recording their ids, holding "blocker" until released
+    and failing the tasks whose id starts with "fail".
+    """
+
+    def __init__(self):
+        self.order = []
+        self.release = asyncio.Event()
+
+    async def __call__(self, task_id):
+        self.order.append(task_id)
+        if task_id == "blocker":
+            await self.release.wait()
+        if task_id.startswith("fail"):
+            raise RuntimeError(task_id)
+
+
+async def drain(scheduler, recorder, count):
+    recorder.release.set()
+    await wait_for(lambda: scheduler.processed == count)
+
+
+async def test_urgent_tasks_run_first_in_fifo_order():
+    recorder = Recorder()
+    scheduler = TaskScheduler(recorder, workers=1, aging_interval=3600)
+    scheduler.submit("blocker", "high")
+    await asyncio.sleep(0)
+    for task_id, priority in [("low1", "low"), ("med1", "medium"), ("high1", "high"),
+                              ("low2", "low"), ("high2", "high")]:
+        scheduler.submit(task_id, priority)
+
+    await drain(scheduler, recorder, 6)
+
+    assert recorder.order == ["blocker", "high1", "high2", "med1", "low1", "low2"]
+    await scheduler.shutdown()
+
+
+async def test_waiting_tasks_age_into_higher_priority(monkeypatch):
+    now = [1000.0]
+    # Only the scheduler's clock; the event loop keeps the real one
+    monkeypatch.setattr(scheduler_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    recorder = Recorder()
+    scheduler = TaskScheduler(recorder, workers=1, aging_interval=10)
+    scheduler.submit("blocker", "high")
+    await asyncio.sleep(0)
+    scheduler.submit("old-low", "low")
+    now[0] += 25
+    scheduler.submit("new-high", "high")
+
+    await drain(scheduler, recorder, 3)
+
+    # Waiting 25s lifted the low task 2.5 levels, past the fresh high one
+    assert recorder.order == ["blocker", "old-low", "new-high"]
+    await scheduler.shutdown()
+
+
+async def test_reprioritize_and_discard_queued_tasks():
+    recorder = Recorder()
+    scheduler = TaskScheduler(recorder, workers=1, aging_interval=3600)
+    scheduler.submit("blocker", "high")
+    await asyncio.sleep(0)
+    for task_id in ("a", "b", "c"):
+        scheduler.submit(task_id, "low")
+
+    assert scheduler.reprioritize("c", "high")
+    assert scheduler.discard("b")
+    assert not scheduler.discard("missing")
+    assert not scheduler.reprioritize("missing", "high")
+    assert scheduler.stats()["queues"]["low"]["depth"] == 1
+
+    recorder.release.set()
+    await wait_for(lambda: scheduler.processed == 3)
+
+    assert recorder.order == ["blocker", "c", "a"]
+    await scheduler.shutdown()
+
+
+async def test_failures_are_counted_and_workers_keep_going():
+    recorder = Recorder()
+    scheduler = TaskScheduler(recorder, workers=2, aging_interval=3600)
+    scheduler.submit("blocker", "low")
+    for task_id in ("fail1", "ok", "fail2"):
+        scheduler.submit(task_id, "medium")
+
+    await drain(scheduler, recorder, 4)
+
+    stats = scheduler.stats()
+    assert (stats["processed"], stats["failed"], stats["running"]) == (4, 2, 0)
+    await scheduler.shutdown()
+
+
+async def test_workers_are_bounded():
+    active = 0
+    peak = 0
+
+    async def process(task_id):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    scheduler = TaskScheduler(process, workers=3)
+    for i in range(10):
+        scheduler.submit(str(i), "medium")
+    await wait_for(lambda: scheduler.processed == 10)
+
+    assert peak == 3
+    await scheduler.shutdown()
+
+
+async def test_queued_tasks_survive_a_restart():
+    recorder = Recorder()
+    scheduler = TaskScheduler(recorder, workers=1, aging_interval=3600)
+    scheduler.submit("blocker", "high")
+    await asyncio.sleep(0)
+    scheduler.submit("queued", "low")
+
+    await scheduler.shutdown()
+    recorder.order.clear()
+    recorder.release.set()
+    scheduler.submit("after", "low")
+    await wait_for(lambda: len(recorder.order) == 2)
+
+    assert recorder.order == ["queued", "after"]
+    await scheduler.shutdown()
+
+
+async def test_created_tasks_are_processed(client):
+    task = (await client.post("/api/v1/tasks/", json={
+        "type": "code",
+        "title": "Scheduled task",
+        "description": "Processed by the worker pool",
+        "priority": "high",
+    })).json()
+
+    async def finished():
+        current = (await client.get(f"/api/v1/tasks/{task['id']}")).json()
+        return current if current["status"] in ("completed", "failed") else None
+
+    assert (await wait_for(finished))["status"] == "completed"
+    stats = (await client.get("/api/v1/tasks/scheduler/stats")).json()
+    assert stats["processed"] >= 1
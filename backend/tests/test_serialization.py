@@ -0,0 +1,121 @@
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from fastapi import Response
+from pydantic import BaseModel
+
+from app.api.serialization import RecordSerializer
+from app.core.store import IndexedStore
+
+
+class Color(str, Enum):
+    RED = "red"
+
+
+class Item(BaseModel):
+    id: str
+    color: Color
+    created_at: datetime
+    note: Optional[str] = None
+
+
+def make_serializer():
+    store = IndexedStore(order_by=("created_at",))
+    return store, RecordSerializer(store, Item)
+
+
+def item(item_id, **fields):
+    return {"id": item_id, "color": Color.RED, "created_at": datetime(2024, 1, 1), **fields}
+
+
+def test_json_matches_the_models_own_output():
+    store, serializer = make_serializer()
+    store["a"] = item("a", internal="not in the model")
+
+    data = serializer.dumps(store["a"])
+
+    assert data == Item(**store["a"]).model_dump_json().encode()
+    assert json.loads(data) == {
+        "id": "a", "color": "red", "created_at": "2024-01-01T00:00:00", "note": None,
+    }
+
+
+def test_unchanged_records_are_encoded_once():
+    store, serializer = make_serializer()
+    store["a"] = item("a")
+
+    first = serializer.dumps(store["a"])
+    second = serializer.dumps(store["a"])
+
+    assert second is first
+    assert (serializer.hits, serializer.misses) == (1, 1)
+
+
+def test_writes_and_deletes_invalidate_the_cached_bytes():
+    store, serializer = make_serializer()
+    store["a"] = item("a")
+    serializer.dumps(store["a"])
+
+    record = store["a"]
+    record["note"] = "changed"
+    store["a"] = record
+
+    assert json.loads(serializer.dumps(store["a"]))["note"] == "changed"
+    del store["a"]
+    assert serializer.stats()["entries"] == 0
+
+
+def test_records_outside_the_store_are_not_cached():
+    store, serializer = make_serializer()
+    store["a"] = item("a")
+
+    copy = dict(store["a"], note="edited copy")
+
+    assert json.loads(serializer.dumps(copy))["note"] == "edited copy"
+    assert json.loads(serializer.dumps(store["a"]))["note"] is None
+    assert serializer.stats()["entries"] == 1
+
+
+def test_lists_join_the_cached_records():
+    store, serializer = make_serializer()
+    for item_id in ("a", "b"):
+        store[item_id] = item(item_id)
+
+    assert [record["id"] for record in json.loads(serializer.dumps_many(store.values()))] == ["a", "b"]
+    assert serializer.dumps_many([]) == b"[]"
+
+
+def test_responses_keep_the_headers_set_by_the_handler():
+    store, serializer = make_serializer()
+    store["a"] = item("a")
+    handler_response = Response()
+    handler_response.headers["X-Next-Cursor"] = "abc"
+
+    response = serializer.list_response([store["a"]], handler_response, status_code=201)
+
+    assert response.status_code == 201
+    assert response.media_type == "application/json"
+    assert response.headers["X-Next-Cursor"] == "abc"
+    assert json.loads(response.body)[0]["id"] == "a"
+
+
+async def test_api_responses_match_the_response_model(client):
+    created = await client.post("/api/v1/tasks/", json={
+        "type": "design",
+        "title": "Serialized task",
+        "description": "Validated once per version",
+    })
+    task_id = created.json()["id"]
+
+    fetched = await client.get(f"/api/v1/tasks/{task_id}")
+    listed = await client.get("/api/v1/tasks/", params={"type": "design", "limit": 100})
+
+    assert created.headers["content-type"] == "application/json"
+    assert set(fetched.json()) == {
+        "id", "type", "title", "description", "priority", "status", "progress",
+        "result", "error", "cost", "created_at", "updated_at", "completed_at",
+    }
+    assert "owner" not in fetched.json()
+    assert task_id in [task["id"] for task in listed.json()]
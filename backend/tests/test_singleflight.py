@@ -0,0 +1,130 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.store import IndexedStore
+from app.services.agent_executor import AgentExecutor
+from app.services.providers import OpenAIClient
+from app.services.singleflight import SingleFlight
+from tests.conftest import StaticProviders, make_agent, make_client, make_model
+
+
+async def test_concurrent_callers_share_one_call():
+    flights = SingleFlight()
+    started = 0
+
+    async def call():
+        nonlocal started
+        started += 1
+        await asyncio.sleep(0.01)
+        return "done"
+
+    results = await asyncio.gather(*(flights.do("k", call) for _ in range(5)))
+
+    assert started == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert all(result == "done" for result, _ in results)
+    assert flights.stats() == {"in_flight": 0, "calls": 1, "coalesced": 4}
+
+
+async def test_different_keys_and_later_calls_run_separately():
+    flights = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0)
+        return object()
+
+    (a, _), (b, _) = await asyncio.gather(flights.do("a", call), flights.do("b", call))
+    (c, shared) = await flights.do("a", call)
+
+    assert len({id(a), id(b), id(c)}) == 3
+    assert shared is False
+
+
+async def test_errors_reach_every_waiting_caller():
+    flights = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    results = await asyncio.gather(
+        *(flights.do("k", call) for _ in range(3)), return_exceptions=True
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flights.stats()["in_flight"] == 0
+
+
+async def test_one_cancelled_caller_does_not_cancel_the_others():
+    flights = SingleFlight()
+    release = asyncio.Event()
+
+    async def call():
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(flights.do("k", call))
+    second = asyncio.create_task(flights.do("k", call))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert await second == ("done", True)
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+async def test_call_is_cancelled_once_every_caller_is():
+    flights = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def call():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    callers = [asyncio.create_task(flights.do("k", call)) for _ in range(2)]
+    await asyncio.sleep(0)
+    for caller in callers:
+        caller.cancel()
+    await asyncio.gather(*callers, return_exceptions=True)
+
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert flights.stats()["in_flight"] == 0
+
+
+async def test_executor_coalesces_identical_sampled_calls():
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": "answer"}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5},
+        })
+
+    models = IndexedStore(order_by=("name",))
+    models["test-model"] = make_model()
+    executor = AgentExecutor(
+        models, StaticProviders(make_client(OpenAIClient, httpx.MockTransport(handler)))
+    )
+    agent = make_agent(parameters={"temperature": 0.8})
+
+    results = await asyncio.gather(*(executor.run(agent, "same task") for _ in range(4)))
+    opted_out = await asyncio.gather(
+        *(executor.run(agent, "same task", parameters={"coalesce": False}) for _ in range(2))
+    )
+
+    assert len(calls) == 1 + 2
+    charged = [result for result in results if not result.get("coalesced")]
+    assert len(charged) == 1 and charged[0]["cost"]["total_cost"] > 0
+    assert all(
+        result["cost"]["total_cost"] == 0.0 and result["result"] == "answer"
+        for result in results if result.get("coalesced")
+    )
+    assert not any(result.get("coalesced") for result in opted_out)
@@ -0,0 +1,98 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+from app.core.startup import StartupReport
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(source, tmp_path):
+    """
+    Run ``source`` in a fresh interpreter and return what it printed as JSON.
+    """
+    env = {
+        **os.environ,
+        "VECTOR_DB_PATH": str(tmp_path / "vectordb"),
+        "UPLOAD_DIR": str(tmp_path / "uploads"),
+        "SQLITE_PATH": str(tmp_path / "themachine.db"),
+        "EXECUTION_LOG_DIR": str(tmp_path / "execution_log"),
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(source)],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_importing_the_app_loads_no_endpoints_and_writes_nothing(tmp_path):
+    loaded = run_python("""
+        import json, sys
+        import app.main
+        print(json.dumps(sorted(name for name in sys.modules if name.startswith("app.api"))))
+    """, tmp_path)
+
+    assert not any(name.startswith("app.api.api_v1.endpoints") for name in loaded)
+    assert "app.api.websocket" not in loaded
+    assert os.listdir(tmp_path) == []
+
+
+def test_routes_and_openapi_include_the_routers_on_first_use(tmp_path):
+    seen = run_python("""
+        import json
+        from app.main import app
+        before = getattr(app.state, "routers_included", False)
+        app.routes
+        print(json.dumps({"before": before, "after": app.state.routers_included,
+                          "paths": sorted(app.openapi()["paths"]),
+                          "url": app.url_path_for("get_task", task_id="t1")}))
+    """, tmp_path)
+
+    assert (seen["before"], seen["after"]) == (False, True)
+    assert {"/api/v1/tasks/", "/api/v1/agents/{agent_id}", "/health/startup"} <= set(seen["paths"])
+    assert "/api/v1/orchestration/workflows" in seen["paths"]
+    assert seen["url"] == "/api/v1/tasks/t1"
+
+
+def test_a_client_without_the_lifespan_still_gets_the_routes(tmp_path):
+    status = run_python("""
+        import json
+        from fastapi.testclient import TestClient
+        from app.main import app
+        print(json.dumps(TestClient(app).get("/api/v1/models/gpt-4o").status_code))
+    """, tmp_path)
+
+    assert status == 200
+
+
+def test_later_startups_replace_their_phases_but_keep_the_imports():
+    report = StartupReport()
+    with report.phase("import"):
+        pass
+    for _ in range(2):
+        report.begin()
+        with report.phase("load"):
+            pass
+        report.complete()
+
+    summary = report.summary()
+    assert summary["completed"]
+    assert [phase["name"] for phase in summary["phases"]] == ["import", "load"]
+    assert set(summary["phases"][0]) == {"name", "seconds", "modules_imported"}
+
+
+async def test_startup_report_endpoint(client):
+    summary = (await client.get("/health/startup")).json()
+
+    names = [phase["name"] for phase in summary["phases"]]
+    assert summary["completed"]
+    assert "import fastapi" in names
+    assert "start websocket hub and event bus" in names
+    assert names.count("create directories") == 1
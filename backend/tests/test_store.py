@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta
+from enum import Enum
+
+import pytest
+
+from app.core.store import IndexedStore
+
+
+class Color(str, Enum):
+    RED = "red"
+    BLUE = "blue"
+
+
+START = datetime(2024, 1, 1)
+
+
+def make_store(count: int = 0) -> IndexedStore:
+    store = IndexedStore(order_by=("created_at",), indexes=(("status",), ("status", "color")))
+    for i in range(count):
+        store[f"r{i:03d}"] = {
+            "id": f"r{i:03d}",
+            "created_at": START + timedelta(seconds=i),
+            "status": "done" if i % 2 else "open",
+            "color": Color.RED if i % 3 else Color.BLUE,
+            "tags": ["even"] if i % 2 == 0 else [],
+        }
+    return store
+
+
+def ids(records):
+    return [record["id"] for record in records]
+
+
+def brute_force(store, filters, descending=False):
+    records = sorted(store.values(), key=lambda r: (r["created_at"], r["id"]), reverse=descending)
+    return [
+        r for r in records
+        if all(r.get(field) == value for field, value in filters.items() if value is not None)
+    ]
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"status": "open"},
+    {"status": "done", "color": Color.RED},
+    {"color": "blue"},
+    {"status": None, "color": Color.BLUE},
+])
+@pytest.mark.parametrize("descending", [False, True])
+def test_query_matches_full_scan(filters, descending):
+    store = make_store(50)
+    expected = ids(brute_force(store, filters, descending))
+
+    assert store.count(filters) == len(expected)
+    for offset in (0, 7, 49):
+        page = store.query(filters, limit=10, offset=offset, descending=descending)
+        assert ids(page) == expected[offset:offset + 10]
+
+
+def test_enum_members_and_values_share_a_bucket():
+    store = make_store(12)
+
+    assert ids(store.query({"status": "open", "color": Color.BLUE}, limit=100)) == \
+        ids(store.query({"status": "open", "color": "blue"}, limit=100))
+
+
+def test_list_fields_are_indexed_per_element():
+    store = IndexedStore(order_by=("created_at",), indexes=(("tags",),))
+    store["a"] = {"id": "a", "created_at": START, "tags": ["x", "y"]}
+    store["b"] = {"id": "b", "created_at": START + timedelta(1), "tags": ["y"]}
+
+    assert ids(store.query({"tags": "x"})) == ["a"]
+    assert ids(store.query({"tags": "y"})) == ["a", "b"]
+    assert store.count({"tags": "z"}) == 0
+
+
+def test_write_back_reindexes_changed_fields():
+    store = make_store(4)
+    record = store["r000"]
+    record["status"] = "done"
+    record["created_at"] = START + timedelta(days=1)
+    store["r000"] = record
+
+    assert "r000" not in ids(store.query({"status": "open"}, limit=100))
+    assert ids(store.query({"status": "done"}, limit=100))[-1] == "r000"
+    assert ids(store.query(limit=100))[-1] == "r000"
+
+
+def test_delete_removes_from_every_index():
+    store = make_store(6)
+    del store["r002"]
+
+    assert "r002" not in store
+    assert len(store) == 5
+    assert "r002" not in ids(store.query({"status": "open", "color": Color.RED}, limit=100))
+    assert store.count({"status": "open"}) == 2
+
+
+def test_revision_and_version_track_writes():
+    store = make_store(2)
+    revision = store.revision
+    store["r000"] = store["r000"]
+
+    assert store.revision == revision + 1
+    assert store.version("r000") == store.revision
+    assert store.version("r001") < store.version("r000")
+
+
+def test_reset_replaces_records_without_notifying():
+    store = make_store(10)
+    calls = []
+    store.subscribe(lambda record_id, record: calls.append(record_id))
+    replacement = make_store(3)
+
+    store.reset(dict(replacement.items()))
+
+    assert calls == []
+    assert ids(store.query(limit=100)) == ["r000", "r001", "r002"]
+    assert store.count({"status": "open"}) == 2
+
+
+def test_listeners_follow_writes_and_deletes():
+    store = make_store()
+    calls = []
+
+    def listener(record_id, record):
+        calls.append((record_id, record is None))
+
+    store.subscribe(listener)
+    store["a"] = {"id": "a", "created_at": START, "status": "open"}
+    del store["a"]
+    store.unsubscribe(listener)
+    store["b"] = {"id": "b", "created_at": START, "status": "open"}
+
+    assert calls == [("a", False), ("a", True)]
+
+
+def test_replicate_updates_in_place_and_skips_local_listeners():
+    store = make_store(1)
+    local, replicas = [], []
+    store.subscribe(lambda record_id, record: local.append(record_id))
+    store.subscribe(lambda record_id, record: replicas.append(record_id), replicas=True)
+    held = store["r000"]
+
+    store.replicate("r000", dict(held, status="done"))
+    store.replicate("r000", None)
+
+    assert held["status"] == "done"
+    assert "r000" not in store
+    assert local == []
+    assert replicas == ["r000", "r000"]
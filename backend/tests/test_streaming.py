@@ -0,0 +1,113 @@
+import json
+import uuid
+
+import httpx
+import pytest
+
+from app.core.store import IndexedStore
+from app.services.agent_executor import AgentExecutor
+from app.services.providers import AnthropicClient, Completion, OpenAIClient, ProviderError
+from tests.conftest import StaticProviders, make_agent, make_client, make_model
+
+
+def executor_for(client):
+    models = IndexedStore(order_by=("name",))
+    models["test-model"] = make_model()
+    return AgentExecutor(models, StaticProviders(client))
+
+
+async def collect(frames):
+    return [frame async for frame in frames]
+
+
+@pytest.mark.parametrize("cls", [OpenAIClient, AnthropicClient])
+async def test_provider_stream_yields_deltas_then_the_completion(stub, cls):
+    client = make_client(cls, stub)
+
+    items = [item async for item in client.stream("m", "Stream these words please", {})]
+
+    deltas, completion = items[:-1], items[-1]
+    assert len(deltas) > 1
+    assert isinstance(completion, Completion)
+    assert "".join(deltas) == completion.text == "Stub completion for: Stream these words please"
+    assert (completion.prompt_tokens, completion.completion_tokens) == (4, 7)
+
+
+async def test_provider_stream_error_status_raises():
+    client = make_client(OpenAIClient, httpx.MockTransport(
+        lambda request: httpx.Response(503, text="overloaded")
+    ))
+
+    with pytest.raises(ProviderError, match="returned 503: overloaded") as raised:
+        [item async for item in client.stream("m", "hi", {})]
+    assert raised.value.status_code == 503
+
+
+async def test_executor_streams_tokens_and_a_summary(stub):
+    executor = executor_for(make_client(OpenAIClient, stub))
+
+    frames = await collect(executor.stream(make_agent(), "write a haiku"))
+
+    tokens = [frame["text"] for frame in frames if frame["type"] == "token"]
+    summary = frames[-1]
+    assert summary["type"] == "summary"
+    assert summary["result"] == "".join(tokens)
+    assert summary["status"] == "completed"
+    assert summary["cost"]["completion_tokens"] > 0
+
+
+async def test_executor_ends_with_an_error_frame_when_the_provider_fails():
+    def handler(request):
+        body = 'data: {"choices": [{"delta": {"content": "Half"}}]}\n\ndata: {not json}\n\n'
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    executor = executor_for(make_client(OpenAIClient, httpx.MockTransport(handler)))
+
+    frames = await collect(executor.stream(make_agent(), "fail halfway"))
+
+    assert frames[0] == {"type": "token", "text": "Half"}
+    assert frames[-1]["type"] == "error"
+    assert "malformed event" in frames[-1]["detail"]
+
+
+async def test_executor_streams_mock_results_without_a_provider():
+    executor = executor_for(None)
+
+    frames = await collect(executor.stream(make_agent(), "one two three four five six"))
+
+    assert [frame["type"] for frame in frames] == ["token", "token", "token", "summary"]
+    assert frames[-1]["result"] == "Mock result for task: one two three four five six"
+
+
+async def test_ndjson_stream_endpoint(client):
+    task = f"explain {uuid.uuid4()}"
+
+    response = await client.post("/api/v1/agents/code-agent/execute/stream", params={"task": task})
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    frames = [json.loads(line) for line in response.text.splitlines()]
+    assert frames[-1]["type"] == "summary"
+    assert "".join(f["text"] for f in frames if f["type"] == "token") == frames[-1]["result"]
+
+
+async def test_sse_stream_endpoint(client):
+    response = await client.post(
+        "/api/v1/agents/code-agent/execute/stream",
+        params={"task": f"explain {uuid.uuid4()}"},
+        headers={"Accept": "text/event-stream"},
+    )
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    assert events[-1][0] == "event: summary"
+    assert json.loads(events[-1][1][len("data: "):])["type"] == "summary"
+
+
+async def test_stream_endpoint_rejects_an_unknown_model_up_front(client):
+    response = await client.post(
+        "/api/v1/agents/code-agent/execute/stream",
+        params={"task": "explain", "model_id": "no-such-model"},
+    )
+
+    assert response.status_code == 404
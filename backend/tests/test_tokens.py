@@ -0,0 +1,152 @@
+import pytest
+
+from app.api.api_v1.endpoints.models import MODELS
+from app.services import tokens
+from app.services.tokens import HeuristicEncoder, TiktokenEncoder, TokenCounter, token_counter
+from tests.conftest import make_model
+
+
+class FakeEncoding:
+    """
+    Stands in for a tiktoken encoding: one token per character.
+    """
+
+    name = "fake_base"
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, text, disallowed_special=()):
+        return list(text)
+
+    def encode_batch(self, texts, disallowed_special=()):
+        self.batches.append(texts)
+        return [list(text) for text in texts]
+
+
+@pytest.fixture
+def encoding(monkeypatch):
+    encoding = FakeEncoding()
+    loads = []
+
+    def load(model_id, encoding_name):
+        loads.append((model_id, encoding_name))
+        return encoding
+
+    monkeypatch.setattr(tokens, "_load_encoding", load)
+    encoding.loads = loads
+    return encoding
+
+
+def test_heuristic_counts():
+    encoder = HeuristicEncoder()
+
+    # "tokenizer" is 9 letters (3), "12345" 5 digits (2), "!" and "(" and ")" one each
+    assert encoder.count("tokenizer 12345!()") == 8
+    assert encoder.count("") == 0
+    assert encoder.count_batch(["a b", "abcd"]) == [2, 1]
+
+
+def test_tiktoken_encoder_counts_encoded_tokens():
+    encoder = TiktokenEncoder(FakeEncoding())
+
+    assert encoder.name == "fake_base"
+    assert encoder.count("hello") == 5
+    assert encoder.count_batch(["a", "abc"]) == [1, 3]
+
+
+def test_encoders_are_loaded_once_per_provider_and_model(encoding):
+    counter = TokenCounter()
+    openai = make_model(provider="openai", model_id="gpt-4o")
+    claude = make_model(provider="anthropic", model_id="claude-3-opus")
+
+    first = counter.encoder(openai)
+    assert counter.encoder(openai) is first
+    counter.encoder(claude)
+    counter.encoder(make_model(provider="anthropic", model_id="claude-3-haiku"))
+    counter.encoder(None)
+
+    # Only OpenAI model ids pick an encoding; other providers share theirs
+    assert encoding.loads == [
+        ("gpt-4o", "o200k_base"),
+        ("", "cl100k_base"),
+        ("", "cl100k_base"),
+    ]
+    assert set(counter.stats()["encoders"]) == {"openai:gpt-4o", "anthropic", "default"}
+
+
+def test_missing_encodings_fall_back_to_the_heuristic(monkeypatch):
+    monkeypatch.setattr(tokens, "_load_encoding", lambda model_id, encoding_name: None)
+
+    assert TokenCounter().encoder(make_model()).name == "heuristic"
+
+
+def test_counts_are_cached_and_batched(encoding):
+    counter = TokenCounter()
+
+    assert counter.count_batch(["one", "three", "one"]) == [3, 5, 3]
+    assert counter.count("three") == 5
+    assert counter.count("seven") == 5
+
+    # Duplicates within a batch are encoded once, cached texts not at all
+    assert encoding.batches == [["one", "three"], ["seven"]]
+    assert (counter.hits, counter.misses) == (1, 3)
+
+
+def test_count_cache_is_bounded_lru(encoding):
+    counter = TokenCounter(max_entries=2)
+    counter.count("a")
+    counter.count("bb")
+    counter.count("a")
+    counter.count("ccc")
+
+    counter.count("a")
+    counter.count("bb")
+
+    assert counter.stats()["entries"] == 2
+    assert encoding.batches == [["a"], ["bb"], ["ccc"], ["bb"]]
+
+
+def test_estimate_prices_prompt_and_completion_tokens():
+    model = make_model(cost_per_prompt_token=0.001, cost_per_completion_token=0.002)
+
+    assert TokenCounter().estimate(model, 100, 50) == {
+        "prompt_tokens": 100, "completion_tokens": 50, "total_cost": pytest.approx(0.2),
+    }
+
+
+async def test_estimate_endpoint_counts_each_prompt(client):
+    prompts = ["Review this function", "Write tests for the parser module"]
+
+    response = await client.post(
+        "/api/v1/models/gpt-4o/estimate", json={"prompts": prompts, "completion_tokens": 100}
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    counts = token_counter.count_batch(prompts, MODELS["gpt-4o"])
+    assert [estimate["prompt_tokens"] for estimate in body["estimates"]] == counts
+    assert all(estimate["fits_context"] for estimate in body["estimates"])
+    assert body["total_cost"] == pytest.approx(sum(e["total_cost"] for e in body["estimates"]))
+
+
+async def test_estimate_endpoint_validates_its_input(client):
+    empty = await client.post("/api/v1/models/gpt-4o/estimate", json={"prompts": []})
+    missing = await client.post("/api/v1/models/missing/estimate", json={"prompts": ["x"]})
+
+    assert empty.status_code == 422
+    assert missing.status_code == 404
+
+
+async def test_select_rejects_prompts_longer_than_the_context_window(client):
+    MODELS["tokens-small"] = make_model(id="tokens-small", context_window=10)
+    try:
+        response = await client.post(
+            "/api/v1/models/tokens-small/select",
+            params={"task_type": "analysis", "prompt": "word " * 20},
+        )
+    finally:
+        del MODELS["tokens-small"]
+
+    assert response.status_code == 400
+    assert "exceeds model's context window" in response.json()["detail"]
@@ -0,0 +1,157 @@
+import asyncio
+import json
+
+from app.api import websocket
+from app.api.api_v1.endpoints.orchestration import WORKFLOW_EXECUTIONS
+from app.api.api_v1.endpoints.tasks import TASKS
+from app.services.websocket_hub import WebSocketHub
+from tests.conftest import wait_for
+
+
+class FakeSocket:
+    """
+    Collects what the hub sends; ``gate`` holds writes back until set.
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.closed = None
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def send_text(self, payload):
+        await self.gate.wait()
+        self.sent.append(json.loads(payload))
+
+    async def close(self, code=1000):
+        self.closed = code
+
+    def types(self):
+        return [message["type"] for message in self.sent]
+
+
+def connect(hub):
+    socket = FakeSocket()
+    return socket, hub.connect(socket)
+
+
+async def test_events_reach_only_subscribers_and_are_serialized_once():
+    hub = WebSocketHub()
+    task_socket, task_client = connect(hub)
+    all_socket, all_client = connect(hub)
+    _, idle_client = connect(hub)
+    hub.subscribe(task_client, "task", "t1")
+    hub.subscribe(all_client, "tasks")
+    hub.subscribe(all_client, "task", "t1")
+    calls = []
+
+    def data():
+        calls.append(1)
+        return {"task_id": "t1"}
+
+    delivered = hub.publish([("task", "t1"), ("tasks", None)], "task_update", data)
+    await wait_for(lambda: task_socket.sent and all_socket.sent)
+
+    assert delivered == 2
+    assert len(calls) == 1
+    assert all_socket.sent == [{"type": "task_update", "data": {"task_id": "t1"}}]
+    assert idle_client.pending == 0
+    assert hub.publish([("task", "other")], "task_update", data) == 0
+    assert len(calls) == 1
+    await hub.close()
+
+
+async def test_unsubscribe_and_disconnect_drop_the_index_entries():
+    hub = WebSocketHub(max_subscriptions=2)
+    _, client = connect(hub)
+
+    assert hub.subscribe(client, "tasks")
+    assert hub.subscribe(client, "task", "t1")
+    assert not hub.subscribe(client, "task", "t2")
+    hub.unsubscribe(client, "tasks")
+    assert not hub.has_subscribers([("tasks", None)])
+
+    hub.disconnect(client)
+
+    assert hub.stats()["connections"] == 0
+    assert hub.stats()["subscriptions"] == 0
+    assert not hub.has_subscribers([("task", "t1")])
+
+
+async def test_slow_clients_get_coalesced_and_bounded_queues():
+    hub = WebSocketHub(max_queue=3)
+    socket, client = connect(hub)
+    socket.gate.clear()
+    hub.subscribe(client, "tasks")
+    # The writer takes the first message and waits on the socket
+    hub.publish([("tasks", None)], "task_update", lambda: {"n": 0})
+    await asyncio.sleep(0)
+
+    for n in range(1, 4):
+        hub.publish([("tasks", None)], "task_update", lambda n=n: {"task_id": "a", "n": n}, "a")
+    for task_id in ("b", "c", "d"):
+        hub.publish([("tasks", None)], "task_update", lambda task_id=task_id: {"task_id": task_id}, task_id)
+
+    assert client.pending == 3
+    assert (client.coalesced, client.dropped) == (2, 1)
+    socket.gate.set()
+    await wait_for(lambda: len(socket.sent) == 4)
+    assert [message["data"].get("task_id") for message in socket.sent] == [None, "b", "c", "d"]
+    await hub.close()
+
+
+async def test_close_flushes_queues_and_says_goodbye():
+    hub = WebSocketHub()
+    socket, client = connect(hub)
+    hub.subscribe(client, "tasks")
+    hub.publish([("tasks", None)], "task_update", lambda: {"task_id": "a"})
+
+    await hub.close()
+
+    assert socket.types() == ["task_update", "connection_closed"]
+    assert socket.closed == 1001
+    assert hub.stats()["connections"] == 0
+
+
+async def test_subscription_requests_are_validated():
+    hub_socket = FakeSocket()
+    client = websocket.HUB.connect(hub_socket)
+    try:
+        for request in (
+            {"type": "publish", "data": {}},
+            {"type": "subscribe", "data": "tasks"},
+            {"type": "subscribe", "data": {"channel": "secrets"}},
+            {"type": "subscribe", "data": {"channel": "task", "task_id": 1}},
+            {"type": "subscribe", "data": {"channel": "task", "task_id": "missing"}},
+        ):
+            websocket._handle(client, request)
+        websocket._handle(client, {"type": "subscribe", "data": {"channel": "tasks"}})
+        websocket._handle(client, {"type": "pong"})
+
+        assert client.pending == 5
+        assert client.subscriptions == {("tasks", None)}
+    finally:
+        websocket.HUB.disconnect(client)
+
+
+async def test_task_changes_are_published_once_across_hub_restarts(client):
+    # The client fixture already started the hub once; restart it again
+    await websocket.stop_hub()
+    await websocket.start_hub()
+    socket = FakeSocket()
+    connection = websocket.HUB.connect(socket)
+    websocket.HUB.subscribe(connection, "tasks")
+
+    assert TASKS._listeners.count(websocket.publish_task) == 1
+    assert TASKS._replica_listeners.count(websocket.publish_task) == 1
+    assert WORKFLOW_EXECUTIONS._listeners.count(websocket.publish_execution) == 1
+    task = (await client.post("/api/v1/tasks/", json={
+        "type": "design",
+        "title": "Watched task",
+        "description": "Updates go to the tasks channel",
+    })).json()
+    await wait_for(lambda: "task_completion" in socket.types())
+
+    completion = socket.sent[socket.types().index("task_completion")]
+    assert completion["data"]["task_id"] == task["id"]
+    websocket.HUB.disconnect(connection)
@@ -0,0 +1,147 @@
+from tests.conftest import wait_for
+
+FINISHED = ("completed", "failed", "awaiting_review")
+
+
+def agent_step(step_id, next_steps=None, **fields):
+    return {
+        "id": step_id,
+        "type": "agent",
+        "name": f"Step {step_id}",
+        "agent_id": "code-agent",
+        "next_steps": next_steps,
+        **fields,
+    }
+
+
+async def create_workflow(client, steps, workflow_type="sequential"):
+    response = await client.post("/api/v1/orchestration/workflows", json={
+        "name": "Test workflow",
+        "description": "Created by a test",
+        "type": workflow_type,
+        "steps": steps,
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+async def execute(client, workflow_id, **parameters):
+    response = await client.post("/api/v1/orchestration/executions", json={
+        "workflow_id": workflow_id,
+        "input_data": {"code": "print('hello')"},
+        "parameters": parameters,
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def wait_until_finished(client, execution_id):
+    async def finished():
+        execution = (await client.get(f"/api/v1/orchestration/executions/{execution_id}")).json()
+        return execution if execution["status"] in FINISHED else None
+
+    return await wait_for(finished)
+
+
+async def test_execution_runs_every_step_in_the_background(client):
+    workflow_id = await create_workflow(client, [
+        agent_step("a", ["b"]),
+        agent_step("b"),
+    ])
+
+    started = await execute(client, workflow_id)
+    assert started["status"] == "in_progress"
+    assert started["current_step_id"] == "a"
+
+    execution = await wait_until_finished(client, started["id"])
+    assert execution["status"] == "completed"
+    assert set(execution["output_data"]) == {"a", "b"}
+    assert execution["completed_at"] is not None
+
+
+async def test_parallel_branches_join_before_the_next_step(client):
+    workflow_id = await create_workflow(client, [
+        agent_step("start", ["left", "right"]),
+        agent_step("left", ["join"]),
+        agent_step("right", ["join"]),
+        agent_step("join"),
+    ], workflow_type="parallel")
+
+    execution = await wait_until_finished(client, (await execute(client, workflow_id))["id"])
+
+    assert execution["status"] == "completed"
+    assert set(execution["output_data"]) == {"start", "left", "right", "join"}
+
+
+async def test_missing_agent_fails_the_execution(client):
+    workflow_id = await create_workflow(client, [agent_step("a", agent_id="no-such-agent")])
+
+    execution = await wait_until_finished(client, (await execute(client, workflow_id))["id"])
+
+    assert execution["status"] == "failed"
+    assert "no-such-agent" in execution["error"]
+
+
+async def test_seed_workflow_waits_for_review_and_completes_on_approval(client):
+    started = await execute(client, "code-review-workflow")
+
+    execution = await wait_until_finished(client, started["id"])
+    assert execution["status"] == "awaiting_review"
+    assert execution["awaiting_review"] == ["step3"]
+    assert set(execution["output_data"]) == {"step1", "step2"}
+
+    response = await client.post(
+        f"/api/v1/orchestration/executions/{started['id']}/steps/step3/review",
+        json={"approved": True, "comment": "Looks good"},
+    )
+    assert response.status_code == 200
+
+    execution = await wait_until_finished(client, started["id"])
+    assert execution["status"] == "completed"
+    assert execution["output_data"]["step3"] == {"status": "approved", "comment": "Looks good"}
+
+
+async def test_rejected_review_fails_the_execution(client):
+    started = await execute(client, "code-review-workflow")
+    await wait_until_finished(client, started["id"])
+
+    response = await client.post(
+        f"/api/v1/orchestration/executions/{started['id']}/steps/step3/review",
+        json={"approved": False},
+    )
+
+    assert response.json()["status"] == "failed"
+    assert "rejected" in response.json()["error"]
+
+
+async def test_review_of_a_step_not_waiting_is_rejected(client):
+    started = await execute(client, "code-review-workflow")
+    await wait_until_finished(client, started["id"])
+
+    response = await client.post(
+        f"/api/v1/orchestration/executions/{started['id']}/steps/step1/review",
+        json={"approved": True},
+    )
+
+    assert response.status_code == 400
+
+
+async def test_cancel_stops_a_waiting_execution(client):
+    started = await execute(client, "code-review-workflow")
+    await wait_until_finished(client, started["id"])
+
+    response = await client.post(f"/api/v1/orchestration/executions/{started['id']}/cancel")
+    assert response.json()["status"] == "failed"
+    assert response.json()["error"] == "Cancelled by user"
+
+    response = await client.post(f"/api/v1/orchestration/executions/{started['id']}/cancel")
+    assert response.status_code == 400
+
+
+async def test_unknown_workflow_is_not_found(client):
+    response = await client.post("/api/v1/orchestration/executions", json={
+        "workflow_id": "no-such-workflow",
+        "input_data": {},
+    })
+
+    assert response.status_code == 404
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.workflow import WorkflowStepType
+from app.services.workflow_plan import PlanCache, WorkflowPlanError, compile_plan
+
+
+def step(step_id, next_steps=None, step_type=WorkflowStepType.AGENT, **fields):
+    return {
+        "id": step_id,
+        "type": step_type,
+        "name": step_id,
+        "agent_id": "code-agent" if step_type == WorkflowStepType.AGENT else None,
+        "next_steps": next_steps,
+        **fields,
+    }
+
+
+def test_compile_plan_orders_and_levels_a_dag():
+    plan = compile_plan([
+        step("join"),
+        step("left", ["join"]),
+        step("start", ["left", "right"]),
+        step("right", ["join"]),
+    ])
+
+    assert plan.entry_steps == ("start",)
+    assert plan.order == ("start", "left", "right", "join")
+    assert plan.levels == (("start",), ("left", "right"), ("join",))
+    assert plan.successors["start"] == ("left", "right")
+    assert set(plan.predecessors["join"]) == {"left", "right"}
+
+
+def test_duplicate_successors_are_collapsed():
+    plan = compile_plan([step("a", ["b", "b"]), step("b")])
+
+    assert plan.successors["a"] == ("b",)
+    assert plan.predecessors["b"] == ("a",)
+
+
+def test_conditions_are_compiled_into_the_plan():
+    plan = compile_plan([step("a", condition="input.ready == True")])
+
+    assert plan.conditions["a"]({"input": {"ready": True}})
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([step("a"), step("a")], "Duplicate step id a"),
+    ([step("a", ["missing"])], "unknown step missing"),
+    ([step("a", step_type=WorkflowStepType.LOOP)], "Loop step a"),
+    ([step("a", agent_id=None)], "has no agent_id"),
+    ([step("a", step_type=WorkflowStepType.CONDITION)], "has no condition"),
+    ([step("a", ["b"]), step("b", ["a"])], "cycle through a, b"),
+    ([step("a", condition="__import__('os')")], "invalid condition"),
+])
+def test_invalid_steps_are_rejected(steps, message):
+    with pytest.raises(WorkflowPlanError, match=message):
+        compile_plan(steps)
+
+
+def test_plan_cache_reuses_plans_until_the_workflow_changes():
+    cache = PlanCache()
+    workflow = {"id": "w", "updated_at": datetime(2024, 1, 1), "steps": [step("a")]}
+
+    plan = cache.put(workflow)
+    assert cache.get(workflow) is plan
+
+    workflow["steps"] = [step("a", ["b"]), step("b")]
+    workflow["updated_at"] += timedelta(seconds=1)
+    changed = cache.get(workflow)
+    assert changed is not plan
+    assert changed.order == ("a", "b")
+
+    cache.invalidate("w")
+    assert cache.get(workflow) is not changed
+
+
+async def test_invalid_workflow_is_rejected_on_create_and_update(client):
+    workflow = {
+        "name": "Cyclic",
+        "description": "Steps that point at each other",
+        "type": "sequential",
+        "steps": [
+            {"id": "a", "type": "agent", "name": "A", "agent_id": "code-agent", "next_steps": ["b"]},
+            {"id": "b", "type": "agent", "name": "B", "agent_id": "code-agent", "next_steps": ["a"]},
+        ],
+    }
+    response = await client.post("/api/v1/orchestration/workflows", json=workflow)
+    assert response.status_code == 400
+    assert "cycle" in response.json()["detail"]
+
+    workflow["steps"][1]["next_steps"] = None
+    created = (await client.post("/api/v1/orchestration/workflows", json=workflow)).json()
+    response = await client.patch(
+        f"/api/v1/orchestration/workflows/{created['id']}",
+        json={"steps": [{"id": "a", "type": "loop", "name": "A"}]},
+    )
+    assert response.status_code == 400
+
+    stored = (await client.get(f"/api/v1/orchestration/workflows/{created['id']}")).json()
+    assert [s["id"] for s in stored["steps"]] == ["a", "b"]